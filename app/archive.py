@@ -0,0 +1,124 @@
+import argparse
+import logging
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import SessionLocal, upsert_insert
+from . import jsonutil, models, response_cache
+
+# Tiered archival of closed orders, so the hot tables and their indexes only hold
+# orders that can still change.
+# Orders in ARCHIVE_STATUSES not updated for ARCHIVE_AFTER_DAYS are copied into
+# orders_archive and deleted from orders, order_items, payments, shipments,
+# returns and fulfillment_sync, ARCHIVE_BATCH_SIZE orders per short transaction.
+# Candidates are locked FOR UPDATE SKIP LOCKED: an order someone is writing right
+# now is left for the next run instead of being waited on.
+# Order ids are kept, so get_order and the export fall back to orders_archive.
+# Rollups and the inventory ledger don't reference orders and are untouched;
+# `python -m app.rollups` rebuilds from orders_archive as well as orders.
+# Customers and addresses are shared between orders and stay; each archived doc
+# keeps a copy of its shipping address.
+# Run from cron or as `python -m app.archive --every 3600`.
+
+log = logging.getLogger(__name__)
+
+CHILDREN = (models.OrderItem, models.Payment, models.Shipment, models.Return)
+
+def closed_statuses() -> List[models.OrderStatus]:
+    return [models.OrderStatus(s.strip()) for s in settings.archive_statuses.split(",") if s.strip()]
+
+def encode_doc(doc: Dict[str, Any]) -> bytes:
+    return zlib.compress(jsonutil.dumps(doc), 6)
+
+def decode_doc(blob: bytes) -> Dict[str, Any]:
+    return jsonutil.loads(zlib.decompress(blob))
+
+def _children(db: Session, model, order_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    rows = defaultdict(list)
+    for row in db.execute(select(model.__table__).where(model.order_id.in_(order_ids)).order_by(model.id)).mappings():
+        rows[row["order_id"]].append({k: v for k, v in row.items() if k != "order_id"})
+    return rows
+
+def archive_batch(db: Session, cutoff: datetime, statuses: List[models.OrderStatus], batch_size: int) -> List[int]:
+    """Move up to batch_size closed orders into orders_archive. Caller commits."""
+    o = models.Order
+    orders = db.execute(
+        select(o.__table__)
+        .where(o.status.in_(statuses), o.updated_at < cutoff)
+        .order_by(o.updated_at, o.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).mappings().all()
+    if not orders:
+        return []
+    ids = [r["id"] for r in orders]
+    items, payments, shipments, returns = (_children(db, m, ids) for m in CHILDREN)
+    address_ids = {r["shipping_address_id"] for r in orders if r["shipping_address_id"]}
+    addresses = {
+        a["id"]: dict(a) for a in db.execute(
+            select(models.Address.__table__).where(models.Address.id.in_(address_ids))
+        ).mappings()
+    } if address_ids else {}
+    rows = [{
+        "id": r["id"],
+        "shopify_order_id": r["shopify_order_id"],
+        "customer_id": r["customer_id"],
+        "status": r["status"].value,
+        "currency": r["currency"],
+        "subtotal_cents": r["subtotal_cents"],
+        "shipping_cents": r["shipping_cents"],
+        "tax_cents": r["tax_cents"],
+        "total_cents": r["total_cents"],
+        "placed_at": r["placed_at"],
+        "created_at": r["created_at"],
+        "updated_at": r["updated_at"],
+        "doc": encode_doc({
+            "shipping_address": addresses.get(r["shipping_address_id"]),
+            "items": items[r["id"]],
+            "payments": payments[r["id"]],
+            "shipments": shipments[r["id"]],
+            "return": (returns[r["id"]] or [None])[0],
+        }),
+    } for r in orders]
+    # DO NOTHING: a batch that was copied but not deleted (crash) is simply re-deleted
+    db.execute(upsert_insert(db, models.OrderArchive).on_conflict_do_nothing(index_elements=["id"]), rows)
+    for model in (models.FulfillmentSync,) + CHILDREN:
+        db.execute(delete(model).where(model.order_id.in_(ids)))
+    db.execute(delete(o).where(o.id.in_(ids)))
+    return ids
+
+def archive(after_days: Optional[float] = None, batch_size: Optional[int] = None) -> Dict[str, int]:
+    days = settings.archive_after_days if after_days is None else after_days
+    size = batch_size or settings.archive_batch_size
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    statuses = closed_statuses()
+    moved = batches = 0
+    with SessionLocal() as db:
+        while True:
+            ids = archive_batch(db, cutoff, statuses, size)
+            db.commit()
+            response_cache.invalidate_orders(ids)
+            moved += len(ids)
+            batches += 1
+            if len(ids) < size:
+                return {"orders": moved, "batches": batches}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Move old closed orders to orders_archive")
+    parser.add_argument("--days", type=float, default=None, help="override ARCHIVE_AFTER_DAYS")
+    parser.add_argument("--batch-size", type=int, default=None, help="override ARCHIVE_BATCH_SIZE")
+    parser.add_argument("--every", type=float, default=0, help="repeat every N seconds")
+    args = parser.parse_args()
+    while True:
+        log.info("archived %s", archive(args.days, args.batch_size))
+        if not args.every:
+            break
+        time.sleep(args.every)
@@ -0,0 +1,199 @@
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from .config import settings
+from .db import SessionLocal
+from . import jsonutil, models, rollups, webhooks
+
+# Backfill of historical orders from a Shopify bulk-operation JSONL export
+# (GraphQL bulkOperationRunQuery over orders with a lineItems connection).
+# Each line is one object; line items come on their own lines after their order,
+# linked by "__parentId". The file is read line by line and orders are written
+# through webhooks.create_order (same mapping, Canada filter, customer/address
+# reuse, rollups, search terms) BACKFILL_BATCH_SIZE orders per transaction,
+# without reserving inventory. Orders already present (live or archived) are
+# skipped, so an interrupted run can simply be started again: after every
+# committed batch the byte offset of the next order is written to
+# <file>.checkpoint, and a restart seeks straight there.
+#
+#     python -m app.backfill orders.jsonl [--batch-size 1000] [--restart]
+
+log = logging.getLogger(__name__)
+
+def gid_to_int(gid: Any) -> Optional[int]:
+    """"gid://shopify/Order/123" -> 123."""
+    if gid is None:
+        return None
+    return int(str(gid).rsplit("/", 1)[-1])
+
+def _money(money_set: Optional[Dict[str, Any]]) -> Optional[str]:
+    return ((money_set or {}).get("shopMoney") or {}).get("amount")
+
+def order_status(node: Dict[str, Any]) -> models.OrderStatus:
+    S = models.OrderStatus
+    if node.get("cancelledAt"):
+        return S.CANCELLED
+    if node.get("displayFulfillmentStatus") == "FULFILLED":
+        return S.SHIPPED
+    if node.get("displayFinancialStatus") in ("PAID", "PARTIALLY_REFUNDED", "REFUNDED"):
+        return S.PAID
+    return S.IMPORTED
+
+def to_payload(node: Dict[str, Any], line_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """GraphQL bulk order + its line item nodes -> the REST/webhook payload shape create_order reads."""
+    cust = node.get("customer") or {}
+    ship = node.get("shippingAddress") or {}
+    return {
+        "id": gid_to_int(node["id"]),
+        "order_number": (node.get("name") or "").lstrip("#") or None,
+        "email": node.get("email"),
+        "created_at": node.get("createdAt"),
+        "currency": node.get("currencyCode"),
+        "subtotal_price": _money(node.get("subtotalPriceSet")),
+        "total_price": _money(node.get("totalPriceSet")),
+        "total_tax": _money(node.get("totalTaxSet")),
+        "total_shipping_price_set": {"shop_money": {"amount": _money(node.get("totalShippingPriceSet"))}},
+        "customer": {
+            "id": gid_to_int(cust.get("id")),
+            "email": cust.get("email"),
+            "phone": cust.get("phone"),
+            "first_name": cust.get("firstName"),
+            "last_name": cust.get("lastName"),
+        },
+        "shipping_address": {
+            "first_name": ship.get("firstName"),
+            "last_name": ship.get("lastName"),
+            "address1": ship.get("address1"),
+            "address2": ship.get("address2"),
+            "city": ship.get("city"),
+            "province": ship.get("province"),
+            "zip": ship.get("zip"),
+            "country": ship.get("country") or ship.get("countryCodeV2"),
+        },
+        "line_items": [{
+            "sku": li.get("sku"),
+            "title": li.get("title") or li.get("name"),
+            "quantity": li.get("quantity"),
+            "price": _money(li.get("originalUnitPriceSet")),
+        } for li in line_items],
+    }
+
+def read_orders(f, stats: Dict[str, int]) -> Iterator[Tuple[int, Dict[str, Any], List[Dict[str, Any]]]]:
+    """(offset after the order's last child, order node, line item nodes) from a binary JSONL file.
+
+    Only the current order is held in memory. Children whose parent is not the
+    order just read (the export nests them right after it) are counted and dropped.
+    """
+    order, items = None, []
+    while True:
+        offset = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        stats["lines"] += 1
+        obj = jsonutil.loads(line)
+        parent = obj.get("__parentId")
+        if parent is None:
+            if order is not None:
+                yield offset, order, items
+            order, items = obj, []
+        elif order is not None and parent == order["id"]:
+            items.append(obj)
+        else:
+            stats["orphans"] += 1
+    if order is not None:
+        yield f.tell(), order, items
+
+def _checkpoint_path(path: str) -> str:
+    return path + ".checkpoint"
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(_checkpoint_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"offset": 0}
+
+def save_checkpoint(path: str, state: Dict[str, Any]):
+    tmp = _checkpoint_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, _checkpoint_path(path))
+
+def _existing(db, shopify_ids: List[int]) -> set:
+    found = set()
+    for model in (models.Order, models.OrderArchive):
+        found.update(db.scalars(select(model.shopify_order_id).where(model.shopify_order_id.in_(shopify_ids))))
+    return found
+
+def _write_batch(db, batch: List[Tuple[Dict[str, Any], models.OrderStatus]], stats: Dict[str, int]):
+    existing = _existing(db, [p["id"] for p, _ in batch])
+    created = []
+    for payload, status in batch:
+        if payload["id"] in existing:
+            stats["duplicates"] += 1
+            continue
+        existing.add(payload["id"])
+        webhooks.create_order(db, payload, status=status, reserve=False, rollups_into=created)
+        stats["orders"] += 1
+        stats["items"] += len(payload["line_items"])
+    rollups.orders_created(db, created)
+    db.commit()
+    # Drop the batch's ORM objects so memory stays flat
+    db.expunge_all()
+
+def backfill(path: str, batch_size: Optional[int] = None, restart: bool = False) -> Dict[str, Any]:
+    size = batch_size or settings.backfill_batch_size
+    offset = 0 if restart else load_checkpoint(path).get("offset", 0)
+    stats = {"lines": 0, "orders": 0, "items": 0, "duplicates": 0, "skipped_non_canada": 0, "orphans": 0}
+    started = time.perf_counter()
+    batch: List[Tuple[Dict[str, Any], models.OrderStatus]] = []
+
+    def flush(next_offset: int):
+        _write_batch(db, batch, stats)
+        batch.clear()
+        save_checkpoint(path, {"offset": next_offset, "updated_at": time.time()})
+        seconds = time.perf_counter() - started
+        log.info("offset %d: %d orders, %d items, %d duplicates, %.0f rows/s",
+                 next_offset, stats["orders"], stats["items"], stats["duplicates"],
+                 (stats["orders"] + stats["items"]) / seconds if seconds else 0.0)
+
+    with open(path, "rb") as f, SessionLocal() as db:
+        f.seek(offset)
+        end = offset
+        for end, node, items in read_orders(f, stats):
+            payload = to_payload(node, items)
+            if not webhooks.ships_to_canada(payload):
+                stats["skipped_non_canada"] += 1
+                continue
+            batch.append((payload, order_status(node)))
+            if len(batch) >= size:
+                flush(end)
+        if batch:
+            flush(end)
+        save_checkpoint(path, {"offset": end, "updated_at": time.time(), "done": True})
+    seconds = time.perf_counter() - started
+    stats.update({
+        "resumed_from": offset,
+        "seconds": seconds,
+        "rows_per_s": (stats["orders"] + stats["items"]) / seconds if seconds else 0.0,
+        "lines_per_s": stats["lines"] / seconds if seconds else 0.0,
+    })
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load historical orders from a Shopify bulk-operation JSONL file")
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=None, help="override BACKFILL_BATCH_SIZE")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and read from the start")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(backfill(args.path, args.batch_size, args.restart))
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from . import db as database
+from . import models
+
+# In-process SKU catalog cache: sku_code -> (sku_id, product_id, price_cents, active).
+# Unknown codes are cached too, so replayed line items for unmapped SKUs stay off
+# Postgres. Invalidation:
+# - local: call invalidate() after mutating skus in this process
+# - cross-worker: a trigger on skus NOTIFYs CHANNEL with the sku_code and each
+#   process runs a LISTEN thread (start_listener) that drops the entry
+# - ttl: entries expire after sku_cache_ttl_seconds in case a notification is missed
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "sku_catalog"
+
+class CatalogEntry(NamedTuple):
+    sku_id: int
+    product_id: int
+    price_cents: int
+    active: bool
+
+class SKUCatalogCache:
+    """Bounded LRU map of sku_code -> CatalogEntry (or None for unknown codes)."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[float, Optional[CatalogEntry]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_many(self, codes: Iterable[str]) -> Tuple[Dict[str, Optional[CatalogEntry]], List[str]]:
+        """Split codes into cached entries and codes that must be loaded."""
+        found: Dict[str, Optional[CatalogEntry]] = {}
+        missing: List[str] = []
+        now = time.monotonic()
+        with self._lock:
+            for code in codes:
+                item = self._data.get(code)
+                if item is not None and now - item[0] < self.ttl_seconds:
+                    self._data.move_to_end(code)
+                    found[code] = item[1]
+                    self.hits += 1
+                else:
+                    missing.append(code)
+                    self.misses += 1
+        return found, missing
+
+    def put_many(self, entries: Dict[str, Optional[CatalogEntry]]):
+        now = time.monotonic()
+        with self._lock:
+            for code, entry in entries.items():
+                self._data[code] = (now, entry)
+                self._data.move_to_end(code)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, code: Optional[str] = None):
+        """Drop one code, or everything when code is None."""
+        with self._lock:
+            if code is None:
+                self._data.clear()
+            else:
+                self._data.pop(code, None)
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+cache = SKUCatalogCache(settings.sku_cache_max_entries, settings.sku_cache_ttl_seconds)
+
+def _load_query(codes: List[str]):
+    return select(
+        models.SKU.sku_code, models.SKU.id, models.SKU.product_id, models.SKU.price_cents, models.SKU.active
+    ).where(models.SKU.sku_code.in_(codes))
+
+def _store(missing: List[str], rows) -> Dict[str, Optional[CatalogEntry]]:
+    loaded: Dict[str, Optional[CatalogEntry]] = {code: None for code in missing}
+    for code, sku_id, product_id, price_cents, active in rows:
+        loaded[code] = CatalogEntry(sku_id, product_id, price_cents, bool(active))
+    cache.put_many(loaded)
+    return loaded
+
+def lookup_many(db: Session, codes: Iterable[Optional[str]]) -> Dict[str, CatalogEntry]:
+    """Known SKUs for the given codes; at most one query, and only for cache misses."""
+    found, missing = cache.get_many({c for c in codes if c})
+    if missing:
+        found.update(_store(missing, db.execute(_load_query(missing))))
+    return {code: entry for code, entry in found.items() if entry is not None}
+
+async def alookup_many(db: AsyncSession, codes: Iterable[Optional[str]]) -> Dict[str, CatalogEntry]:
+    found, missing = cache.get_many({c for c in codes if c})
+    if missing:
+        found.update(_store(missing, await db.execute(_load_query(missing))))
+    return {code: entry for code, entry in found.items() if entry is not None}
+
+async def alookup(db: AsyncSession, code: str) -> Optional[CatalogEntry]:
+    return (await alookup_many(db, [code])).get(code)
+
+def invalidate(code: Optional[str] = None):
+    cache.invalidate(code)
+
+# --------- Cross-worker invalidation (Postgres LISTEN/NOTIFY) ---------
+
+_listener: Optional[threading.Thread] = None
+
+def _listen_forever():
+    while True:
+        raw = None
+        try:
+            raw = database.engine.raw_connection()
+            conn = raw.driver_connection
+            conn.autocommit = True
+            conn.execute(f"LISTEN {CHANNEL}")
+            # Anything may have changed while we were not listening
+            cache.invalidate()
+            for note in conn.notifies():
+                cache.invalidate(note.payload or None)
+        except Exception as exc:
+            log.warning("sku catalog listener disconnected: %r", exc)
+        finally:
+            if raw is not None:
+                # Never hand a LISTENing connection back to the pool
+                raw.invalidate()
+        time.sleep(5)
+
+def start_listener():
+    """Start the NOTIFY listener thread once per process (Postgres only)."""
+    global _listener
+    if _listener is not None or database.engine.dialect.name != "postgresql":
+        return
+    _listener = threading.Thread(target=_listen_forever, name="sku-catalog-listener", daemon=True)
+    _listener.start()
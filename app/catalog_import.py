@@ -0,0 +1,167 @@
+import csv
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, select, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import upsert_insert
+from . import models, catalog, inventory
+from .schemas import SKUCreate
+
+# Bulk catalog import: CSV or NDJSON rows shaped like SKUCreate, parsed as the
+# request streams in and written BATCH_SIZE rows per transaction.
+# - products: matched by title (one lookup per batch), missing ones inserted together
+# - skus: INSERT ... ON CONFLICT (sku_code) DO UPDATE
+# - inventory: new SKUs get qty_on_hand/reorder_level; existing SKUs only get
+#   reorder_level (and bin_location, when given) updated, so an import never
+#   overwrites counted stock
+# CSV fields must not contain embedded newlines.
+
+BATCH_SIZE = 1000
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    buf = b""
+    async for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line
+    if buf:
+        yield buf
+
+def _parse(fmt: str, header: Optional[List[str]], line: str) -> Dict[str, Any]:
+    if fmt == "csv":
+        values = next(csv.reader([line]))
+        # Empty cells fall back to SKUCreate defaults
+        return {k: v for k, v in zip(header or [], values) if v != ""}
+    return json.loads(line)
+
+def _validate(data: Dict[str, Any]) -> SKUCreate:
+    row = SKUCreate.model_validate(data)
+    if row.price_cents < 0 or row.cost_cents < 0:
+        raise ValueError("price_cents and cost_cents must be >= 0")
+    return row
+
+def dedupe(batch: List[Tuple[int, SKUCreate]]) -> Tuple[List[Tuple[int, SKUCreate]], List[Dict[str, Any]]]:
+    """(rows to write, skipped results): within a batch the last row for a sku_code
+    wins (ON CONFLICT cannot touch a row twice)."""
+    latest: Dict[str, Tuple[int, SKUCreate]] = {}
+    skipped: List[Dict[str, Any]] = []
+    for line_no, row in batch:
+        if row.sku_code in latest:
+            skipped.append({"row": latest[row.sku_code][0], "sku_code": row.sku_code, "status": "skipped",
+                            "error": "superseded by a later row with the same sku_code"})
+        latest[row.sku_code] = (line_no, row)
+    return list(latest.values()), skipped
+
+def upsert_batch(db: Session, batch: List[Tuple[int, SKUCreate]]) -> List[Dict[str, Any]]:
+    """Write one batch; returns a result per row. Caller commits."""
+    rows, results = dedupe(batch)
+
+    # Products by title
+    titles = {r.product_title for _, r in rows}
+    product_ids: Dict[str, int] = {}
+    for title, pid in db.execute(
+        select(models.Product.title, models.Product.id).where(models.Product.title.in_(titles)).order_by(models.Product.id)
+    ):
+        product_ids.setdefault(title, pid)
+    new_products: Dict[str, Optional[str]] = {}
+    for _, r in rows:
+        if r.product_title not in product_ids:
+            new_products.setdefault(r.product_title, r.category)
+    if new_products:
+        for title, pid in db.execute(
+            insert(models.Product)
+            .values([{"title": t, "category": c} for t, c in new_products.items()])
+            .returning(models.Product.title, models.Product.id)
+        ):
+            product_ids[title] = pid
+
+    codes = [r.sku_code for _, r in rows]
+    existing = set(db.scalars(select(models.SKU.sku_code).where(models.SKU.sku_code.in_(codes))))
+
+    stmt = upsert_insert(db, models.SKU).values([{
+        "product_id": product_ids[r.product_title],
+        "sku_code": r.sku_code,
+        "size": r.size,
+        "color": r.color,
+        "price_cents": r.price_cents,
+        "cost_cents": r.cost_cents,
+        "active": True,
+    } for _, r in rows])
+    stmt = stmt.on_conflict_do_update(index_elements=["sku_code"], set_={
+        "product_id": stmt.excluded.product_id,
+        "size": stmt.excluded.size,
+        "color": stmt.excluded.color,
+        "price_cents": stmt.excluded.price_cents,
+        "cost_cents": stmt.excluded.cost_cents,
+        "active": stmt.excluded.active,
+    }).returning(models.SKU.sku_code, models.SKU.id)
+    sku_ids = {code: sku_id for code, sku_id in db.execute(stmt)}
+
+    inv = upsert_insert(db, models.Inventory).values([{
+        "sku_id": sku_ids[r.sku_code],
+        "qty_on_hand": max(0, r.qty_on_hand),
+        "qty_reserved": 0,
+        "reorder_level": max(0, r.reorder_level),
+        "bin_location": r.bin_location,
+    } for _, r in rows])
+    db.execute(inv.on_conflict_do_update(index_elements=["sku_id"], set_={
+        "reorder_level": inv.excluded.reorder_level,
+        "bin_location": func.coalesce(inv.excluded.bin_location, models.Inventory.__table__.c.bin_location),
+    }))
+    inventory.record(db, [
+        inventory.Movement(sku_ids[r.sku_code], max(0, r.qty_on_hand), 0, "initial stock", "catalog_import")
+        for _, r in rows if r.sku_code not in existing and r.qty_on_hand > 0
+    ])
+
+    for line_no, r in rows:
+        results.append({"row": line_no, "sku_code": r.sku_code,
+                        "status": "updated" if r.sku_code in existing else "created"})
+    return results
+
+async def run(db: AsyncSession, lines: AsyncIterable[bytes], fmt: str) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    batch: List[Tuple[int, SKUCreate]] = []
+    header: Optional[List[str]] = None
+
+    async def flush():
+        try:
+            results.extend(await db.run_sync(upsert_batch, batch))
+            await db.commit()
+        except Exception as exc:
+            await db.rollback()
+            # Superseded rows were never written, so they stay skipped
+            rows, skipped = dedupe(batch)
+            results.extend(skipped)
+            results.extend({"row": n, "sku_code": r.sku_code, "status": "error", "error": f"batch failed: {exc!r}"[:500]}
+                           for n, r in rows)
+        for _, r in batch:
+            catalog.invalidate(r.sku_code)
+        batch.clear()
+
+    line_no = 0
+    async for raw in lines:
+        if not raw.strip():
+            continue
+        if fmt == "csv" and header is None:
+            # A header byte that isn't UTF-8 only spoils that column name
+            header = [h.strip() for h in next(csv.reader([raw.decode("utf-8", "replace")]))]
+            continue
+        line_no += 1
+        try:
+            line = raw.decode("utf-8").strip()
+            batch.append((line_no, _validate(_parse(fmt, header, line))))
+        except (ValueError, ValidationError, csv.Error) as exc:
+            results.append({"row": line_no, "status": "error", "error": str(exc)[:500]})
+        if len(batch) >= BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    results.sort(key=lambda r: r["row"])
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("created", "updated", "skipped", "error")}
+    return {"ok": counts["error"] == 0, "rows": line_no, **counts, "results": results}
@@ -9,9 +9,84 @@ class Settings(BaseModel):
     admin_api_key: str = os.getenv("ADMIN_API_KEY", "change-me")
 
     database_url: str = os.getenv("DATABASE_URL", "")
+    # Pool per engine and process (Postgres only). Statement timeout 0 = none.
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout_seconds: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    db_pool_recycle_seconds: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    db_statement_timeout_ms: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    # Optional read replica for read-only admin routes. Reads go to the primary
+    # while the replica lags more than DB_REPLICA_MAX_LAG_SECONDS, and for
+    # DB_READ_YOUR_WRITES_SECONDS after the same client made a write.
+    database_replica_url: str = os.getenv("DATABASE_REPLICA_URL", "")
+    db_replica_max_lag_seconds: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+    db_replica_lag_check_seconds: float = float(os.getenv("DB_REPLICA_LAG_CHECK_SECONDS", "1"))
+    db_read_your_writes_seconds: float = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "10"))
 
     shopify_shop_domain: str = os.getenv("SHOPIFY_SHOP_DOMAIN", "")
     shopify_admin_access_token: str = os.getenv("SHOPIFY_ADMIN_ACCESS_TOKEN", "")
     shopify_webhook_secret: str = os.getenv("SHOPIFY_WEBHOOK_SECRET", "")
 
+    # Webhook inbox: ACK after persisting, process in background workers
+    webhook_inbox_enabled: bool = os.getenv("WEBHOOK_INBOX_ENABLED", "false").lower() in ("1", "true", "yes")
+    webhook_workers: int = int(os.getenv("WEBHOOK_WORKERS", "4"))
+    webhook_max_attempts: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+    webhook_retry_base_seconds: float = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "2"))
+    webhook_lease_seconds: float = float(os.getenv("WEBHOOK_LEASE_SECONDS", "60"))
+    webhook_poll_seconds: float = float(os.getenv("WEBHOOK_POLL_SECONDS", "1"))
+    # Per-process memory of handled webhook_ids (0 disables) and how long
+    # webhook_events / finished inbox rows are kept for de-duplication
+    webhook_recent_ids: int = int(os.getenv("WEBHOOK_RECENT_IDS", "100000"))
+    webhook_retention_days: float = float(os.getenv("WEBHOOK_RETENTION_DAYS", "14"))
+
+    # SKU catalog cache (per process; cross-worker invalidation via NOTIFY)
+    sku_cache_max_entries: int = int(os.getenv("SKU_CACHE_MAX_ENTRIES", "50000"))
+    sku_cache_ttl_seconds: float = float(os.getenv("SKU_CACHE_TTL_SECONDS", "300"))
+
+    # Outbound fulfillment sync to the Shopify Admin API. SHOPIFY_API_BASE_URL
+    # defaults to https://<shop domain>; point it at a stub server for testing.
+    # The leaky bucket mirrors Shopify's REST limit (40 calls, 2/s; Plus is 80, 4/s).
+    fulfillment_sync_enabled: bool = os.getenv("FULFILLMENT_SYNC_ENABLED", "false").lower() in ("1", "true", "yes")
+    fulfillment_sync_concurrency: int = int(os.getenv("FULFILLMENT_SYNC_CONCURRENCY", "4"))
+    fulfillment_sync_max_attempts: int = int(os.getenv("FULFILLMENT_SYNC_MAX_ATTEMPTS", "8"))
+    shopify_api_version: str = os.getenv("SHOPIFY_API_VERSION", "2024-07")
+    shopify_api_base_url: str = os.getenv("SHOPIFY_API_BASE_URL", "")
+    shopify_api_bucket_size: int = int(os.getenv("SHOPIFY_API_BUCKET_SIZE", "40"))
+    shopify_api_leak_per_second: float = float(os.getenv("SHOPIFY_API_LEAK_PER_SECOND", "2"))
+
+    # Hot SKUs (flash sales): escrow slots per SKU, units moved from inventory per
+    # refill, and how often each process re-reads which SKUs are hot
+    hot_sku_slots: int = int(os.getenv("HOT_SKU_SLOTS", "16"))
+    hot_sku_refill_units: int = int(os.getenv("HOT_SKU_REFILL_UNITS", "25"))
+    hot_sku_refresh_seconds: float = float(os.getenv("HOT_SKU_REFRESH_SECONDS", "2"))
+
+    # Serialized order responses cached per process, validated against orders.updated_at (0 disables)
+    response_cache_max_entries: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+
+    # Archival: orders in these statuses, untouched for ARCHIVE_AFTER_DAYS, move to
+    # orders_archive ARCHIVE_BATCH_SIZE orders per transaction (see app/archive.py)
+    archive_after_days: float = float(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+    archive_statuses: str = os.getenv("ARCHIVE_STATUSES", "DELIVERED,CANCELLED,RETURNED")
+    archive_batch_size: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+
+    # Create the DB engines, open a connection and load lazy subsystems (PDF, Shopify
+    # client) during startup instead of on the first request that needs them
+    warm_up_on_startup: bool = os.getenv("WARM_UP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+    # Orders per transaction when loading a Shopify bulk-operation export (app/backfill.py)
+    backfill_batch_size: int = int(os.getenv("BACKFILL_BATCH_SIZE", "1000"))
+
+    # Log a warning (and count it in /metrics) when one request runs more SQL statements than this (0 disables)
+    sql_query_warn_threshold: int = int(os.getenv("SQL_QUERY_WARN_THRESHOLD", "50"))
+
+    # Reporting rollups bucket orders by calendar day in this timezone
+    reporting_timezone: str = os.getenv("REPORTING_TIMEZONE", "America/Toronto")
+    # Seconds between in-process folds of pending rollup increments; 0 leaves it to
+    # `python -m app.rollups --fold --every N`
+    rollup_fold_seconds: float = float(os.getenv("ROLLUP_FOLD_SECONDS", "5"))
+
+    # Packing slips: process pool size (0 = one per CPU) and on-disk PDF cache ("" disables)
+    pdf_workers: int = int(os.getenv("PDF_WORKERS", "0"))
+    packing_slip_cache_dir: str = os.getenv("PACKING_SLIP_CACHE_DIR", "/tmp/qbridge-packing-slips")
+
 settings = Settings()
@@ -0,0 +1,178 @@
+import argparse
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, Text, column, delete, func, select, update, values
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, upsert_insert
+from . import models
+
+# Customers and shipping addresses are reused instead of inserted per order.
+# - customers: upserted by shopify_customer_id, or for guest checkouts by
+#   normalized email (partial unique index on email_normalized); no id and no
+#   email means no customer row at all
+# - addresses: cleaned up, then fingerprinted (sha256 of the casefolded fields
+#   plus customer id); a unique index on the fingerprint lets
+#   INSERT ... ON CONFLICT hand back the existing row
+# Rows written before this existed are merged by `python -m app.customers`,
+# which backfills the keys in id-ordered chunks, repoints orders/addresses at
+# the lowest-id survivor and deletes the rest.
+
+log = logging.getLogger(__name__)
+
+_SPACES = re.compile(r"\s+")
+_PUNCT = re.compile(r"[.,#']")
+
+def _clean(value: Optional[str]) -> str:
+    return _SPACES.sub(" ", value or "").strip()
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    email = (email or "").strip().lower()
+    return email or None
+
+def normalize_postal_code(code: Optional[str]) -> str:
+    code = _SPACES.sub("", code or "").upper()
+    # Canadian "A1A1A1" -> "A1A 1A1"
+    if len(code) == 6 and code[::2].isalpha() and code[1::2].isdigit():
+        return f"{code[:3]} {code[3:]}"
+    return code
+
+def clean_address(ship: Dict[str, Any]) -> Dict[str, Any]:
+    """Shopify shipping_address -> addresses columns, whitespace and postal code normalized."""
+    return {
+        "line1": _clean(ship.get("address1")),
+        "line2": _clean(ship.get("address2")) or None,
+        "city": _clean(ship.get("city")),
+        "province": _clean(ship.get("province")),
+        "postal_code": normalize_postal_code(ship.get("zip")),
+        "country": "Canada",
+    }
+
+def address_fingerprint(customer_id: Optional[int], line1: str, line2: Optional[str], city: str,
+                        province: str, postal_code: str, country: str) -> str:
+    parts = [str(customer_id or "")] + [
+        _PUNCT.sub("", _clean(v).casefold()) for v in (line1, line2, city, province, country)
+    ] + [normalize_postal_code(postal_code)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def upsert_customer(db: Session, cust: Dict[str, Any]) -> Optional[int]:
+    """Customer id for a Shopify customer payload, in one statement. None if it carries no identity."""
+    c = models.Customer.__table__.c
+    email = (cust.get("email") or "").strip() or None
+    row = {
+        "shopify_customer_id": int(cust["id"]) if cust.get("id") else None,
+        "email": email,
+        "email_normalized": normalize_email(email),
+        "phone": cust.get("phone"),
+        "first_name": cust.get("first_name"),
+        "last_name": cust.get("last_name"),
+    }
+    stmt = upsert_insert(db, models.Customer).values(**row)
+    # Latest non-empty details win
+    fresh = {k: func.coalesce(stmt.excluded[k], c[k]) for k in ("email", "email_normalized", "phone", "first_name", "last_name")}
+    if row["shopify_customer_id"]:
+        stmt = stmt.on_conflict_do_update(index_elements=["shopify_customer_id"], set_=fresh)
+    elif row["email_normalized"]:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["email_normalized"], index_where=c.shopify_customer_id.is_(None), set_=fresh
+        )
+    else:
+        return None
+    return db.scalar(stmt.returning(models.Customer.id))
+
+def upsert_address(db: Session, customer_id: Optional[int], ship: Dict[str, Any]) -> Tuple[int, str]:
+    """(address id, province), reusing an identical address of the same customer."""
+    fields = clean_address(ship)
+    fingerprint = address_fingerprint(customer_id, **fields)
+    stmt = upsert_insert(db, models.Address).values(customer_id=customer_id, fingerprint=fingerprint, **fields)
+    # No-op update so RETURNING also yields the existing row
+    stmt = stmt.on_conflict_do_update(index_elements=["fingerprint"], set_={"fingerprint": stmt.excluded.fingerprint})
+    return db.execute(stmt.returning(models.Address.id, models.Address.province)).one()
+
+# --------- One-off merge of rows written before de-duplication ---------
+
+def _repoint(db: Session, table, col, mapping: Dict[int, int]):
+    v = values(column("old_id", BigInteger), column("new_id", BigInteger), name="v").data(list(mapping.items()))
+    db.execute(update(table).where(col == v.c.old_id).values({col: v.c.new_id}).execution_options(synchronize_session=False))
+
+def _set_keys(db: Session, table, col, keys: Dict[int, str]):
+    v = values(column("id", BigInteger), column("key", Text), name="v").data(list(keys.items()))
+    db.execute(update(table).where(table.id == v.c.id).values({col: v.c.key}).execution_options(synchronize_session=False))
+
+def _split(keys: Dict[int, Optional[str]], holders: Dict[str, int]):
+    """(rows that keep their key, duplicate id -> surviving id); holders gains the new survivors."""
+    keep: Dict[int, str] = {}
+    merge: Dict[int, int] = {}
+    for row_id, key in keys.items():
+        if not key:
+            continue
+        survivor = holders.setdefault(key, row_id)
+        if survivor == row_id:
+            keep[row_id] = key
+        else:
+            merge[row_id] = survivor
+    return keep, merge
+
+def _merge_customers(db: Session, rows: List[Any]) -> int:
+    c = models.Customer
+    keys = {r.id: normalize_email(r.email) for r in rows}
+    wanted = {k for k in keys.values() if k}
+    holders = dict(db.execute(
+        select(c.email_normalized, func.min(c.id)).where(c.email_normalized.in_(wanted), c.shopify_customer_id.is_(None))
+        .group_by(c.email_normalized)
+    ).all()) if wanted else {}
+    keep, merge = _split(keys, holders)
+    if keep:
+        _set_keys(db, c, c.email_normalized, keep)
+    if merge:
+        _repoint(db, models.Order, models.Order.customer_id, merge)
+        _repoint(db, models.Address, models.Address.customer_id, merge)
+        db.execute(delete(c).where(c.id.in_(merge)))
+    return len(merge)
+
+def _merge_addresses(db: Session, rows: List[Any]) -> int:
+    a = models.Address
+    keys = {r.id: address_fingerprint(r.customer_id, r.line1, r.line2, r.city, r.province, r.postal_code, r.country)
+            for r in rows}
+    holders = dict(db.execute(
+        select(a.fingerprint, func.min(a.id)).where(a.fingerprint.in_(set(keys.values()))).group_by(a.fingerprint)
+    ).all())
+    keep, merge = _split(keys, holders)
+    if keep:
+        _set_keys(db, a, a.fingerprint, keep)
+    if merge:
+        _repoint(db, models.Order, models.Order.shipping_address_id, merge)
+        db.execute(delete(a).where(a.id.in_(merge)))
+    return len(merge)
+
+def dedupe(chunk_size: int = 5000) -> Dict[str, int]:
+    """Backfill keys and merge duplicates, one transaction per chunk. Safe to re-run."""
+    merged = {"customers": 0, "addresses": 0}
+    # Customers first: address fingerprints include the (surviving) customer id
+    c, a = models.Customer, models.Address
+    for name, model, cols, pending, merge in (
+        ("customers", c, (c.id, c.email), [c.shopify_customer_id.is_(None), c.email_normalized.is_(None), c.email.is_not(None)], _merge_customers),
+        ("addresses", a, (a.id, a.customer_id, a.line1, a.line2, a.city, a.province, a.postal_code, a.country),
+         [a.fingerprint.is_(None)], _merge_addresses),
+    ):
+        last = 0
+        with SessionLocal() as db:
+            while True:
+                rows = db.execute(select(*cols).where(model.id > last, *pending).order_by(model.id).limit(chunk_size)).all()
+                if not rows:
+                    break
+                merged[name] += merge(db, rows)
+                db.commit()
+                last = rows[-1].id
+                log.info("%s: checked through id %d, %d merged so far", name, last, merged[name])
+    return merged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge duplicate customers and addresses")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(dedupe(args.chunk_size))
@@ -1,9 +1,87 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker, DeclarativeBase, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from fastapi import Request
+from typing import Any, Dict
+import logging
+import threading
+import time
 from .config import settings
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+log = logging.getLogger(__name__)
+
+def async_url(url: str) -> str:
+    """Same database, async driver (psycopg 3 serves both sync and async)."""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    if url.startswith(("postgresql://", "postgres://")):
+        return "postgresql+psycopg://" + url.split("://", 1)[1]
+    return url
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """Pool sizing and statement timeout from settings (SQLite keeps SQLAlchemy's defaults)."""
+    opts: Dict[str, Any] = {"pool_pre_ping": True}
+    if url.startswith("sqlite"):
+        return opts
+    opts.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+    )
+    if settings.db_statement_timeout_ms:
+        opts["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    return opts
+
+# Engines (and their DB drivers) are created on first use, i.e. the first session
+# or the first access to db.engine / db.async_engine / db.replica_engine, not
+# at import, so a worker starts without touching database setup. The session
+# factories below can be imported and held as usual; main.warm_up() creates the
+# engines ahead of traffic.
+_engine_lock = threading.Lock()
+_engines_ready = False
+
+def ensure_engines():
+    global engine, async_engine, replica_engine, _engines_ready
+    if _engines_ready:
+        return
+    with _engine_lock:
+        if _engines_ready:
+            return
+        # Sync engine: background workers and scripts
+        engine = create_engine(settings.database_url, **engine_options(settings.database_url))
+        SessionLocal.configure(bind=engine)
+        # Async engine: FastAPI routes, so DB round trips never block the event loop
+        async_engine = create_async_engine(async_url(settings.database_url), **engine_options(settings.database_url))
+        AsyncSessionLocal.configure(bind=async_engine)
+        # Optional replica for read-only routes (get_async_read_db)
+        replica_engine = None
+        if AsyncReplicaSessionLocal is not None:
+            replica_engine = create_async_engine(async_url(settings.database_replica_url), **engine_options(settings.database_replica_url))
+            AsyncReplicaSessionLocal.configure(bind=replica_engine)
+        _engines_ready = True
+
+def __getattr__(name: str):
+    if name in ("engine", "async_engine", "replica_engine"):
+        ensure_engines()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        ensure_engines()
+        return super().__call__(**local_kw)
+
+class LazyAsyncSessionmaker(async_sessionmaker):
+    def __call__(self, **local_kw):
+        ensure_engines()
+        return super().__call__(**local_kw)
+
+SessionLocal = LazySessionmaker(autoflush=False, autocommit=False)
+AsyncSessionLocal = LazyAsyncSessionmaker(autoflush=False, expire_on_commit=False)
+AsyncReplicaSessionLocal = LazyAsyncSessionmaker(autoflush=False, expire_on_commit=False) if settings.database_replica_url else None
 
 class Base(DeclarativeBase):
     pass
@@ -14,3 +92,85 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# --------- Read routing ---------
+# A client that just wrote gets a cookie holding "read the primary until <unix time>"
+# (set by the middleware in main.py), so it sees its own writes. Everyone else
+# reads the replica unless its measured lag is over the limit.
+
+READ_PRIMARY_COOKIE = "qbridge_read_primary_until"
+# Postgres replay lag; 0 when fully replayed or when the "replica" is not in recovery (two plain local databases)
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class ReplicaLag:
+    """Replica lag in seconds, measured at most every DB_REPLICA_LAG_CHECK_SECONDS."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.checked_at = float("-inf")
+
+    async def get(self) -> float:
+        now = time.monotonic()
+        if now - self.checked_at < settings.db_replica_lag_check_seconds:
+            return self.seconds
+        self.checked_at = now  # concurrent callers keep using the previous value meanwhile
+        ensure_engines()
+        if replica_engine.dialect.name != "postgresql":
+            self.seconds = 0.0
+            return self.seconds
+        try:
+            async with replica_engine.connect() as conn:
+                self.seconds = float(await conn.scalar(REPLICA_LAG_SQL) or 0.0)
+        except Exception:
+            log.exception("replica lag check failed; reading from the primary")
+            self.seconds = float("inf")
+        return self.seconds
+
+replica_lag = ReplicaLag()
+read_routes: Dict[str, int] = {"replica": 0, "primary_no_replica": 0, "primary_own_write": 0, "primary_replica_lag": 0}
+
+def read_primary_until(request: Request) -> float:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE) or 0)
+    except ValueError:
+        return 0.0
+
+async def read_target(request: Request) -> str:
+    if AsyncReplicaSessionLocal is None:
+        return "primary_no_replica"
+    if read_primary_until(request) > time.time():
+        return "primary_own_write"
+    if await replica_lag.get() > settings.db_replica_max_lag_seconds:
+        return "primary_replica_lag"
+    return "replica"
+
+async def read_sessionmaker(request: Request) -> async_sessionmaker:
+    """The replica's session factory when configured and fresh enough, else the primary's."""
+    target = await read_target(request)
+    read_routes[target] += 1
+    return AsyncReplicaSessionLocal if target == "replica" else AsyncSessionLocal
+
+async def get_async_read_db(request: Request):
+    """Session for read-only routes (see read_sessionmaker)."""
+    async with (await read_sessionmaker(request))() as db:
+        yield db
+
+def pool_status() -> Dict[str, str]:
+    ensure_engines()
+    out = {"primary": async_engine.pool.status(), "sync": engine.pool.status()}
+    if replica_engine is not None:
+        out["replica"] = replica_engine.pool.status()
+    return out
+
+def upsert_insert(db: Session, entity):
+    """Dialect-specific ``insert()`` supporting ON CONFLICT for the session's database."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(entity)
+    return pg_insert(entity)
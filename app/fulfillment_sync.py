@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import Enum, case, cast, select, update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import AsyncSessionLocal, upsert_insert
+from . import models
+from .lazy import LazyModule
+
+# Outbound fulfillment sync (shipments -> Shopify fulfillments with tracking).
+# enqueue() upserts one fulfillment_sync row per order in the caller's
+# transaction, so any number of shipment edits before the worker gets there
+# collapse into a single push of the latest state (version counts the edits).
+# The worker claims ready rows in batches, pushes them concurrently through one
+# pooled ShopifyClient (leaky-bucket limited), and marks a row DONE only if no
+# newer edit arrived meanwhile. Failures back off exponentially; 4xx other than
+# 429 and exhausted attempts park the row as DEAD.
+# Run in-process (FULFILLMENT_SYNC_ENABLED=true) or `python -m app.fulfillment_sync`.
+
+log = logging.getLogger(__name__)
+
+# httpx and the client load when the worker starts, not when routes import enqueue()
+shopify_api = LazyModule("app.shopify_api")
+
+S = models.InboxStatus
+LEASE_SECONDS = 120
+MAX_BACKOFF_SECONDS = 900
+BASE_BACKOFF_SECONDS = 2
+POLL_SECONDS = 1.0
+# The column maps as VARCHAR, but schema.sql declares the native enum; a CASE yields
+# varchar, which Postgres won't assign to it without an explicit cast.
+STATUS_TYPE = Enum(S, name="inbox_status", create_type=False)
+
+@dataclass
+class SyncJob:
+    id: int
+    order_id: int
+    shipment_id: int
+    version: int
+    attempts: int
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def enqueue(db: Session, order_id: int, shipment_id: int):
+    """Queue (or re-queue) the order's shipment for sync. Caller commits."""
+    fs = models.FulfillmentSync
+    stmt = upsert_insert(db, fs).values(
+        order_id=order_id, shipment_id=shipment_id, version=1, status=S.PENDING, attempts=0, next_attempt_at=_now(),
+    )
+    db.execute(stmt.on_conflict_do_update(index_elements=["order_id"], set_={
+        "shipment_id": stmt.excluded.shipment_id,
+        "version": fs.__table__.c.version + 1,
+        # A row being pushed right now stays leased; the worker re-queues it when it sees the new version
+        "status": cast(case((fs.__table__.c.status == S.PROCESSING.value, S.PROCESSING.value), else_=S.PENDING.value), STATUS_TYPE),
+        "attempts": 0,
+        "next_attempt_at": case((fs.__table__.c.status == S.PROCESSING.value, fs.__table__.c.next_attempt_at), else_=stmt.excluded.next_attempt_at),
+        "last_error": None,
+        "updated_at": _now(),
+    }))
+
+async def claim(limit: int) -> List[SyncJob]:
+    fs = models.FulfillmentSync
+    now = _now()
+    async with AsyncSessionLocal() as db:
+        ids = list(await db.scalars(
+            select(fs.id)
+            .where(fs.status.in_((S.PENDING, S.PROCESSING)), fs.next_attempt_at <= now)
+            .order_by(fs.next_attempt_at, fs.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ))
+        if not ids:
+            await db.rollback()
+            return []
+        # Guarded on next_attempt_at so each row is leased once even without row locks
+        rows = (await db.execute(
+            update(fs)
+            .where(fs.id.in_(ids), fs.status.in_((S.PENDING, S.PROCESSING)), fs.next_attempt_at <= now)
+            .values(status=S.PROCESSING, attempts=fs.attempts + 1, next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+            .returning(fs.id, fs.order_id, fs.shipment_id, fs.version, fs.attempts)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await db.commit()
+    return [SyncJob(*r) for r in rows]
+
+def _tracking(shipment: models.Shipment) -> dict:
+    info = {"number": shipment.tracking_number}
+    if shipment.carrier:
+        info["company"] = shipment.carrier
+    return info
+
+async def push(client: "shopify_api.ShopifyClient", job: SyncJob):
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(models.Order.shopify_order_id, models.Shipment)
+            .join(models.Shipment, models.Shipment.order_id == models.Order.id)
+            .where(models.Shipment.id == job.shipment_id)
+        )).first()
+        if row is None or row.shopify_order_id is None:
+            raise shopify_api.ShopifyAPIError(0, "order has no Shopify id", retryable=False)
+        shopify_order_id, shipment = row
+        tracking = _tracking(shipment)
+        if shipment.shopify_fulfillment_id:
+            await client.update_tracking(shipment.shopify_fulfillment_id, tracking)
+            return
+        open_orders = await client.open_fulfillment_orders(shopify_order_id)
+        if not open_orders:
+            raise shopify_api.ShopifyAPIError(0, "no open fulfillment orders", retryable=False)
+        fulfillment = await client.create_fulfillment([fo["id"] for fo in open_orders], tracking)
+        shipment.shopify_fulfillment_id = fulfillment.get("id")
+        await db.commit()
+
+async def _finish(job: SyncJob):
+    fs = models.FulfillmentSync
+    async with AsyncSessionLocal() as db:
+        done = (await db.execute(
+            update(fs).where(fs.id == job.id, fs.version == job.version)
+            .values(status=S.DONE, processed_at=_now(), last_error=None)
+        )).rowcount
+        if not done:
+            # Edited while we were pushing: send the newer state next
+            await db.execute(update(fs).where(fs.id == job.id).values(status=S.PENDING, attempts=0, next_attempt_at=_now()))
+        await db.commit()
+
+async def _fail(job: SyncJob, exc: "shopify_api.ShopifyAPIError"):
+    values = {"last_error": str(exc)[:2000]}
+    if not exc.retryable or job.attempts >= settings.fulfillment_sync_max_attempts:
+        values.update(status=S.DEAD, processed_at=_now())
+        log.error("fulfillment sync for order %d failed permanently: %s", job.order_id, exc)
+    else:
+        delay = min(BASE_BACKOFF_SECONDS * 2 ** (job.attempts - 1), MAX_BACKOFF_SECONDS)
+        values.update(status=S.PENDING, next_attempt_at=_now() + timedelta(seconds=delay))
+        log.warning("fulfillment sync for order %d failed (attempt %d), retrying in %ds: %s",
+                    job.order_id, job.attempts, delay, exc)
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(models.FulfillmentSync).where(models.FulfillmentSync.id == job.id).values(**values))
+        await db.commit()
+
+async def process(client: "shopify_api.ShopifyClient", job: SyncJob):
+    try:
+        await push(client, job)
+    except shopify_api.ShopifyAPIError as exc:
+        await _fail(job, exc)
+    except Exception as exc:
+        await _fail(job, shopify_api.ShopifyAPIError(0, repr(exc), retryable=True))
+    else:
+        await _finish(job)
+
+async def drain(client: "shopify_api.ShopifyClient", concurrency: Optional[int] = None) -> int:
+    """Process ready rows until none are left. Returns how many pushes were attempted."""
+    size = concurrency or settings.fulfillment_sync_concurrency
+    total = 0
+    while True:
+        jobs = await claim(size)
+        if not jobs:
+            return total
+        await asyncio.gather(*(process(client, job) for job in jobs))
+        total += len(jobs)
+
+async def run_forever(client: Optional["shopify_api.ShopifyClient"] = None):
+    client = client or shopify_api.ShopifyClient(max_connections=settings.fulfillment_sync_concurrency)
+    try:
+        while True:
+            try:
+                await drain(client)
+            except Exception:
+                log.exception("fulfillment sync error")
+            await asyncio.sleep(POLL_SECONDS)
+    finally:
+        await client.aclose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_forever())
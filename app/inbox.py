@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, aliased
+
+from .config import settings
+from .db import SessionLocal, upsert_insert
+from . import models, webhooks, catalog, jsonutil, metrics
+
+# Durable webhook inbox.
+# The HTTP route verifies the HMAC, stores the raw delivery here and ACKs.
+# Workers claim rows with FOR UPDATE SKIP LOCKED, one shopify_order_id at a
+# time in arrival order, and run the same handlers as the synchronous path.
+# Failures are retried with exponential backoff until webhook_max_attempts,
+# then parked as DEAD. Run workers in-process (WEBHOOK_INBOX_ENABLED=true) or
+# standalone with `python -m app.inbox`.
+
+log = logging.getLogger(__name__)
+
+ACTIVE = (models.InboxStatus.PENDING, models.InboxStatus.PROCESSING)
+MAX_BACKOFF_SECONDS = 900
+
+@dataclass
+class InboxJob:
+    id: int
+    webhook_id: str
+    topic: str
+    shop_domain: str
+    headers: Dict[str, Any]
+    body: bytes
+    attempts: int
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _order_id(raw: bytes) -> Optional[int]:
+    try:
+        return int(jsonutil.loads(raw)["id"])
+    except Exception:
+        return None
+
+def enqueue(db: Session, topic: str, webhook_id: str, shop_domain: str, headers: Dict[str, str], raw: bytes) -> bool:
+    """Persist a verified delivery. Returns False if this webhook_id was already received."""
+    inbox = models.WebhookInbox
+    stmt = (
+        upsert_insert(db, inbox)
+        .values(
+            webhook_id=webhook_id,
+            topic=topic,
+            shop_domain=shop_domain,
+            shopify_order_id=_order_id(raw),
+            headers=headers,
+            body=raw,
+            status=models.InboxStatus.PENDING,
+            attempts=0,
+            next_attempt_at=_now(),
+        )
+        .on_conflict_do_nothing(index_elements=["webhook_id"])
+        .returning(inbox.id)
+    )
+    inserted = db.scalar(stmt) is not None
+    db.commit()
+    if inserted and _pool:
+        _pool.notify()
+    return inserted
+
+def claim(db: Session) -> Optional[InboxJob]:
+    """Lease the oldest ready row whose order has no earlier unfinished delivery."""
+    inbox = models.WebhookInbox
+    earlier = aliased(models.WebhookInbox)
+    now = _now()
+    blocked = (
+        select(earlier.id)
+        .where(
+            earlier.shopify_order_id == inbox.shopify_order_id,
+            earlier.id < inbox.id,
+            earlier.status.in_(ACTIVE),
+        )
+        .exists()
+    )
+    row = db.execute(
+        select(inbox.id, inbox.webhook_id, inbox.topic, inbox.shop_domain, inbox.headers, inbox.body, inbox.attempts)
+        .where(inbox.status.in_(ACTIVE), inbox.next_attempt_at <= now, ~blocked)
+        .order_by(inbox.id)
+        .limit(1)
+        .with_for_update(skip_locked=True, of=inbox)
+    ).first()
+    if row is None:
+        db.rollback()
+        return None
+
+    # Compare-and-set on attempts so a row is leased once even without row locks
+    leased = db.execute(
+        update(inbox)
+        .where(inbox.id == row.id, inbox.attempts == row.attempts)
+        .values(
+            status=models.InboxStatus.PROCESSING,
+            attempts=row.attempts + 1,
+            next_attempt_at=now + timedelta(seconds=settings.webhook_lease_seconds),
+        )
+    ).rowcount
+    if not leased:
+        db.rollback()
+        return None
+    job = InboxJob(
+        id=row.id, webhook_id=row.webhook_id, topic=row.topic, shop_domain=row.shop_domain,
+        headers=row.headers or {}, body=row.body, attempts=row.attempts + 1,
+    )
+    db.commit()
+    return job
+
+def _finish(db: Session, job: InboxJob):
+    db.execute(
+        update(models.WebhookInbox)
+        .where(models.WebhookInbox.id == job.id)
+        .values(status=models.InboxStatus.DONE, processed_at=_now(), last_error=None)
+    )
+    db.commit()
+
+def _fail(db: Session, job: InboxJob, exc: Exception):
+    now = _now()
+    values: Dict[str, Any] = {"last_error": repr(exc)[:2000]}
+    if job.attempts >= settings.webhook_max_attempts:
+        values.update(status=models.InboxStatus.DEAD, processed_at=now)
+        log.error("webhook %s dead-lettered after %d attempts: %r", job.webhook_id, job.attempts, exc)
+    else:
+        delay = min(settings.webhook_retry_base_seconds * 2 ** (job.attempts - 1), MAX_BACKOFF_SECONDS)
+        values.update(status=models.InboxStatus.PENDING, next_attempt_at=now + timedelta(seconds=delay))
+        log.warning("webhook %s failed (attempt %d), retrying in %.0fs: %r", job.webhook_id, job.attempts, delay, exc)
+    db.execute(update(models.WebhookInbox).where(models.WebhookInbox.id == job.id).values(**values))
+    db.commit()
+
+def process_next() -> bool:
+    """Claim and process one inbox row. Returns False when nothing is ready."""
+    with SessionLocal() as db:
+        job = claim(db)
+    if job is None:
+        return False
+
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        try:
+            _, _, topic = webhooks.webhook_meta(job.headers, job.topic)
+            payload = jsonutil.loads(job.body)
+            result = webhooks.HANDLERS[job.topic](
+                db, payload, webhook_id=job.webhook_id, shop_domain=job.shop_domain, topic=topic
+            )
+        except Exception as exc:
+            db.rollback()
+            _fail(db, job, exc)
+            metrics.record_webhook(job.topic, "error", time.perf_counter() - start, via="inbox")
+        else:
+            _finish(db, job)
+            metrics.record_webhook(job.topic, metrics.webhook_outcome(result), time.perf_counter() - start, via="inbox")
+    return True
+
+class InboxWorkerPool:
+    """Fixed-size pool of threads draining the inbox."""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        global _pool
+        _pool = self
+        for i in range(self.size):
+            t = threading.Thread(target=self._run, name=f"inbox-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self, timeout: float = 10.0):
+        global _pool
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+        if _pool is self:
+            _pool = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                busy = process_next()
+            except Exception:
+                log.exception("inbox worker error")
+                busy = False
+            if not busy:
+                self._wake.wait(settings.webhook_poll_seconds)
+                self._wake.clear()
+
+_pool: Optional[InboxWorkerPool] = None
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    catalog.start_listener()
+    pool = InboxWorkerPool(settings.webhook_workers)
+    pool.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,233 @@
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import BigInteger, Integer, select, update, insert, delete, func, values, column
+from sqlalchemy.orm import Session
+from .config import settings
+from .db import upsert_insert
+from . import models, catalog
+
+# All stock changes go through apply_deltas (one conditional UPDATE ... FROM VALUES)
+# and are written to the append-only inventory_movements ledger with record().
+# apply_deltas also appends to stock_alerts whenever available stock
+# (on hand - reserved) crosses a SKU's reorder_level, in the same transaction.
+
+class Movement(NamedTuple):
+    sku_id: int
+    delta_on_hand: int = 0
+    delta_reserved: int = 0
+    reason: Optional[str] = None
+    source: str = "adjust"
+    order_id: Optional[int] = None
+
+def resolve_sku_ids(db: Session, sku_codes: Iterable[Optional[str]]) -> Dict[str, int]:
+    """Map sku_code -> sku_id for every known code (served from the catalog cache)."""
+    return {code: entry.sku_id for code, entry in catalog.lookup_many(db, sku_codes).items()}
+
+def net_deltas(movements: Iterable[Movement]) -> Dict[int, Tuple[int, int]]:
+    """Sum movements per SKU into (delta_on_hand, delta_reserved)."""
+    out: Dict[int, Tuple[int, int]] = {}
+    for m in movements:
+        on_hand, reserved = out.get(m.sku_id, (0, 0))
+        out[m.sku_id] = (on_hand + m.delta_on_hand, reserved + m.delta_reserved)
+    return out
+
+def low_stock_filter():
+    """Matches the partial index idx_inventory_low_stock."""
+    inv = models.Inventory
+    return inv.qty_on_hand - inv.qty_reserved < inv.reorder_level
+
+def _crossings(deltas: Dict[int, Tuple[int, int]], rows) -> List[Dict]:
+    alerts = []
+    for sku_id, on_hand, reserved, reorder_level in rows:
+        d_on_hand, d_reserved = deltas[sku_id]
+        before = (on_hand - d_on_hand) - (reserved - d_reserved)
+        after = on_hand - reserved
+        if (before < reorder_level) != (after < reorder_level):
+            alerts.append({
+                "sku_id": sku_id,
+                "kind": "LOW" if after < reorder_level else "RECOVERED",
+                "available": after,
+                "reorder_level": reorder_level,
+            })
+    return alerts
+
+def apply_deltas(
+    db: Session, deltas: Dict[int, Tuple[int, int]], require_available: bool = False
+) -> Dict[int, Tuple[int, int]]:
+    """Apply per-SKU (delta_on_hand, delta_reserved) in a single conditional UPDATE.
+
+    A SKU is skipped if either quantity would go negative or, with
+    require_available, if reserved would exceed on-hand. Returns the new
+    (qty_on_hand, qty_reserved) of every SKU that was updated.
+    """
+    if not deltas:
+        return {}
+    v = values(
+        column("sku_id", BigInteger), column("d_on_hand", Integer), column("d_reserved", Integer), name="v"
+    ).data([(sku_id, d_on_hand, d_reserved) for sku_id, (d_on_hand, d_reserved) in deltas.items()])
+    inv = models.Inventory
+    new_on_hand = inv.qty_on_hand + v.c.d_on_hand
+    new_reserved = inv.qty_reserved + v.c.d_reserved
+    conditions = [inv.sku_id == v.c.sku_id, new_on_hand >= 0, new_reserved >= 0]
+    if require_available:
+        conditions.append(new_on_hand >= new_reserved)
+    rows = db.execute(
+        update(inv)
+        .where(*conditions)
+        .values(qty_on_hand=new_on_hand, qty_reserved=new_reserved, updated_at=func.now())
+        .returning(inv.sku_id, inv.qty_on_hand, inv.qty_reserved, inv.reorder_level)
+        .execution_options(synchronize_session=False)
+    ).all()
+    alerts = _crossings(deltas, rows)
+    if alerts:
+        db.execute(insert(models.StockAlert), alerts)
+    return {sku_id: (on_hand, reserved) for sku_id, on_hand, reserved, _ in rows}
+
+def record(db: Session, movements: List[Movement]):
+    """Append movements to the ledger in one batched INSERT."""
+    if movements:
+        db.execute(insert(models.InventoryMovement), [m._asdict() for m in movements])
+
+def adjust(db: Session, movements: List[Movement]) -> Dict[int, Tuple[int, int]]:
+    """Apply manual adjustments, netted per SKU; SKUs that would go negative are rejected as a whole."""
+    applied = apply_deltas(db, net_deltas(movements))
+    record(db, [m for m in movements if m.sku_id in applied])
+    return applied
+
+def reserve_order(db: Session, order_id: int, qty_by_sku: Dict[int, int]) -> int:
+    """Reserve stock for all lines of an order in one conditional UPDATE.
+
+    Hot SKUs reserve from their escrow slots instead (see below). SKUs without
+    enough available stock are left unreserved. Returns the number of SKUs
+    reserved against.
+    """
+    wanted = {sku_id: qty for sku_id, qty in qty_by_sku.items() if qty > 0}
+    hot_ids = hot.get(db) if wanted else frozenset()
+    deltas = {sku_id: (0, qty) for sku_id, qty in wanted.items() if sku_id not in hot_ids}
+    applied = apply_deltas(db, deltas, require_available=True)
+    record(db, [Movement(sku_id, 0, qty_by_sku[sku_id], "reserve", "order", order_id) for sku_id in applied])
+    return len(applied) + sum(1 for sku_id, qty in wanted.items() if sku_id in hot_ids and reserve_hot(db, sku_id, qty))
+
+def consume_order(db: Session, order_id: int) -> int:
+    """Release a paid order's reservation and decrement on-hand stock."""
+    # Joined on sku_code so rows written before sku_id was populated still resolve
+    lines = (
+        select(models.SKU.id.label("sku_id"), func.sum(models.OrderItem.qty).label("qty"))
+        .join(models.SKU, models.SKU.sku_code == models.OrderItem.sku_code)
+        .where(models.OrderItem.order_id == order_id, models.OrderItem.qty > 0)
+        .group_by(models.SKU.id)
+        .subquery()
+    )
+    inv = models.Inventory
+    current = db.execute(
+        select(inv.sku_id, lines.c.qty, inv.qty_on_hand, inv.qty_reserved)
+        .join(lines, lines.c.sku_id == inv.sku_id)
+        .with_for_update(of=inv)
+    ).all()
+    # Ensure we do not go negative; the ledger records what was actually applied
+    movements = [
+        Movement(sku_id, -min(qty, on_hand), -min(qty, reserved), "paid", "order", order_id)
+        for sku_id, qty, on_hand, reserved in current
+    ]
+    movements = [m for m in movements if m.delta_on_hand or m.delta_reserved]
+    applied = apply_deltas(db, net_deltas(movements))
+    record(db, [m for m in movements if m.sku_id in applied])
+    return len(applied)
+
+# --------- Hot SKUs (escrow slots) ---------
+# Every reservation of a flash-sale SKU would update the same inventory row and
+# hold its lock until the order's transaction commits, so orders queue behind
+# each other. For SKUs marked hot, stock is moved into inventory_escrow slots in
+# chunks of hot_sku_refill_units (counted as reserved on the inventory row and
+# written to the ledger), and each order takes its units from a slot nobody else
+# holds (FOR UPDATE SKIP LOCKED). Only refills touch the inventory row. Every
+# step is a conditional UPDATE, so no interleaving can oversell. An order's
+# units come from one slot; draws from escrow are not in the ledger (the refill
+# that put them there is).
+
+class HotSKUs:
+    """Per-process view of which SKUs have escrow slots, re-read every hot_sku_refresh_seconds."""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._ids: FrozenSet[int] = frozenset()
+        self._loaded_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> FrozenSet[int]:
+        if time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return self._ids
+        ids = frozenset(db.scalars(select(models.InventoryEscrow.sku_id).distinct()))
+        with self._lock:
+            self._ids, self._loaded_at = ids, time.monotonic()
+        return ids
+
+    def reset(self):
+        with self._lock:
+            self._loaded_at = float("-inf")
+
+hot = HotSKUs(settings.hot_sku_refresh_seconds)
+
+MAX_SLOTS = 256
+
+def _slot_update(db: Session, sku_id: int, delta: int, skip_locked: bool, need: int = 0, emptiest: bool = False) -> bool:
+    """Add delta to one slot of sku_id holding at least need units. False if no such slot."""
+    e = models.InventoryEscrow
+    pick = (
+        select(e.slot)
+        .where(e.sku_id == sku_id, e.qty >= need)
+        # Random order spreads concurrent draws over the slots
+        .order_by(*((e.qty, e.slot) if emptiest else (func.random(),)))
+        .limit(1)
+        .with_for_update(skip_locked=skip_locked)
+        .scalar_subquery()
+    )
+    return db.execute(
+        update(e)
+        .where(e.sku_id == sku_id, e.slot == pick, e.qty >= need)
+        .values(qty=e.qty + delta)
+        .returning(e.slot)
+        .execution_options(synchronize_session=False)
+    ).first() is not None
+
+def _refill(db: Session, sku_id: int, qty: int) -> bool:
+    """Move a chunk from inventory into escrow, keeping qty of it for the caller."""
+    inv = models.Inventory
+    row = db.execute(select(inv.qty_on_hand, inv.qty_reserved).where(inv.sku_id == sku_id).with_for_update()).first()
+    if row is None:
+        return False
+    moved = min(max(settings.hot_sku_refill_units, qty), row.qty_on_hand - row.qty_reserved)
+    if moved < qty or not apply_deltas(db, {sku_id: (0, moved)}, require_available=True):
+        return False
+    spare = moved - qty
+    if spare and not (_slot_update(db, sku_id, spare, skip_locked=True, emptiest=True)
+                      or _slot_update(db, sku_id, spare, skip_locked=False, emptiest=True)):
+        # Escrow was switched off meanwhile: only keep what this order needs
+        apply_deltas(db, {sku_id: (0, -spare)})
+        moved = qty
+    record(db, [Movement(sku_id, 0, moved, "escrow refill", "hot_sku")])
+    return True
+
+def reserve_hot(db: Session, sku_id: int, qty: int) -> bool:
+    # Free slot first; then refill from inventory; finally wait for a busy slot that still has stock
+    return (_slot_update(db, sku_id, -qty, skip_locked=True, need=qty)
+            or _refill(db, sku_id, qty)
+            or _slot_update(db, sku_id, -qty, skip_locked=False, need=qty))
+
+def enable_hot(db: Session, sku_id: int, slots: int) -> None:
+    """Give sku_id escrow slots (empty; the first reservations fill them). Caller commits."""
+    e = models.InventoryEscrow
+    db.execute(upsert_insert(db, e).values([{"sku_id": sku_id, "slot": i, "qty": 0} for i in range(min(slots, MAX_SLOTS))])
+               .on_conflict_do_nothing(index_elements=["sku_id", "slot"]))
+    hot.reset()
+
+def disable_hot(db: Session, sku_id: int) -> int:
+    """Drop sku_id's slots and hand their units back to available stock. Caller commits."""
+    e = models.InventoryEscrow
+    left = sum(db.scalars(delete(e).where(e.sku_id == sku_id).returning(e.qty)))
+    if left:
+        apply_deltas(db, {sku_id: (0, -left)})
+        record(db, [Movement(sku_id, 0, -left, "escrow return", "hot_sku")])
+    hot.reset()
+    return left
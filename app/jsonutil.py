@@ -0,0 +1,39 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON on the hot paths (webhook bodies, order listings/exports).
+# orjson parses bytes without a str copy and serializes datetimes/enums natively;
+# without it we fall back to the stdlib with the same output shape.
+
+def _default(obj: Any):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, separators=(",", ":"), default=_default, ensure_ascii=False).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for plain dicts/lists; skips jsonable_encoder when returned directly."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
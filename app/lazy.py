@@ -0,0 +1,34 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Optional
+
+# Heavy optional subsystems (PDF rendering, the Shopify Admin API client) are
+# bound to a LazyModule instead of imported, so a worker can serve /health and
+# webhooks before paying for them. The first attribute access imports the real
+# module; main.warm_up() can do that ahead of traffic.
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<LazyModule {self._name!r} {'loaded' if self.loaded else 'not loaded'}>"
@@ -1,19 +1,85 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import select
-from datetime import datetime, timezone
-import json
-import uuid
+from collections import defaultdict
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from typing import Literal
+import asyncio
+import base64
+import csv
+import io
+import time
 
 from .config import settings
-from .db import get_db
-from . import models
-from .schemas import SKUCreate, SKUOut, InventoryAdjust, OrderOut
-from .shopify import verify_shopify_hmac, money_to_cents
-from .pdf import build_packing_slip
-
-app = FastAPI(title="QBridge OMS MVP", version="0.1.0")
+from .db import get_async_db, get_async_read_db, AsyncSessionLocal, AsyncReplicaSessionLocal
+from . import db as database
+from . import archive, models, search, webhooks, inbox, catalog, catalog_import, inventory, rollups, jsonutil, metrics, order_status, fulfillment_sync, picking, response_cache
+from .schemas import SKUCreate, SKUOut, InventoryAdjust, InventoryAdjustBatch, HotSKUIn, OrderOut, OrderStatusBatch, ShipmentIn, PickWaveRequest, PackingSlipBatch, sku_out, order_out
+from .shopify import verify_shopify_hmac
+from .lazy import LazyModule
+
+# reportlab/pypdf load on the first PDF request (or in warm_up)
+pdf = LazyModule("app.pdf")
+
+async def warm_up():
+    """Pay lazy startup costs before traffic: DB engines and a pooled connection, PDF rendering, Shopify client."""
+    async with database.async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    await run_in_threadpool(pdf.load)
+    if settings.fulfillment_sync_enabled:
+        fulfillment_sync.shopify_api.load()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.warm_up_on_startup:
+        await warm_up()
+    catalog.start_listener()
+    pool = inbox.InboxWorkerPool(settings.webhook_workers) if settings.webhook_inbox_enabled else None
+    if pool:
+        pool.start()
+    sync_task = asyncio.create_task(fulfillment_sync.run_forever()) if settings.fulfillment_sync_enabled else None
+    fold_task = asyncio.create_task(rollups.run_forever()) if settings.rollup_fold_seconds > 0 else None
+    yield
+    if fold_task:
+        fold_task.cancel()
+        await asyncio.gather(fold_task, return_exceptions=True)
+    if sync_task:
+        sync_task.cancel()
+        await asyncio.gather(sync_task, return_exceptions=True)
+    if pool:
+        pool.stop()
+    if pdf.loaded:
+        pdf.shutdown()
+
+app = FastAPI(title="QBridge OMS MVP", version="0.1.0", lifespan=lifespan)
+
+ORDER_PAGE_MAX = 1000
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    # Latency, SQL statement count/time and per-stage timings per route (see app/metrics.py)
+    stats, token = metrics.begin_request()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if AsyncReplicaSessionLocal is not None and request.method not in READ_METHODS and status < 400 \
+                and request.url.path.startswith("/admin/"):
+            # Read-your-writes: this client's reads go to the primary for a while (see app/db.py)
+            window = settings.db_read_your_writes_seconds
+            response.set_cookie(database.READ_PRIMARY_COOKIE, f"{time.time() + window:.3f}",
+                                max_age=max(1, int(window)), httponly=True, samesite="lax")
+        return response
+    finally:
+        route = request.scope.get("route")
+        stats.route = getattr(route, "path", "unmatched")
+        metrics.end_request(token, stats, request.method, status, time.perf_counter() - start)
 
 def require_admin(request: Request):
     key = request.headers.get("x-admin-key")
@@ -24,20 +90,23 @@ def require_admin(request: Request):
 def health():
     return {"ok": True, "env": settings.app_env}
 
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # --------- SKUs / Inventory ---------
 
 @app.post("/admin/skus", dependencies=[Depends(require_admin)], response_model=SKUOut)
-def create_sku(payload: SKUCreate, db: Session = Depends(get_db)):
+async def create_sku(payload: SKUCreate, db: AsyncSession = Depends(get_async_db)):
+    if await catalog.alookup(db, payload.sku_code):
+        raise HTTPException(status_code=409, detail="SKU already exists")
+
     # Create product (idempotent by title for MVP)
-    product = db.scalar(select(models.Product).where(models.Product.title == payload.product_title))
+    product = await db.scalar(select(models.Product).where(models.Product.title == payload.product_title))
     if not product:
         product = models.Product(title=payload.product_title, category=payload.category)
         db.add(product)
-        db.flush()
-
-    existing = db.scalar(select(models.SKU).where(models.SKU.sku_code == payload.sku_code))
-    if existing:
-        raise HTTPException(status_code=409, detail="SKU already exists")
+        await db.flush()
 
     sku = models.SKU(
         product_id=product.id,
@@ -49,107 +118,534 @@ def create_sku(payload: SKUCreate, db: Session = Depends(get_db)):
         active=True
     )
     db.add(sku)
-    db.flush()
+    await db.flush()
 
     inv = models.Inventory(
         sku_id=sku.id,
         qty_on_hand=max(0, payload.qty_on_hand),
         qty_reserved=0,
-        reorder_level=max(0, payload.reorder_level)
+        reorder_level=max(0, payload.reorder_level),
+        bin_location=payload.bin_location
     )
     db.add(inv)
-    db.commit()
+    if inv.qty_on_hand:
+        db.add(models.InventoryMovement(sku_id=sku.id, delta_on_hand=inv.qty_on_hand, reason="initial stock", source="create_sku"))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Created concurrently (possibly by another worker whose invalidation has not reached us)
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="SKU already exists")
+    catalog.invalidate(payload.sku_code)
 
-    return SKUOut(
+    out = SKUOut(
         sku_code=sku.sku_code, size=sku.size, color=sku.color,
         price_cents=sku.price_cents, qty_on_hand=inv.qty_on_hand,
         qty_reserved=inv.qty_reserved, reorder_level=inv.reorder_level
     )
+    return Response(sku_out.dump_json(out), media_type="application/json")
+
+@app.post("/admin/skus/import", dependencies=[Depends(require_admin)])
+async def import_skus(request: Request, format: Literal["csv", "ndjson"] | None = None, db: AsyncSession = Depends(get_async_db)):
+    # Upsert products/SKUs/inventory from a streamed CSV or NDJSON body; returns a per-row report
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    return await catalog_import.run(db, catalog_import.iter_lines(request.stream()), fmt)
 
 @app.post("/admin/inventory/adjust", dependencies=[Depends(require_admin)])
-def adjust_inventory(payload: InventoryAdjust, db: Session = Depends(get_db)):
-    sku = db.scalar(select(models.SKU).where(models.SKU.sku_code == payload.sku_code))
+async def adjust_inventory(payload: InventoryAdjust, db: AsyncSession = Depends(get_async_db)):
+    sku = await catalog.alookup(db, payload.sku_code)
     if not sku:
         raise HTTPException(status_code=404, detail="SKU not found")
 
-    inv = db.get(models.Inventory, sku.id)
-    if not inv:
-        raise HTTPException(status_code=404, detail="Inventory row missing")
-
-    new_on_hand = inv.qty_on_hand + payload.delta_on_hand
-    new_reserved = inv.qty_reserved + payload.delta_reserved
-    if new_on_hand < 0 or new_reserved < 0:
+    movement = inventory.Movement(sku.sku_id, payload.delta_on_hand, payload.delta_reserved, payload.reason, "adjust")
+    applied = await db.run_sync(inventory.adjust, [movement])
+    if sku.sku_id not in applied:
+        await db.rollback()
+        if not await db.get(models.Inventory, sku.sku_id):
+            raise HTTPException(status_code=404, detail="Inventory row missing")
         raise HTTPException(status_code=400, detail="Inventory cannot go negative")
+    await db.commit()
+    qty_on_hand, qty_reserved = applied[sku.sku_id]
+    return {"ok": True, "sku_code": payload.sku_code, "qty_on_hand": qty_on_hand, "qty_reserved": qty_reserved}
+
+@app.post("/admin/inventory/adjust-batch", dependencies=[Depends(require_admin)])
+async def adjust_inventory_batch(payload: InventoryAdjustBatch, db: AsyncSession = Depends(get_async_db)):
+    # Deltas are netted per SKU and applied in one conditional UPDATE; a SKU that
+    # would go negative rejects only its own rows
+    skus = await catalog.alookup_many(db, [a.sku_code for a in payload.adjustments])
+    movements = [
+        inventory.Movement(skus[a.sku_code].sku_id, a.delta_on_hand, a.delta_reserved, a.reason, payload.source)
+        for a in payload.adjustments if a.sku_code in skus
+    ]
+    applied = await db.run_sync(inventory.adjust, movements)
+    await db.commit()
+
+    rejected_ids = {m.sku_id for m in movements} - applied.keys()
+    present = set()
+    if rejected_ids:
+        present = set(await db.scalars(select(models.Inventory.sku_id).where(models.Inventory.sku_id.in_(rejected_ids))))
+
+    results = []
+    for i, a in enumerate(payload.adjustments):
+        sku = skus.get(a.sku_code)
+        if not sku:
+            results.append({"index": i, "sku_code": a.sku_code, "ok": False, "error": "SKU not found"})
+        elif sku.sku_id in applied:
+            qty_on_hand, qty_reserved = applied[sku.sku_id]
+            results.append({"index": i, "sku_code": a.sku_code, "ok": True,
+                            "qty_on_hand": qty_on_hand, "qty_reserved": qty_reserved})
+        else:
+            error = "Inventory cannot go negative" if sku.sku_id in present else "Inventory row missing"
+            results.append({"index": i, "sku_code": a.sku_code, "ok": False, "error": error})
+    rejected = sum(1 for r in results if not r["ok"])
+    return {"ok": rejected == 0, "applied": len(results) - rejected, "rejected": rejected, "results": results}
+
+@app.get("/admin/inventory/movements", dependencies=[Depends(require_admin)])
+async def list_inventory_movements(
+    sku_code: str,
+    before_id: int | None = None,
+    limit: int = Query(200, ge=1, le=ORDER_PAGE_MAX),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Ledger for one SKU, newest first; page with before_id=<last id>
+    sku = await catalog.alookup(db, sku_code)
+    if not sku:
+        raise HTTPException(status_code=404, detail="SKU not found")
+    m = models.InventoryMovement
+    q = select(m).where(m.sku_id == sku.sku_id).order_by(m.id.desc()).limit(limit)
+    if before_id:
+        q = q.where(m.id < before_id)
+    return [{
+        "id": r.id,
+        "delta_on_hand": r.delta_on_hand,
+        "delta_reserved": r.delta_reserved,
+        "reason": r.reason,
+        "source": r.source,
+        "order_id": r.order_id,
+        "created_at": r.created_at,
+    } for r in await db.scalars(q)]
+
+@app.get("/admin/inventory/low-stock", dependencies=[Depends(require_admin)])
+async def list_low_stock(
+    after_sku_id: int = 0,
+    limit: int = Query(200, ge=1, le=ORDER_PAGE_MAX),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Reads only the partial index over available < reorder_level; page with after_sku_id
+    inv = models.Inventory
+    rows = await db.execute(
+        select(inv, models.SKU.sku_code)
+        .join(models.SKU, models.SKU.id == inv.sku_id)
+        .where(inventory.low_stock_filter(), inv.sku_id > after_sku_id)
+        .order_by(inv.sku_id)
+        .limit(limit)
+    )
+    return [{
+        "sku_id": i.sku_id,
+        "sku_code": sku_code,
+        "qty_on_hand": i.qty_on_hand,
+        "qty_reserved": i.qty_reserved,
+        "available": i.qty_on_hand - i.qty_reserved,
+        "reorder_level": i.reorder_level,
+        "shortfall": i.reorder_level - (i.qty_on_hand - i.qty_reserved),
+    } for i, sku_code in rows]
+
+ALERT_POLL_SECONDS = 0.5
+
+@app.get("/admin/inventory/alerts", dependencies=[Depends(require_admin)])
+async def stock_alert_feed(
+    after_id: int = 0,
+    limit: int = Query(500, ge=1, le=ORDER_PAGE_MAX),
+    wait: float = Query(0, ge=0, le=30),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Change feed of reorder-level crossings. Pass next_after_id back as after_id;
+    # wait>0 long-polls until an event arrives or the timeout passes.
+    a = models.StockAlert
+    q = (
+        select(a, models.SKU.sku_code)
+        .join(models.SKU, models.SKU.id == a.sku_id)
+        .where(a.id > after_id)
+        .order_by(a.id)
+        .limit(limit)
+    )
+    deadline = asyncio.get_running_loop().time() + wait
+    while True:
+        rows = (await db.execute(q)).all()
+        if rows or asyncio.get_running_loop().time() >= deadline:
+            break
+        # Release the connection between polls
+        await db.rollback()
+        await asyncio.sleep(ALERT_POLL_SECONDS)
+    return {
+        "events": [{
+            "id": e.id,
+            "sku_id": e.sku_id,
+            "sku_code": sku_code,
+            "kind": e.kind,
+            "available": e.available,
+            "reorder_level": e.reorder_level,
+            "created_at": e.created_at,
+        } for e, sku_code in rows],
+        "next_after_id": rows[-1][0].id if rows else after_id,
+    }
 
-    inv.qty_on_hand = new_on_hand
-    inv.qty_reserved = new_reserved
-    inv.updated_at = datetime.now(timezone.utc)
-    db.commit()
-    return {"ok": True, "sku_code": payload.sku_code, "qty_on_hand": inv.qty_on_hand, "qty_reserved": inv.qty_reserved}
+@app.get("/admin/inventory/hot-skus", dependencies=[Depends(require_admin)])
+async def list_hot_skus(db: AsyncSession = Depends(get_async_read_db)):
+    e, sku, inv = models.InventoryEscrow, models.SKU, models.Inventory
+    rows = (await db.execute(
+        select(sku.sku_code, func.count(), func.sum(e.qty), inv.qty_on_hand, inv.qty_reserved)
+        .join(sku, sku.id == e.sku_id).join(inv, inv.sku_id == e.sku_id)
+        .group_by(sku.sku_code, inv.qty_on_hand, inv.qty_reserved).order_by(sku.sku_code)
+    )).all()
+    return [{"sku_code": code, "slots": slots, "escrow_qty": int(escrow or 0), "qty_on_hand": on_hand, "qty_reserved": reserved}
+            for code, slots, escrow, on_hand, reserved in rows]
+
+@app.post("/admin/inventory/hot-skus", dependencies=[Depends(require_admin)])
+async def enable_hot_sku(payload: HotSKUIn, db: AsyncSession = Depends(get_async_db)):
+    # Spread this SKU's reservations over escrow slots (flash sales, drops)
+    sku = await catalog.alookup(db, payload.sku_code)
+    if not sku:
+        raise HTTPException(status_code=404, detail="SKU not found")
+    slots = payload.slots or settings.hot_sku_slots
+    await db.run_sync(inventory.enable_hot, sku.sku_id, slots)
+    await db.commit()
+    return {"ok": True, "sku_code": payload.sku_code, "slots": slots}
+
+@app.delete("/admin/inventory/hot-skus/{sku_code}", dependencies=[Depends(require_admin)])
+async def disable_hot_sku(sku_code: str, db: AsyncSession = Depends(get_async_db)):
+    sku = await catalog.alookup(db, sku_code)
+    if not sku:
+        raise HTTPException(status_code=404, detail="SKU not found")
+    returned = await db.run_sync(inventory.disable_hot, sku.sku_id)
+    await db.commit()
+    return {"ok": True, "sku_code": sku_code, "returned_qty": returned}
+
+@app.get("/admin/catalog/cache", dependencies=[Depends(require_admin)])
+def catalog_cache_stats():
+    return catalog.cache.stats()
+
+@app.get("/admin/response-cache", dependencies=[Depends(require_admin)])
+def response_cache_stats():
+    return response_cache.cache.stats()
+
+@app.get("/admin/db/pool", dependencies=[Depends(require_admin)])
+def db_pool_stats():
+    return {
+        "pools": database.pool_status(),
+        "read_routes": database.read_routes,
+        "replica_lag_seconds": database.replica_lag.seconds if AsyncReplicaSessionLocal is not None else None,
+    }
+
+# --------- Reports ---------
+
+REPORT_MAX_DAYS = 366
+
+@app.get("/admin/reports/daily", dependencies=[Depends(require_admin)])
+async def daily_report(
+    date_from: date,
+    date_to: date,
+    by: Literal["sku", "province", "status"] = "sku",
+    key: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Served from the rollup tables: cost follows the date range, not order volume
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to must be on or after date_from")
+    if (date_to - date_from).days >= REPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {REPORT_MAX_DAYS} days")
+    # Folded rollup rows plus increments not folded yet (see app/rollups.py)
+    rows = await db.execute(rollups.report_query(by, date_from, date_to, key))
+    return {
+        "by": by,
+        "date_from": date_from,
+        "date_to": date_to,
+        "timezone": settings.reporting_timezone,
+        "rows": [dict(r._mapping) for r in rows if r.orders],
+    }
 
 # --------- Orders ---------
 
-@app.get("/admin/orders", dependencies=[Depends(require_admin)])
-def list_orders(status: str | None = None, db: Session = Depends(get_db)):
-    q = select(models.Order).order_by(models.Order.created_at.desc()).limit(200)
+EXPORT_BATCH = 500
+EXPORT_CSV_COLUMNS = [
+    "order_id", "shopify_order_id", "status", "currency", "subtotal_cents", "shipping_cents", "tax_cents",
+    "total_cents", "placed_at", "created_at", "sku_code", "title", "qty", "unit_price_cents", "line_total_cents",
+]
+
+def _status_value(status) -> str:
+    return status.value if hasattr(status, "value") else str(status)
+
+def _encode_cursor(o) -> str:
+    return base64.urlsafe_b64encode(f"{o.created_at.isoformat()}|{o.id}".encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(order_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/admin/orders", dependencies=[Depends(require_admin)], response_class=jsonutil.FastJSONResponse)
+async def list_orders(
+    request: Request,
+    status: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=ORDER_PAGE_MAX),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Keyset pagination on (created_at, id), newest first; next page cursor is in X-Next-Cursor
+    q = select(models.Order).order_by(models.Order.created_at.desc(), models.Order.id.desc()).limit(limit)
     if status:
         q = q.where(models.Order.status == status)
-    orders = db.scalars(q).all()
-    return [{
+    if cursor:
+        q = q.where(tuple_(models.Order.created_at, models.Order.id) < tuple_(*_decode_cursor(cursor)))
+    orders = (await db.scalars(q)).all()
+    # The page's ETag covers every (id, updated_at) on it, so any change or new order alters it
+    etag = response_cache.list_etag((status, cursor, limit), ((o.id, o.updated_at) for o in orders))
+    headers = response_cache.validator_headers(etag, max((o.updated_at for o in orders), default=None))
+    if len(orders) == limit:
+        headers["X-Next-Cursor"] = _encode_cursor(orders[-1])
+    if response_cache.not_modified(request.headers, etag, None):
+        response_cache.cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    key = ("orders", status, cursor, limit)
+    body = response_cache.cache.get(key, etag)
+    if body is None:
+        body = jsonutil.dumps([{
+            "id": o.id,
+            "shopify_order_id": o.shopify_order_id,
+            "status": _status_value(o.status),
+            "total_cents": o.total_cents,
+            "created_at": o.created_at
+        } for o in orders])
+        response_cache.cache.put(key, etag, body)
+    return Response(body, media_type="application/json", headers=headers)
+
+ITEM_FIELDS = ("sku_code", "title", "qty", "unit_price_cents", "line_total_cents")
+
+def _item_out(it) -> dict:
+    return {f: getattr(it, f) for f in ITEM_FIELDS}
+
+def _export_order(o, items: list) -> dict:
+    return {
         "id": o.id,
         "shopify_order_id": o.shopify_order_id,
-        "status": o.status.value if hasattr(o.status, "value") else str(o.status),
+        "status": _status_value(o.status),
+        "currency": o.currency,
+        "subtotal_cents": o.subtotal_cents,
+        "shipping_cents": o.shipping_cents,
+        "tax_cents": o.tax_cents,
         "total_cents": o.total_cents,
-        "created_at": o.created_at
-    } for o in orders]
+        "placed_at": o.placed_at.isoformat() if o.placed_at else None,
+        "created_at": o.created_at.isoformat(),
+        "items": [{f: it[f] for f in ITEM_FIELDS} for it in items],
+    }
+
+def _csv_rows(order: dict) -> list:
+    head = [order["id"], order["shopify_order_id"], order["status"], order["currency"], order["subtotal_cents"],
+            order["shipping_cents"], order["tax_cents"], order["total_cents"], order["placed_at"], order["created_at"]]
+    if not order["items"]:
+        return [head + [None] * 5]
+    return [head + [it["sku_code"], it["title"], it["qty"], it["unit_price_cents"], it["line_total_cents"]]
+            for it in order["items"]]
+
+async def _hot_orders(db: AsyncSession, q):
+    """(created_at, id), export dict of live orders, over a server-side cursor; items are fetched per batch."""
+    # Plain rows: nothing enters the identity map, so memory stays flat
+    result = await db.stream(q.execution_options(yield_per=EXPORT_BATCH))
+    async for batch in result.partitions():
+        items = defaultdict(list)
+        rows = await db.execute(
+            select(models.OrderItem.__table__)
+            .where(models.OrderItem.order_id.in_([o.id for o in batch]))
+            .order_by(models.OrderItem.order_id, models.OrderItem.id)
+        )
+        for it in rows:
+            items[it.order_id].append(_item_out(it))
+        for o in batch:
+            yield (o.created_at, o.id), _export_order(o, items[o.id])
+
+async def _archived_orders(db: AsyncSession, aq):
+    """Same for orders_archive, in keyset pages."""
+    a = models.OrderArchive
+    last = None
+    while True:
+        page = aq if last is None else aq.where(tuple_(a.created_at, a.id) > tuple_(*last))
+        rows = (await db.execute(page.limit(EXPORT_BATCH))).all()
+        for r in rows:
+            yield (r.created_at, r.id), _export_order(r, archive.decode_doc(r.doc)["items"])
+        if len(rows) < EXPORT_BATCH:
+            return
+        last = (rows[-1].created_at, rows[-1].id)
+
+async def _merge_sorted(*streams):
+    """Merge async (key, value) streams that are each sorted by key."""
+    heads = [await anext(s, None) for s in streams]
+    while any(h is not None for h in heads):
+        i = min((i for i, h in enumerate(heads) if h is not None), key=lambda i: heads[i][0])
+        yield heads[i][1]
+        heads[i] = await anext(streams[i], None)
+
+async def _iter_export(q, aq, fmt: str, session_factory=AsyncSessionLocal):
+    """Stream live and archived orders merged in (created_at, id) order, EXPORT_BATCH per chunk."""
+    # Own session: the response body outlives the request's dependencies
+    async with session_factory() as db:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if fmt == "csv":
+            writer.writerow(EXPORT_CSV_COLUMNS)
+        chunk, n = [], 0
+        async for order in _merge_sorted(_hot_orders(db, q), _archived_orders(db, aq)):
+            if fmt == "csv":
+                writer.writerows(_csv_rows(order))
+            else:
+                chunk.append(jsonutil.dumps(order) + b"\n")
+            n += 1
+            if n % EXPORT_BATCH == 0:
+                yield buf.getvalue().encode("utf-8") if fmt == "csv" else b"".join(chunk)
+                buf.seek(0)
+                buf.truncate()
+                chunk = []
+        if fmt == "csv":
+            yield buf.getvalue().encode("utf-8")
+        elif chunk:
+            yield b"".join(chunk)
+
+def _export_filters(model, status, created_from, created_to) -> list:
+    where = []
+    if status:
+        where.append(model.status == status)
+    if created_from:
+        where.append(model.created_at >= created_from)
+    if created_to:
+        where.append(model.created_at < created_to)
+    return where
+
+@app.get("/admin/orders/export", dependencies=[Depends(require_admin)])
+async def export_orders(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    status: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+):
+    # Archived orders (app/archive.py) are merged in, so the export covers both tiers
+    q = (select(models.Order.__table__).where(*_export_filters(models.Order, status, created_from, created_to))
+         .order_by(models.Order.created_at, models.Order.id))
+    a = models.OrderArchive
+    aq = select(a.__table__).where(*_export_filters(a, status, created_from, created_to)).order_by(a.created_at, a.id)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    factory = await database.read_sessionmaker(request)
+    return StreamingResponse(_iter_export(q, aq, format, factory), media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename=orders.{format}"
+    })
+
+SEARCH_PAGE_MAX = 100
+
+@app.get("/admin/orders/search", dependencies=[Depends(require_admin)], response_class=jsonutil.FastJSONResponse)
+async def search_orders(
+    q: str = Query(..., min_length=search.MIN_TOKEN, max_length=200),
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=SEARCH_PAGE_MAX),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Email, name, postal code, order number or SKU (prefixes too); next page cursor is in X-Next-Cursor
+    after = None
+    if cursor:
+        try:
+            score, order_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split("|")
+            after = (int(score), int(order_id))
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    hits = await db.run_sync(search.search, q, limit, after)
+    headers = {}
+    if len(hits) == limit:
+        last = hits[-1]
+        headers["X-Next-Cursor"] = base64.urlsafe_b64encode(f"{last['score']}|{last['id']}".encode("ascii")).decode("ascii")
+    return jsonutil.FastJSONResponse(hits, headers=headers)
 
 @app.get("/admin/orders/{order_id}", dependencies=[Depends(require_admin)], response_model=OrderOut)
-def get_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.get(models.Order, order_id)
+async def get_order(order_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    order = await db.get(models.Order, order_id)
+    if not order:
+        # Old closed orders live in orders_archive (app/archive.py); ids and updated_at carry over
+        order = await db.get(models.OrderArchive, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    items = db.scalars(select(models.OrderItem).where(models.OrderItem.order_id == order.id)).all()
-    return OrderOut(
+    # Unchanged orders are answered from the validators or the cache, without loading items
+    etag = response_cache.order_etag(order.id, order.updated_at)
+    headers = response_cache.validator_headers(etag, order.updated_at)
+    if response_cache.not_modified(request.headers, etag, order.updated_at):
+        response_cache.cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    body = response_cache.cache.get(response_cache.order_key(order.id), etag)
+    if body is not None:
+        return Response(body, media_type="application/json", headers=headers)
+    if isinstance(order, models.OrderArchive):
+        items = archive.decode_doc(order.doc)["items"]
+    else:
+        items = [_item_out(it) for it in await db.scalars(select(models.OrderItem).where(models.OrderItem.order_id == order.id))]
+    out = OrderOut(
         id=order.id,
         shopify_order_id=order.shopify_order_id,
-        status=order.status.value if hasattr(order.status,"value") else str(order.status),
+        status=_status_value(order.status),
         total_cents=order.total_cents,
         placed_at=order.placed_at,
         created_at=order.created_at,
-        items=[{
-            "sku_code": it.sku_code,
-            "title": it.title,
-            "qty": it.qty,
-            "unit_price_cents": it.unit_price_cents,
-            "line_total_cents": it.line_total_cents
-        } for it in items]
+        items=[{f: it[f] for f in ITEM_FIELDS} for it in items]
     )
+    body = order_out.dump_json(out)
+    response_cache.cache.put(response_cache.order_key(order.id), etag, body)
+    return Response(body, media_type="application/json", headers=headers)
 
 @app.post("/admin/orders/{order_id}/status", dependencies=[Depends(require_admin)])
-def set_order_status(order_id: int, status: str, db: Session = Depends(get_db)):
-    order = db.get(models.Order, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-
+async def set_order_status(order_id: int, status: str, db: AsyncSession = Depends(get_async_db)):
     try:
         status_enum = models.OrderStatus(status)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    order.status = status_enum
-    db.commit()
+    result = await db.run_sync(order_status.transition, [order_id], status_enum)
+    await db.commit()
+    if result["rejected"]:
+        reason = result["rejected"][0]["reason"]
+        if reason == "not found":
+            raise HTTPException(status_code=404, detail="Order not found")
+        raise HTTPException(status_code=409, detail=reason)
     return {"ok": True, "order_id": order_id, "status": status_enum.value}
 
-@app.get("/admin/orders/{order_id}/packing-slip.pdf", dependencies=[Depends(require_admin)])
-def packing_slip(order_id: int, db: Session = Depends(get_db)):
-    order = db.get(models.Order, order_id)
-    if not order:
+@app.post("/admin/orders/bulk-status", dependencies=[Depends(require_admin)])
+async def set_order_status_bulk(payload: OrderStatusBatch, db: AsyncSession = Depends(get_async_db)):
+    # Allowed moves are checked against order_status.TRANSITIONS; valid ones are applied in one UPDATE
+    try:
+        status_enum = models.OrderStatus(payload.status)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    result = await db.run_sync(order_status.transition, payload.order_ids, status_enum)
+    await db.commit()
+    return {"ok": not result["rejected"], **result}
+
+@app.post("/admin/orders/{order_id}/shipments", dependencies=[Depends(require_admin)])
+async def upsert_shipment(order_id: int, payload: ShipmentIn, db: AsyncSession = Depends(get_async_db)):
+    # Records tracking on the order's shipment and queues the push to Shopify (app/fulfillment_sync.py)
+    if not await db.get(models.Order, order_id):
         raise HTTPException(status_code=404, detail="Order not found")
-
-    addr = db.get(models.Address, order.shipping_address_id) if order.shipping_address_id else None
-    items = db.scalars(select(models.OrderItem).where(models.OrderItem.order_id == order.id)).all()
-
-    ship_to = {
+    shipment = await db.scalar(
+        select(models.Shipment).where(models.Shipment.order_id == order_id).order_by(models.Shipment.id.desc()).limit(1)
+    )
+    if shipment is None:
+        shipment = models.Shipment(order_id=order_id)
+        db.add(shipment)
+    shipment.carrier = payload.carrier
+    shipment.tracking_number = payload.tracking_number
+    shipment.shipped_at = payload.shipped_at or shipment.shipped_at or datetime.now(timezone.utc)
+    await db.flush()
+    await db.run_sync(fulfillment_sync.enqueue, order_id, shipment.id)
+    await db.commit()
+    return {"ok": True, "order_id": order_id, "shipment_id": shipment.id}
+
+def _ship_to(addr) -> dict:
+    return {
         "name": "",
         "line1": addr.line1 if addr else "",
         "line2": addr.line2 if addr else "",
@@ -158,14 +654,94 @@ def packing_slip(order_id: int, db: Session = Depends(get_db)):
         "postal_code": addr.postal_code if addr else "",
         "country": addr.country if addr else "Canada",
     }
-    pdf_bytes = build_packing_slip(order.id, ship_to, [{
-        "qty": it.qty, "sku_code": it.sku_code or "", "title": it.title or ""
-    } for it in items])
+
+async def _load_slips(db: AsyncSession, orders: list) -> list:
+    """(order_id, ship_to, items) per order; addresses and items are fetched with one query each."""
+    addr_ids = {o.shipping_address_id for o in orders if o.shipping_address_id}
+    addrs = {}
+    if addr_ids:
+        addrs = {a.id: a for a in (await db.scalars(select(models.Address).where(models.Address.id.in_(addr_ids))))}
+    items = defaultdict(list)
+    rows = await db.scalars(
+        select(models.OrderItem)
+        .where(models.OrderItem.order_id.in_([o.id for o in orders]))
+        .order_by(models.OrderItem.order_id, models.OrderItem.id)
+    )
+    for it in rows:
+        items[it.order_id].append({"qty": it.qty, "sku_code": it.sku_code or "", "title": it.title or ""})
+    return [(o.id, _ship_to(addrs.get(o.shipping_address_id)), items[o.id]) for o in orders]
+
+@app.get("/admin/orders/{order_id}/packing-slip.pdf", dependencies=[Depends(require_admin)])
+async def packing_slip(order_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    order = await db.get(models.Order, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    [slip] = await _load_slips(db, [order])
+    # Rendering is CPU-bound; keep it off the event loop
+    with metrics.stage("pdf"):
+        pdf_bytes = await run_in_threadpool(pdf.get_packing_slip, *slip)
 
     return StreamingResponse(iter([pdf_bytes]), media_type="application/pdf", headers={
         "Content-Disposition": f"inline; filename=packing-slip-{order.id}.pdf"
     })
 
+@app.post("/admin/packing-slips", dependencies=[Depends(require_admin)])
+async def packing_slips_batch(payload: PackingSlipBatch, db: AsyncSession = Depends(get_async_read_db)):
+    q = select(models.Order).order_by(models.Order.id).limit(payload.limit)
+    if payload.order_ids:
+        q = q.where(models.Order.id.in_(payload.order_ids))
+    elif payload.status:
+        try:
+            q = q.where(models.Order.status == models.OrderStatus(payload.status))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid status")
+    else:
+        raise HTTPException(status_code=400, detail="order_ids or status is required")
+
+    orders = list((await db.scalars(q)).all())
+    if not orders:
+        raise HTTPException(status_code=404, detail="No matching orders")
+    if payload.order_ids:
+        # Print in the order the warehouse asked for
+        position = {oid: i for i, oid in enumerate(payload.order_ids)}
+        orders.sort(key=lambda o: position[o.id])
+
+    slips = await _load_slips(db, orders)
+    with metrics.stage("pdf"):
+        pdfs = await run_in_threadpool(pdf.render_packing_slips, slips)
+
+    if payload.format == "zip":
+        files = [(f"packing-slip-{o.id}.pdf", data) for o, data in zip(orders, pdfs)]
+        return StreamingResponse(pdf.iter_zip(files), media_type="application/zip", headers={
+            "Content-Disposition": "attachment; filename=packing-slips.zip"
+        })
+    with metrics.stage("pdf_merge"):
+        merged = await run_in_threadpool(pdf.merge_pdfs, pdfs)
+    return Response(merged, media_type="application/pdf", headers={
+        "Content-Disposition": "inline; filename=packing-slips.pdf"
+    })
+
+@app.post("/admin/pick-waves", dependencies=[Depends(require_admin)])
+async def pick_wave(payload: PickWaveRequest, db: AsyncSession = Depends(get_async_db)):
+    # Pick list aggregated by SKU plus put-wall slots; mark_picked moves the wave's orders to PICKED
+    try:
+        status_enum = models.OrderStatus(payload.status)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    wave = await db.run_sync(picking.build_wave, status_enum, payload.min_age_minutes, payload.max_orders,
+                             payload.order_ids, payload.mark_picked)
+    await db.commit()
+    if not wave["orders"]:
+        raise HTTPException(status_code=404, detail="No matching orders")
+    if payload.format == "json":
+        return jsonutil.FastJSONResponse(wave)
+    with metrics.stage("pdf"):
+        pdf_bytes = await run_in_threadpool(pdf.build_pick_list, wave)
+    return Response(pdf_bytes, media_type="application/pdf", headers={
+        "Content-Disposition": "inline; filename=pick-wave.pdf"
+    })
+
 # --------- Shopify Webhooks ---------
 # Webhook topics recommended for MVP:
 # - orders/create
@@ -173,174 +749,52 @@ def packing_slip(order_id: int, db: Session = Depends(get_db)):
 # - orders/cancelled
 # - orders/fulfilled (optional; you can also manage shipping manually in OMS)
 
-@app.post("/webhooks/shopify/orders-create")
-async def shopify_orders_create(request: Request, db: Session = Depends(get_db)):
+async def _receive_webhook(request: Request, db: AsyncSession, default_topic: str):
+    start = time.perf_counter()
     raw = await request.body()
     hmac_header = request.headers.get("x-shopify-hmac-sha256", "")
-    webhook_id = request.headers.get("x-shopify-webhook-id") or str(uuid.uuid4())
-    shop_domain = request.headers.get("x-shopify-shop-domain", settings.shopify_shop_domain) or "unknown"
-    topic = request.headers.get("x-shopify-topic", "orders/create")
+    webhook_id, shop_domain, topic = webhooks.webhook_meta(request.headers, default_topic)
 
-    if not verify_shopify_hmac(raw, hmac_header):
+    with metrics.stage("hmac"):
+        valid = verify_shopify_hmac(raw, hmac_header)
+    if not valid:
+        metrics.record_webhook(default_topic, "invalid_signature", time.perf_counter() - start)
         raise HTTPException(status_code=401, detail="Invalid webhook signature")
 
-    # idempotency
-    exists = db.scalar(select(models.WebhookEvent).where(models.WebhookEvent.webhook_id == webhook_id))
-    if exists:
+    try:
+        result = await _handle_webhook(db, default_topic, raw, request.headers, webhook_id, shop_domain, topic)
+    except Exception:
+        metrics.record_webhook(default_topic, "error", time.perf_counter() - start)
+        raise
+    metrics.record_webhook(default_topic, metrics.webhook_outcome(result), time.perf_counter() - start)
+    return result
+
+async def _handle_webhook(db: AsyncSession, default_topic: str, raw: bytes, headers, webhook_id: str, shop_domain: str, topic: str):
+    # Shopify retries of a webhook this process already handled
+    if webhook_id in webhooks.recent:
         return {"ok": True, "duplicate": True}
 
-    payload = json.loads(raw.decode("utf-8"))
-
-    # Canada-only enforcement (soft fail: store but mark for review)
-    ship = payload.get("shipping_address") or {}
-    if (ship.get("country") or "").lower() not in ("canada", "ca"):
-        # Still record the webhook to avoid replay storms
-        db.add(models.WebhookEvent(shop_domain=shop_domain, topic=topic, webhook_id=webhook_id))
-        db.commit()
-        return {"ok": True, "ignored": True, "reason": "Non-Canada shipping address"}
-
-    # Customer upsert (minimal)
-    cust = payload.get("customer") or {}
-    customer = None
-    if cust.get("id"):
-        customer = db.scalar(select(models.Customer).where(models.Customer.shopify_customer_id == int(cust["id"])))
-    if not customer:
-        customer = models.Customer(
-            shopify_customer_id=int(cust["id"]) if cust.get("id") else None,
-            email=cust.get("email"),
-            phone=cust.get("phone"),
-            first_name=cust.get("first_name"),
-            last_name=cust.get("last_name"),
+    # Inbox mode: persist and ACK now, workers process it (see app/inbox.py)
+    if settings.webhook_inbox_enabled:
+        with metrics.stage("enqueue"):
+            queued = await db.run_sync(inbox.enqueue, default_topic, webhook_id, shop_domain, dict(headers), raw)
+        webhooks.recent.add(webhook_id)
+        if not queued:
+            return {"ok": True, "duplicate": True}
+        return {"ok": True, "queued": True}
+
+    with metrics.stage("parse"):
+        payload = jsonutil.loads(raw)
+    # Handlers are shared with the inbox workers; run_sync drives them over the async connection
+    with metrics.stage("handler"):
+        return await db.run_sync(
+            webhooks.HANDLERS[default_topic], payload, webhook_id=webhook_id, shop_domain=shop_domain, topic=topic
         )
-        db.add(customer)
-        db.flush()
-
-    # Address
-    addr = models.Address(
-        customer_id=customer.id,
-        line1=ship.get("address1") or "",
-        line2=ship.get("address2"),
-        city=ship.get("city") or "",
-        province=ship.get("province") or "",
-        postal_code=ship.get("zip") or "",
-        country="Canada",
-    )
-    db.add(addr)
-    db.flush()
-
-    # Order (idempotent by shopify_order_id)
-    shopify_order_id = int(payload["id"])
-    existing_order = db.scalar(select(models.Order).where(models.Order.shopify_order_id == shopify_order_id))
-    if existing_order:
-        db.add(models.WebhookEvent(shop_domain=shop_domain, topic=topic, webhook_id=webhook_id))
-        db.commit()
-        return {"ok": True, "duplicate_order": True, "order_id": existing_order.id}
-
-    subtotal = money_to_cents(payload.get("subtotal_price"))
-    total = money_to_cents(payload.get("total_price"))
-    tax = money_to_cents(payload.get("total_tax"))
-    shipping_cents = money_to_cents(payload.get("total_shipping_price_set", {}).get("shop_money", {}).get("amount"))
-
-    placed_at = payload.get("created_at")
-    placed_dt = None
-    if placed_at:
-        try:
-            placed_dt = datetime.fromisoformat(placed_at.replace("Z", "+00:00"))
-        except Exception:
-            placed_dt = None
-
-    order = models.Order(
-        shopify_order_id=shopify_order_id,
-        customer_id=customer.id,
-        shipping_address_id=addr.id,
-        status=models.OrderStatus.IMPORTED,
-        currency=payload.get("currency") or "CAD",
-        subtotal_cents=subtotal,
-        shipping_cents=shipping_cents,
-        tax_cents=tax,
-        total_cents=total,
-        placed_at=placed_dt,
-    )
-    db.add(order)
-    db.flush()
-
-    # Items + reserve inventory (reserve only; decrement on-hand when PAID)
-    for li in payload.get("line_items") or []:
-        sku_code = li.get("sku") or None
-        qty = int(li.get("quantity") or 0)
-        price = money_to_cents(li.get("price"))
-        title = li.get("title")
-
-        db.add(models.OrderItem(
-            order_id=order.id,
-            sku_id=None,
-            sku_code=sku_code,
-            title=title,
-            qty=qty,
-            unit_price_cents=price,
-            line_total_cents=price * qty
-        ))
-
-        if sku_code and qty > 0:
-            sku = db.scalar(select(models.SKU).where(models.SKU.sku_code == sku_code))
-            if sku:
-                inv = db.get(models.Inventory, sku.id)
-                if inv and inv.qty_on_hand - inv.qty_reserved >= qty:
-                    inv.qty_reserved += qty
-
-    db.add(models.WebhookEvent(shop_domain=shop_domain, topic=topic, webhook_id=webhook_id))
-    db.commit()
-    return {"ok": True, "order_id": order.id}
 
-@app.post("/webhooks/shopify/orders-paid")
-async def shopify_orders_paid(request: Request, db: Session = Depends(get_db)):
-    raw = await request.body()
-    hmac_header = request.headers.get("x-shopify-hmac-sha256", "")
-    webhook_id = request.headers.get("x-shopify-webhook-id") or str(uuid.uuid4())
-    shop_domain = request.headers.get("x-shopify-shop-domain", settings.shopify_shop_domain) or "unknown"
-    topic = request.headers.get("x-shopify-topic", "orders/paid")
-
-    if not verify_shopify_hmac(raw, hmac_header):
-        raise HTTPException(status_code=401, detail="Invalid webhook signature")
-
-    exists = db.scalar(select(models.WebhookEvent).where(models.WebhookEvent.webhook_id == webhook_id))
-    if exists:
-        return {"ok": True, "duplicate": True}
+@app.post("/webhooks/shopify/orders-create")
+async def shopify_orders_create(request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await _receive_webhook(request, db, "orders/create")
 
-    payload = json.loads(raw.decode("utf-8"))
-    shopify_order_id = int(payload["id"])
-    order = db.scalar(select(models.Order).where(models.Order.shopify_order_id == shopify_order_id))
-    if not order:
-        # Create flow not received yet; safe no-op
-        db.add(models.WebhookEvent(shop_domain=shop_domain, topic=topic, webhook_id=webhook_id))
-        db.commit()
-        return {"ok": True, "ignored": True, "reason": "order_not_found"}
-
-    # Move RESERVED -> ON_HAND decrement (simple)
-    if order.status in (models.OrderStatus.IMPORTED,):
-        items = db.scalars(select(models.OrderItem).where(models.OrderItem.order_id == order.id)).all()
-        for it in items:
-            if it.sku_code and it.qty > 0:
-                sku = db.scalar(select(models.SKU).where(models.SKU.sku_code == it.sku_code))
-                if sku:
-                    inv = db.get(models.Inventory, sku.id)
-                    if inv:
-                        # Ensure we do not go negative
-                        inv.qty_reserved = max(0, inv.qty_reserved - it.qty)
-                        inv.qty_on_hand = max(0, inv.qty_on_hand - it.qty)
-
-        order.status = models.OrderStatus.PAID
-
-        # Payment record
-        db.add(models.Payment(
-            order_id=order.id,
-            provider="shopify",
-            reference=str(shopify_order_id),
-            amount_cents=money_to_cents(payload.get("total_price")),
-            status=models.PaymentStatus.PAID,
-            paid_at=datetime.now(timezone.utc)
-        ))
-
-    db.add(models.WebhookEvent(shop_domain=shop_domain, topic=topic, webhook_id=webhook_id))
-    db.commit()
-    return {"ok": True, "order_id": order.id, "status": "PAID"}
+@app.post("/webhooks/shopify/orders-paid")
+async def shopify_orders_paid(request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await _receive_webhook(request, db, "orders/paid")
@@ -0,0 +1,168 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+# Request instrumentation, exposed in Prometheus text format at /metrics.
+# - the HTTP middleware in main.py opens a RequestStats per request (contextvar)
+# - engine events on the sync and async engines add each statement's count/time
+#   to the current request (run_sync greenlets and threadpool calls inherit it)
+# - stage() times named steps (hmac, parse, handler, pdf) inside a request
+# - webhook outcomes are counted per Shopify topic from the routes and inbox workers
+# No client library: a handful of counters/histograms rendered by hand.
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            for key, (counts, total, n) in sorted(self._series.items()):
+                running = 0
+                for bound, c in zip(self.buckets + (float("inf"),), counts):
+                    running += c
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_labels(names, key + (le,))} {running}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total:g}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {n}")
+        return lines
+
+http_seconds = Histogram("qbridge_http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+http_queries = Histogram("qbridge_http_request_sql_statements", "SQL statements per HTTP request", ("route",), QUERY_BUCKETS)
+http_query_seconds = Histogram("qbridge_http_request_sql_seconds", "SQL time per HTTP request", ("route",))
+stage_seconds = Histogram("qbridge_stage_duration_seconds", "Time spent in a named step of a request", ("route", "stage"))
+sql_statements = Counter("qbridge_sql_statements_total", "SQL statements executed (all callers)")
+slow_requests = Counter("qbridge_http_requests_over_query_threshold_total", "Requests over SQL_QUERY_WARN_THRESHOLD", ("route",))
+webhooks = Counter("qbridge_webhooks_total", "Shopify webhooks by topic and outcome", ("topic", "outcome", "via"))
+webhook_seconds = Histogram("qbridge_webhook_duration_seconds", "Webhook handling time by topic and outcome", ("topic", "outcome", "via"))
+
+REGISTRY = [http_seconds, http_queries, http_query_seconds, stage_seconds, sql_statements, slow_requests,
+            webhooks, webhook_seconds]
+
+@dataclass
+class RequestStats:
+    route: str = "unmatched"
+    queries: int = 0
+    query_seconds: float = 0.0
+    stages: Dict[str, float] = field(default_factory=dict)
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("qbridge_request_stats", default=None)
+
+def begin_request() -> Tuple[RequestStats, contextvars.Token]:
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+def end_request(token: contextvars.Token, stats: RequestStats, method: str, status: int, seconds: float):
+    _current.reset(token)
+    http_seconds.observe(seconds, method, stats.route, str(status))
+    http_queries.observe(stats.queries, stats.route)
+    http_query_seconds.observe(stats.query_seconds, stats.route)
+    for name, elapsed in stats.stages.items():
+        stage_seconds.observe(elapsed, stats.route, name)
+    if settings.sql_query_warn_threshold and stats.queries > settings.sql_query_warn_threshold:
+        slow_requests.inc(stats.route)
+        log.warning("%s %s ran %d SQL statements (%.1f ms); threshold is %d",
+                    method, stats.route, stats.queries, stats.query_seconds * 1000, settings.sql_query_warn_threshold)
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.stages[name] = stats.stages.get(name, 0.0) + time.perf_counter() - start
+
+def webhook_outcome(result: dict) -> str:
+    if result.get("queued"):
+        return "queued"
+    if result.get("duplicate") or result.get("duplicate_order"):
+        return "duplicate"
+    if result.get("ignored"):
+        return "ignored"
+    return "processed"
+
+def record_webhook(topic: str, outcome: str, seconds: float, via: str = "http"):
+    """via is "http" for the routes and "inbox" for background workers."""
+    webhooks.inc(topic, outcome, via)
+    webhook_seconds.observe(seconds, topic, outcome, via)
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --------- SQL statement hooks ---------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._qbridge_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sql_statements.inc()
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    started = getattr(context, "_qbridge_started", None)
+    if started is not None:
+        stats.query_seconds += time.perf_counter() - started
+
+# On the Engine class: app/db.py creates its engines lazily, after this module is imported
+event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
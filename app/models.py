@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    BigInteger, Boolean, CheckConstraint, Column, DateTime, Enum, ForeignKey,
-    Integer, String, Text, func, UniqueConstraint
+    BigInteger, Boolean, CheckConstraint, Column, Date, DateTime, Enum, ForeignKey,
+    Index, Integer, JSON, LargeBinary, String, Text, func, UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from .db import Base
@@ -21,16 +21,29 @@ class PaymentStatus(str, enum.Enum):
     FAILED = "FAILED"
     REFUNDED = "REFUNDED"
 
+class InboxStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    DONE = "DONE"
+    DEAD = "DEAD"
+
 class Customer(Base):
     __tablename__ = "customers"
     id = Column(BigInteger, primary_key=True)
     shopify_customer_id = Column(BigInteger, unique=True, nullable=True)
     email = Column(Text, nullable=True)
+    email_normalized = Column(Text, nullable=True)
     phone = Column(Text, nullable=True)
     first_name = Column(Text, nullable=True)
     last_name = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    # Guest checkouts (no Shopify customer id) are matched on email (see app/customers.py)
+    __table_args__ = (
+        Index("ux_customers_guest_email", "email_normalized", unique=True,
+              postgresql_where=shopify_customer_id.is_(None), sqlite_where=shopify_customer_id.is_(None)),
+    )
+
 class Address(Base):
     __tablename__ = "addresses"
     id = Column(BigInteger, primary_key=True)
@@ -41,6 +54,7 @@ class Address(Base):
     province = Column(Text, nullable=False)
     postal_code = Column(Text, nullable=False)
     country = Column(Text, nullable=False, server_default="Canada")
+    fingerprint = Column(Text, nullable=True, unique=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 class Product(Base):
@@ -69,8 +83,39 @@ class Inventory(Base):
     qty_on_hand = Column(Integer, nullable=False, server_default="0")
     qty_reserved = Column(Integer, nullable=False, server_default="0")
     reorder_level = Column(Integer, nullable=False, server_default="0")
+    bin_location = Column(Text, nullable=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+class InventoryEscrow(Base):
+    # Stock set aside for a hot SKU, split over slots so concurrent reservations
+    # lock different rows (see app/inventory.py). Counted in inventory.qty_reserved.
+    __tablename__ = "inventory_escrow"
+    sku_id = Column(BigInteger, ForeignKey("skus.id", ondelete="CASCADE"), primary_key=True)
+    slot = Column(Integer, primary_key=True)
+    qty = Column(Integer, nullable=False, server_default="0")
+
+class InventoryMovement(Base):
+    # Append-only stock ledger; summing deltas per SKU reproduces inventory
+    __tablename__ = "inventory_movements"
+    id = Column(BigInteger, primary_key=True)
+    sku_id = Column(BigInteger, ForeignKey("skus.id", ondelete="CASCADE"), nullable=False)
+    order_id = Column(BigInteger, nullable=True)
+    delta_on_hand = Column(Integer, nullable=False, server_default="0")
+    delta_reserved = Column(Integer, nullable=False, server_default="0")
+    reason = Column(Text, nullable=True)
+    source = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class StockAlert(Base):
+    # Change feed: available stock crossed reorder_level (LOW) or back above it (RECOVERED)
+    __tablename__ = "stock_alerts"
+    id = Column(BigInteger, primary_key=True)
+    sku_id = Column(BigInteger, ForeignKey("skus.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(Text, nullable=False)
+    available = Column(Integer, nullable=False)
+    reorder_level = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
 class Order(Base):
     __tablename__ = "orders"
     id = Column(BigInteger, primary_key=True)
@@ -117,6 +162,7 @@ class Shipment(Base):
     tracking_number = Column(Text, nullable=True)
     shipped_at = Column(DateTime(timezone=True), nullable=True)
     delivered_at = Column(DateTime(timezone=True), nullable=True)
+    shopify_fulfillment_id = Column(BigInteger, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 class Return(Base):
@@ -126,6 +172,33 @@ class Return(Base):
     reason = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+class OrderSearchTerm(Base):
+    # Inverted index for admin search (see app/search.py): one row per (term, order)
+    __tablename__ = "order_search_terms"
+    term = Column(Text, primary_key=True)
+    order_id = Column(BigInteger, primary_key=True)
+    kind = Column(Text, nullable=False)
+
+class OrderArchive(Base):
+    # Closed orders moved out of the hot tables (see app/archive.py). Filterable
+    # columns stay plain; items, payments, shipments, return and shipping address
+    # are in `doc` as zlib-compressed JSON.
+    __tablename__ = "orders_archive"
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    shopify_order_id = Column(BigInteger, unique=True, nullable=True)
+    customer_id = Column(BigInteger, nullable=True)
+    status = Column(Text, nullable=False)
+    currency = Column(Text, nullable=False)
+    subtotal_cents = Column(Integer, nullable=False)
+    shipping_cents = Column(Integer, nullable=False)
+    tax_cents = Column(Integer, nullable=False)
+    total_cents = Column(Integer, nullable=False)
+    placed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    doc = Column(LargeBinary, nullable=False)
+
 class WebhookEvent(Base):
     __tablename__ = "webhook_events"
     id = Column(BigInteger, primary_key=True)
@@ -133,3 +206,69 @@ class WebhookEvent(Base):
     topic = Column(Text, nullable=False)
     webhook_id = Column(Text, nullable=False, unique=True)
     received_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class WebhookInbox(Base):
+    __tablename__ = "webhook_inbox"
+    id = Column(BigInteger, primary_key=True)
+    webhook_id = Column(Text, nullable=False, unique=True)
+    topic = Column(Text, nullable=False)
+    shop_domain = Column(Text, nullable=False)
+    shopify_order_id = Column(BigInteger, nullable=True)
+    headers = Column(JSON, nullable=False)
+    body = Column(LargeBinary, nullable=False)
+    status = Column(Enum(InboxStatus, name="inbox_status", native_enum=False), nullable=False, default=InboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+class FulfillmentSync(Base):
+    # Outbox for pushing shipments to Shopify; one row per order (see app/fulfillment_sync.py)
+    __tablename__ = "fulfillment_sync"
+    id = Column(BigInteger, primary_key=True)
+    order_id = Column(BigInteger, ForeignKey("orders.id", ondelete="CASCADE"), unique=True, nullable=False)
+    shipment_id = Column(BigInteger, ForeignKey("shipments.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False, server_default="1")
+    status = Column(Enum(InboxStatus, name="inbox_status", native_enum=False), nullable=False, default=InboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+# --------- Reporting rollups (maintained incrementally, see app/rollups.py) ---------
+
+class SalesDailySKU(Base):
+    __tablename__ = "sales_daily_sku"
+    day = Column(Date, primary_key=True)
+    sku_code = Column(Text, primary_key=True)
+    orders = Column(Integer, nullable=False, server_default="0")
+    units = Column(Integer, nullable=False, server_default="0")
+    revenue_cents = Column(BigInteger, nullable=False, server_default="0")
+
+class SalesDailyProvince(Base):
+    __tablename__ = "sales_daily_province"
+    day = Column(Date, primary_key=True)
+    province = Column(Text, primary_key=True)
+    orders = Column(Integer, nullable=False, server_default="0")
+    revenue_cents = Column(BigInteger, nullable=False, server_default="0")
+
+class OrdersDailyStatus(Base):
+    __tablename__ = "orders_daily_status"
+    day = Column(Date, primary_key=True)
+    status = Column(Text, primary_key=True)
+    orders = Column(Integer, nullable=False, server_default="0")
+    revenue_cents = Column(BigInteger, nullable=False, server_default="0")
+
+class RollupDelta(Base):
+    # Insert-only increments to the rollups above, folded into them by app.rollups.fold()
+    __tablename__ = "rollup_deltas"
+    id = Column(BigInteger, primary_key=True)
+    report = Column(Text, nullable=False)  # key of app.rollups.REPORTS
+    day = Column(Date, nullable=False)
+    key = Column(Text, nullable=False)
+    orders = Column(Integer, nullable=False, server_default="0")
+    units = Column(Integer, nullable=False, server_default="0")
+    revenue_cents = Column(BigInteger, nullable=False, server_default="0")
+    __table_args__ = (Index("idx_rollup_deltas_report_day", "report", "day"),)
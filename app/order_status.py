@@ -0,0 +1,72 @@
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import models, response_cache, rollups
+
+S = models.OrderStatus
+
+# Allowed status changes. Anything else is rejected; CANCELLED and RETURNED are final.
+TRANSITIONS: Dict[S, frozenset] = {
+    S.IMPORTED: frozenset({S.PAID, S.CANCELLED}),
+    S.PAID: frozenset({S.PICKED, S.CANCELLED}),
+    S.PICKED: frozenset({S.SHIPPED, S.PAID, S.CANCELLED}),  # PAID = put back from a wave
+    S.SHIPPED: frozenset({S.DELIVERED, S.RETURNED}),
+    S.DELIVERED: frozenset({S.RETURNED}),
+    S.RETURNED: frozenset(),
+    S.CANCELLED: frozenset(),
+}
+
+def sources(target: S) -> List[S]:
+    """Statuses an order may move to target from."""
+    return [s for s, targets in TRANSITIONS.items() if target in targets]
+
+def transition(db: Session, order_ids: Iterable[int], target: S) -> Dict[str, Any]:
+    """Move orders to target with one locking SELECT and one set-based UPDATE.
+
+    Orders already in target are reported as unchanged; missing orders and
+    disallowed moves are rejected with a reason. Caller commits.
+    """
+    target = S(target)
+    ids = list(dict.fromkeys(order_ids))
+    o = models.Order
+    current = {
+        row.id: row for row in db.execute(
+            select(o.id, o.status, o.placed_at, o.created_at, o.total_cents, o.shipping_address_id)
+            .where(o.id.in_(ids))
+            .with_for_update()
+        )
+    }
+
+    unchanged: List[int] = []
+    rejected: List[Dict[str, Any]] = []
+    movable: List[int] = []
+    for order_id in ids:
+        row = current.get(order_id)
+        if row is None:
+            rejected.append({"order_id": order_id, "reason": "not found"})
+        elif S(row.status) == target:
+            unchanged.append(order_id)
+        elif target not in TRANSITIONS[S(row.status)]:
+            rejected.append({"order_id": order_id, "status": S(row.status).value,
+                             "reason": f"cannot move from {S(row.status).value} to {target.value}"})
+        else:
+            movable.append(order_id)
+
+    updated: List[int] = []
+    if movable:
+        # The status guard keeps this safe where the SELECT could not lock (SQLite)
+        updated = list(db.scalars(
+            update(o)
+            .where(o.id.in_(movable), o.status.in_(sources(target)))
+            .values(status=target, updated_at=func.now())
+            .returning(o.id)
+            .execution_options(synchronize_session=False)
+        ))
+        done = set(updated)
+        rejected.extend({"order_id": i, "reason": "status changed concurrently"} for i in movable if i not in done)
+        rollups.statuses_changed(db, [(current[i], current[i].status) for i in updated], target)
+        response_cache.invalidate_orders(updated)
+
+    return {"status": target.value, "updated": updated, "unchanged": unchanged, "rejected": rejected}
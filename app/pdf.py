@@ -1,7 +1,22 @@
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
+from pypdf import PdfWriter
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+import zipfile
+
+from .config import settings
+
+# (order_id, ship_to, items) -- everything a slip's content depends on
+Slip = Tuple[int, Dict[str, Any], List[Dict[str, Any]]]
+
+# Bump when the slip layout changes so cached PDFs are not reused
+LAYOUT_VERSION = 1
 
 def build_packing_slip(order_id: int, ship_to: Dict[str, Any], items: List[Dict[str, Any]]) -> bytes:
     """Very simple packing slip PDF."""
@@ -44,3 +59,166 @@ def build_packing_slip(order_id: int, ship_to: Dict[str, Any], items: List[Dict[
     c.showPage()
     c.save()
     return buf.getvalue()
+
+def build_pick_list(wave: Dict[str, Any], title: str = "Pick Wave") -> bytes:
+    """Consolidated pick list followed by the put-wall slots (see app/picking.py)."""
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    width, height = letter
+
+    def header(text: str) -> float:
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(50, height - 50, text)
+        c.setFont("Helvetica", 10)
+        return height - 80
+
+    y = header(f"{title} - {wave['orders']} orders, {wave['units']} units")
+    c.setFont("Helvetica-Bold", 10)
+    for x, label in ((50, "Location"), (130, "SKU"), (260, "Qty"), (300, "Orders"), (350, "Item")):
+        c.drawString(x, y, label)
+    y -= 16
+    c.setFont("Helvetica", 10)
+    for p in wave["picks"]:
+        c.drawString(50, y, str(p["bin_location"] or "-")[:12])
+        c.drawString(130, y, str(p["sku_code"] or "")[:20])
+        c.drawRightString(280, y, str(p["qty"]))
+        c.drawRightString(330, y, str(p["orders"]))
+        c.drawString(350, y, str(p["title"] or "")[:45])
+        y -= 12
+        if y < 60:
+            c.showPage()
+            y = header(f"{title} (cont.)")
+    c.showPage()
+
+    y = header(f"{title} - Put Wall")
+    for slot in wave["put_wall"]:
+        needed = 14 + 12 * len(slot["lines"])
+        if y - needed < 50 and y < height - 80:
+            c.showPage()
+            y = header(f"{title} - Put Wall (cont.)")
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(50, y, f"Slot {slot['slot']}  -  Order #{slot['order_id']}  ({slot['units']} units)")
+        y -= 14
+        c.setFont("Helvetica", 10)
+        for line in slot["lines"]:
+            c.drawString(70, y, f"{line['qty']} x {line['sku_code'] or ''}"[:100])
+            y -= 12
+            if y < 50:
+                c.showPage()
+                y = header(f"{title} - Put Wall (cont.)")
+        y -= 6
+
+    c.showPage()
+    c.save()
+    return buf.getvalue()
+
+# --------- Batch rendering + content-addressed cache ---------
+
+def slip_cache_key(order_id: int, ship_to: Dict[str, Any], items: List[Dict[str, Any]]) -> str:
+    """Hash of everything printed on the slip; unchanged orders map to the same key."""
+    blob = json.dumps([LAYOUT_VERSION, order_id, ship_to, items], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _cache_path(key: str) -> Optional[str]:
+    if not settings.packing_slip_cache_dir:
+        return None
+    return os.path.join(settings.packing_slip_cache_dir, key[:2], f"{key}.pdf")
+
+def _cache_get(key: str) -> Optional[bytes]:
+    path = _cache_path(key)
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _cache_put(key: str, pdf: bytes):
+    path = _cache_path(key)
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp, path)
+
+def _render(slip: Slip) -> bytes:
+    return build_packing_slip(*slip)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.pdf_workers or os.cpu_count() or 1)
+        return _executor
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def get_packing_slip(order_id: int, ship_to: Dict[str, Any], items: List[Dict[str, Any]]) -> bytes:
+    """Single slip, rendered inline unless already cached."""
+    key = slip_cache_key(order_id, ship_to, items)
+    pdf = _cache_get(key)
+    if pdf is None:
+        pdf = build_packing_slip(order_id, ship_to, items)
+        _cache_put(key, pdf)
+    return pdf
+
+def render_packing_slips(slips: List[Slip]) -> List[bytes]:
+    """Render many slips, in input order. Cache misses are spread over a process pool."""
+    keys = [slip_cache_key(*slip) for slip in slips]
+    out: List[Optional[bytes]] = [_cache_get(k) for k in keys]
+    misses = [i for i, pdf in enumerate(out) if pdf is None]
+    if len(misses) == 1:
+        rendered = [_render(slips[misses[0]])]
+    elif misses:
+        workers = settings.pdf_workers or os.cpu_count() or 1
+        chunk = max(1, len(misses) // (4 * workers))
+        rendered = list(_get_executor().map(_render, [slips[i] for i in misses], chunksize=chunk))
+    else:
+        rendered = []
+    for i, pdf in zip(misses, rendered):
+        _cache_put(keys[i], pdf)
+        out[i] = pdf
+    return out
+
+def merge_pdfs(pdfs: List[bytes]) -> bytes:
+    writer = PdfWriter()
+    for pdf in pdfs:
+        writer.append(BytesIO(pdf))
+    buf = BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+def iter_zip(files: List[Tuple[str, bytes]]):
+    """Stream a ZIP of (name, data) pairs without building it in memory."""
+    sink = _ChunkSink()
+    # PDFs are already compressed; store them as-is
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+        for name, data in files:
+            zf.writestr(name, data)
+            yield from sink.chunks
+            sink.chunks.clear()
+    yield from sink.chunks
@@ -0,0 +1,83 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models, order_status
+
+# Pick waves: one walk of the warehouse for many orders.
+# - the wave is the oldest matching orders (status, minimum age, max size),
+#   optionally moved to PICKED so the next wave does not take them again
+# - the pick list is one GROUP BY over order_items: total qty per SKU, walked
+#   in bin_location order
+# - the put wall maps each order to a numbered slot and lists what goes in it
+# Only narrow column tuples are loaded, so waves of thousands of orders stay cheap.
+
+def select_wave(db: Session, status: models.OrderStatus = models.OrderStatus.PAID, min_age_minutes: int = 0,
+                max_orders: int = 500, order_ids: Optional[List[int]] = None) -> List[int]:
+    """Ids of the orders in the wave, oldest first."""
+    o = models.Order
+    q = select(o.id).where(o.status == status).order_by(o.created_at, o.id).limit(max_orders)
+    if order_ids:
+        q = q.where(o.id.in_(order_ids))
+    if min_age_minutes:
+        q = q.where(o.created_at <= datetime.now(timezone.utc) - timedelta(minutes=min_age_minutes))
+    return list(db.scalars(q))
+
+def pick_list(db: Session, order_ids: List[int]) -> List[Dict[str, Any]]:
+    oi, inv = models.OrderItem, models.Inventory
+    rows = db.execute(
+        select(
+            oi.sku_code, inv.bin_location, func.min(oi.title).label("title"),
+            func.sum(oi.qty).label("qty"), func.count(func.distinct(oi.order_id)).label("orders"),
+        )
+        .select_from(oi)
+        .outerjoin(inv, inv.sku_id == oi.sku_id)
+        .where(oi.order_id.in_(order_ids))
+        .group_by(oi.sku_code, inv.bin_location)
+        .order_by(inv.bin_location.nulls_last(), oi.sku_code)
+    )
+    return [{"bin_location": r.bin_location, "sku_code": r.sku_code, "title": r.title,
+             "qty": int(r.qty), "orders": r.orders} for r in rows]
+
+def put_wall(db: Session, order_ids: List[int]) -> List[Dict[str, Any]]:
+    """One slot per order, numbered in wave order."""
+    oi, o = models.OrderItem, models.Order
+    lines = defaultdict(list)
+    for order_id, sku_code, qty in db.execute(
+        select(oi.order_id, oi.sku_code, oi.qty).where(oi.order_id.in_(order_ids)).order_by(oi.order_id, oi.id)
+    ):
+        lines[order_id].append({"sku_code": sku_code, "qty": qty})
+    shopify_ids = dict(db.execute(select(o.id, o.shopify_order_id).where(o.id.in_(order_ids))).all())
+    return [{
+        "slot": slot,
+        "order_id": order_id,
+        "shopify_order_id": shopify_ids.get(order_id),
+        "units": sum(line["qty"] for line in lines[order_id]),
+        "lines": lines[order_id],
+    } for slot, order_id in enumerate(order_ids, 1)]
+
+def build_wave(db: Session, status: models.OrderStatus = models.OrderStatus.PAID, min_age_minutes: int = 0,
+               max_orders: int = 500, order_ids: Optional[List[int]] = None, mark_picked: bool = False) -> Dict[str, Any]:
+    """Select a wave and build its pick list and put wall. Caller commits when mark_picked."""
+    ids = select_wave(db, status, min_age_minutes, max_orders, order_ids)
+    if ids and mark_picked:
+        # Orders another wave (or a status change) took in the meantime are dropped:
+        # an order that is already PICKED was taken by someone else, unless PICKED
+        # orders were asked for in the first place (a re-print)
+        result = order_status.transition(db, ids, models.OrderStatus.PICKED)
+        taken = set(result["updated"])
+        if status == models.OrderStatus.PICKED:
+            taken |= set(result["unchanged"])
+        ids = [i for i in ids if i in taken]
+    if not ids:
+        return {"orders": 0, "units": 0, "picks": [], "put_wall": []}
+    picks = pick_list(db, ids)
+    return {
+        "orders": len(ids),
+        "units": sum(p["qty"] for p in picks),
+        "picks": picks,
+        "put_wall": put_wall(db, ids),
+    }
@@ -0,0 +1,135 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Hashable, Iterable, Mapping, Optional, Tuple
+
+from .config import settings
+
+# Conditional GET + in-process cache of serialized order responses.
+# Validators come from orders.updated_at (bumped by the trigger in db/schema.sql
+# and by every status change), so:
+# - a client sending If-None-Match / If-Modified-Since for an unchanged order
+#   gets a 304 after one single-row lookup, without its items being loaded
+# - cached bodies are stored with their ETag and only served while the ETag still
+#   matches, so a write made by another worker can never be served stale
+# - writes in this process also invalidate() the order's entry right away
+
+# Bump when the JSON shape of a cached response changes
+LAYOUT_VERSION = 1
+
+class ResponseCache:
+    """Bounded LRU of key -> (etag, body bytes)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, etag: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] == etag:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                # Changed since it was cached
+                del self._data[key]
+                self.stale += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, etag: str, body: bytes):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (etag, body)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Iterable[Hashable]):
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            served = lookups + self.not_modified
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                # 304s and cache hits both avoided loading items / serializing
+                "saved_rate": (self.hits + self.not_modified) / served if served else 0.0,
+            }
+
+cache = ResponseCache(settings.response_cache_max_entries)
+
+def order_key(order_id: int) -> Tuple[str, int]:
+    return ("order", order_id)
+
+def invalidate_orders(order_ids: Iterable[int]):
+    cache.invalidate(order_key(i) for i in order_ids)
+
+def _utc(ts: datetime) -> datetime:
+    # SQLite hands back naive UTC timestamps
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+def order_etag(order_id: int, updated_at: datetime) -> str:
+    return f'"o{LAYOUT_VERSION}-{order_id}-{int(_utc(updated_at).timestamp() * 1_000_000)}"'
+
+def list_etag(params: Iterable[Any], rows: Iterable[Tuple[int, datetime]]) -> str:
+    h = hashlib.blake2b(repr((LAYOUT_VERSION, tuple(params))).encode("utf-8"), digest_size=12)
+    for order_id, updated_at in rows:
+        h.update(f"{order_id}:{_utc(updated_at).timestamp()};".encode("ascii"))
+    return f'"l{h.hexdigest()}"'
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_utc(last_modified), usegmt=True)
+    return headers
+
+def not_modified(request_headers: Mapping[str, str], etag: str, last_modified: Optional[datetime]) -> bool:
+    """RFC 9110 precedence: If-None-Match wins; If-Modified-Since is only checked without it."""
+    inm = request_headers.get("if-none-match")
+    if inm is not None:
+        tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+        return "*" in tags or etag in tags
+    ims = request_headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return _utc(last_modified).replace(microsecond=0) <= since
+    return False
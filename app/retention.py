@@ -0,0 +1,56 @@
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import SessionLocal
+from . import models
+
+# Time-based retention for the webhook de-duplication tables.
+# webhook_events rows and DONE webhook_inbox rows older than WEBHOOK_RETENTION_DAYS
+# are deleted BATCH_SIZE at a time, one short transaction per batch, so the
+# webhook_id unique indexes stay small. Shopify stops retrying a delivery long
+# before the cutoff. DEAD inbox rows are kept for inspection.
+# (Range-partitioning by received_at was ruled out: Postgres requires the partition
+# key in every unique index, which would lose global webhook_id uniqueness.)
+# Run from cron or as `python -m app.retention --every 3600`.
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+def _purge(db: Session, model, cutoff: datetime, *where) -> int:
+    total = 0
+    while True:
+        batch = select(model.id).where(model.received_at < cutoff, *where).order_by(model.received_at).limit(BATCH_SIZE)
+        deleted = db.execute(delete(model).where(model.id.in_(batch.scalar_subquery()))).rowcount
+        db.commit()
+        total += deleted
+        if deleted < BATCH_SIZE:
+            return total
+
+def purge(retention_days: Optional[float] = None) -> Dict[str, int]:
+    days = settings.webhook_retention_days if retention_days is None else retention_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    with SessionLocal() as db:
+        return {
+            "webhook_events": _purge(db, models.WebhookEvent, cutoff),
+            "webhook_inbox": _purge(db, models.WebhookInbox, cutoff, models.WebhookInbox.status == models.InboxStatus.DONE),
+        }
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Delete old webhook de-duplication rows")
+    parser.add_argument("--days", type=float, default=None, help="override WEBHOOK_RETENTION_DAYS")
+    parser.add_argument("--every", type=float, default=0, help="repeat every N seconds")
+    args = parser.parse_args()
+    while True:
+        log.info("purged %s", purge(args.days))
+        if not args.every:
+            break
+        time.sleep(args.every)
@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Date, Text, cast, delete, distinct, func, insert, select, union_all
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import SessionLocal, upsert_insert
+from . import archive, models
+
+# Daily reporting rollups.
+# Orders are bucketed by day (placed_at, else created_at, in REPORTING_TIMEZONE).
+# - orders_daily_status: every order, under its current status
+# - sales_daily_sku / sales_daily_province: orders that count as sales, i.e. not
+#   CANCELLED or RETURNED; moving in or out of those statuses adds/subtracts the order
+# Writers call order_created() / status_changed() in the same transaction as the
+# order change. That only appends aggregated increments to rollup_deltas: updating
+# the daily rows directly would make every order of the day wait on the same
+# (today, IMPORTED) row lock. fold() moves pending deltas into the daily rows
+# (INSERT ... ON CONFLICT DO UPDATE, keys in sorted order) every
+# ROLLUP_FOLD_SECONDS in-process, or `python -m app.rollups --fold --every N`;
+# report_query() adds the deltas not folded yet, so reports never lag.
+# rebuild() recomputes history in id-range chunks (Postgres).
+
+log = logging.getLogger(__name__)
+
+NOT_SALES = {models.OrderStatus.CANCELLED, models.OrderStatus.RETURNED}
+
+# report name -> (rollup model, key column)
+REPORTS = {
+    "sku": (models.SalesDailySKU, "sku_code"),
+    "province": (models.SalesDailyProvince, "province"),
+    "status": (models.OrdersDailyStatus, "status"),
+}
+
+_tz = ZoneInfo(settings.reporting_timezone)
+
+# (sku_code, qty, line_total_cents)
+Line = Tuple[Optional[str], int, int]
+
+def report_day(placed_at: Optional[datetime], created_at: Optional[datetime] = None) -> date:
+    ts = placed_at or created_at or datetime.now(timezone.utc)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(_tz).date()
+
+def counts_as_sale(status) -> bool:
+    return models.OrderStatus(status) not in NOT_SALES
+
+_REPORT_OF = {model: name for name, (model, _) in REPORTS.items()}
+
+def _bump(db: Session, model, keys: List[str], rows: List[Dict]):
+    """Record the counters in rows as pending increments to model."""
+    rows = [r for r in rows if any(r[c] for c in r if c not in keys)]
+    if not rows:
+        return
+    report, key_col = _REPORT_OF[model], keys[1]
+    db.execute(insert(models.RollupDelta), [{
+        "report": report, "day": r["day"], "key": r[key_col], "orders": r["orders"],
+        "units": r.get("units", 0), "revenue_cents": r["revenue_cents"],
+    } for r in rows])
+
+def _add(db: Session, model, keys: List[str], rows: List[Dict]):
+    """Add the counters in rows onto model, creating missing keys.
+
+    Rows are written in key order so concurrent folds lock them in the same order.
+    """
+    if not rows:
+        return
+    rows = sorted(rows, key=lambda r: tuple(r[k] for k in keys))
+    table = model.__table__
+    stmt = upsert_insert(db, model).values(rows)
+    counters = [c for c in rows[0] if c not in keys]
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=keys, set_={c: table.c[c] + stmt.excluded[c] for c in counters}
+    ))
+
+# (day, sign, total_cents, province, lines) for one order entering (+1) or leaving (-1) the sales rollups
+Sale = Tuple[date, int, int, Optional[str], Iterable[Line]]
+
+def _apply_sales(db: Session, sales: Iterable[Sale], write=None):
+    per_sku: Dict[Tuple[date, str], List[int]] = defaultdict(lambda: [0, 0, 0])
+    per_province: Dict[Tuple[date, str], List[int]] = defaultdict(lambda: [0, 0])
+    for day, sign, total_cents, province, lines in sales:
+        skus = set()
+        for sku_code, qty, line_total in lines:
+            acc = per_sku[(day, sku_code or "")]
+            acc[1] += sign * qty
+            acc[2] += sign * line_total
+            skus.add(sku_code or "")
+        for code in skus:
+            per_sku[(day, code)][0] += sign
+        acc = per_province[(day, province or "")]
+        acc[0] += sign
+        acc[1] += sign * total_cents
+    write = write or _bump
+    write(db, models.SalesDailySKU, ["day", "sku_code"], [
+        {"day": day, "sku_code": code, "orders": orders, "units": units, "revenue_cents": revenue}
+        for (day, code), (orders, units, revenue) in per_sku.items()
+    ])
+    write(db, models.SalesDailyProvince, ["day", "province"], [
+        {"day": day, "province": province, "orders": orders, "revenue_cents": revenue}
+        for (day, province), (orders, revenue) in per_province.items()
+    ])
+
+def order_created(db: Session, order: models.Order, lines: List[Line], province: Optional[str]):
+    orders_created(db, [(order, lines, province)])
+
+def orders_created(db: Session, created: Iterable[Tuple[models.Order, List[Line], Optional[str]]]):
+    """order_created for many orders, still one statement per rollup."""
+    per_status: Dict[Tuple[date, str], List[int]] = defaultdict(lambda: [0, 0])
+    sales = []
+    for order, lines, province in created:
+        # created_at is a server default; avoid a refresh and bucket undated orders by now()
+        day = report_day(order.placed_at)
+        status = models.OrderStatus(order.status)
+        acc = per_status[(day, status.value)]
+        acc[0] += 1
+        acc[1] += order.total_cents
+        if counts_as_sale(status):
+            sales.append((day, 1, order.total_cents, province, lines))
+    _bump(db, models.OrdersDailyStatus, ["day", "status"], [
+        {"day": day, "status": status, "orders": orders, "revenue_cents": revenue}
+        for (day, status), (orders, revenue) in per_status.items()
+    ])
+    if sales:
+        _apply_sales(db, sales)
+
+def statuses_changed(db: Session, changes: Iterable[Tuple[Any, Any]], new):
+    """Move (order, old_status) pairs to status new, in one statement per rollup.
+
+    order needs id, placed_at, created_at, total_cents and shipping_address_id.
+    """
+    new = models.OrderStatus(new)
+    per_status: Dict[Tuple[date, str], List[int]] = defaultdict(lambda: [0, 0])
+    moves = []
+    for order, old in changes:
+        old = models.OrderStatus(old)
+        if old == new:
+            continue
+        day = report_day(order.placed_at, order.created_at)
+        for status, sign in ((old, -1), (new, 1)):
+            acc = per_status[(day, status.value)]
+            acc[0] += sign
+            acc[1] += sign * order.total_cents
+        if counts_as_sale(old) != counts_as_sale(new):
+            moves.append((order, day, 1 if counts_as_sale(new) else -1))
+    _bump(db, models.OrdersDailyStatus, ["day", "status"], [
+        {"day": day, "status": status, "orders": orders, "revenue_cents": revenue}
+        for (day, status), (orders, revenue) in per_status.items()
+    ])
+    if not moves:
+        return
+
+    lines: Dict[int, List[Line]] = defaultdict(list)
+    for order_id, sku_code, qty, line_total in db.execute(
+        select(models.OrderItem.order_id, models.OrderItem.sku_code, models.OrderItem.qty, models.OrderItem.line_total_cents)
+        .where(models.OrderItem.order_id.in_([o.id for o, _, _ in moves]))
+    ):
+        lines[order_id].append((sku_code, qty, line_total))
+    addr_ids = {o.shipping_address_id for o, _, _ in moves if o.shipping_address_id}
+    provinces = dict(db.execute(
+        select(models.Address.id, models.Address.province).where(models.Address.id.in_(addr_ids))
+    ).all()) if addr_ids else {}
+    _apply_sales(db, [
+        (day, sign, o.total_cents, provinces.get(o.shipping_address_id), lines[o.id]) for o, day, sign in moves
+    ])
+
+def status_changed(db: Session, order: models.Order, old, new):
+    statuses_changed(db, [(order, old)], new)
+
+# --------- Folding pending deltas ---------
+
+FOLD_BATCH = 20000
+
+def fold_batch(db: Session, limit: int = FOLD_BATCH) -> int:
+    """Move up to limit pending deltas into the rollup tables. Caller commits."""
+    d = models.RollupDelta
+    # SKIP LOCKED: concurrent folders take disjoint deltas
+    ids = list(db.scalars(select(d.id).order_by(d.id).limit(limit).with_for_update(skip_locked=True)))
+    if not ids:
+        return 0
+    totals: Dict[Tuple[str, date, str], List[int]] = defaultdict(lambda: [0, 0, 0])
+    for report, day, key, orders, units, revenue in db.execute(
+        select(d.report, d.day, d.key, d.orders, d.units, d.revenue_cents).where(d.id.in_(ids))
+    ):
+        acc = totals[(report, day, key)]
+        acc[0] += orders
+        acc[1] += units
+        acc[2] += revenue
+    for report, (model, key_col) in REPORTS.items():
+        counters = [c.name for c in model.__table__.columns if not c.primary_key]
+        _add(db, model, ["day", key_col], [
+            {"day": day, key_col: key, **{c: v for c, v in zip(("orders", "units", "revenue_cents"), acc) if c in counters}}
+            for (r, day, key), acc in totals.items() if r == report
+        ])
+    db.execute(delete(d).where(d.id.in_(ids)))
+    return len(ids)
+
+def fold(limit: int = FOLD_BATCH) -> int:
+    """Fold every pending delta, one transaction per batch."""
+    folded = 0
+    with SessionLocal() as db:
+        while True:
+            n = fold_batch(db, limit)
+            db.commit()
+            folded += n
+            if n < limit:
+                return folded
+
+async def run_forever():
+    while True:
+        try:
+            await asyncio.to_thread(fold)
+        except Exception:
+            log.exception("rollup fold error")
+        await asyncio.sleep(settings.rollup_fold_seconds)
+
+def report_query(by: str, date_from: date, date_to: date, key: Optional[str] = None):
+    """Daily rows of report by: folded totals plus pending deltas, ordered by day and key."""
+    model, key_col = REPORTS[by]
+    d = models.RollupDelta
+    counters = [c for c in model.__table__.columns if not c.primary_key]
+    model_key = getattr(model, key_col)
+    folded = select(model.day, model_key.label("key"), *counters).where(model.day >= date_from, model.day <= date_to)
+    pending = select(d.day, d.key, *[getattr(d, c.name) for c in counters]).where(
+        d.report == by, d.day >= date_from, d.day <= date_to)
+    if key is not None:
+        folded = folded.where(model_key == key)
+        pending = pending.where(d.key == key)
+    u = union_all(folded, pending).subquery()
+    return (
+        select(u.c.day, u.c.key.label(key_col), *[cast(func.sum(u.c[c.name]), c.type).label(c.name) for c in counters])
+        .group_by(u.c.day, u.c.key)
+        .order_by(u.c.day, u.c.key)
+    )
+
+# --------- Rebuild from history ---------
+
+def _day_expr():
+    ts = func.coalesce(models.Order.placed_at, models.Order.created_at)
+    return cast(func.timezone(settings.reporting_timezone, ts), Date)
+
+def _bump_from(db: Session, model, keys: List[str], counters: List[str], query):
+    table = model.__table__
+    stmt = upsert_insert(db, model).from_select(keys + counters, query)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=keys, set_={c: table.c[c] + stmt.excluded[c] for c in counters}
+    ))
+
+def rebuild(date_from: Optional[date] = None, date_to: Optional[date] = None, chunk_size: int = 10000):
+    """Recompute rollups for [date_from, date_to] (inclusive; open-ended if None).
+
+    Runs one transaction per chunk of order ids, over orders and then
+    orders_archive. Orders created after the rebuild starts are left to the
+    live writers; status changes to orders in chunks not yet rebuilt would be
+    counted twice, and an order archived mid-run may be missed or counted
+    twice, so run it while admin traffic and the archive job are quiet.
+    """
+    day = _day_expr()
+    with SessionLocal() as db:
+        for model in [m for m, _ in REPORTS.values()] + [models.RollupDelta]:
+            q = delete(model)
+            if date_from:
+                q = q.where(model.day >= date_from)
+            if date_to:
+                q = q.where(model.day <= date_to)
+            db.execute(q)
+        db.commit()
+
+        max_id = db.scalar(select(func.max(models.Order.id))) or 0
+        o, it, addr = models.Order, models.OrderItem, models.Address
+        sale = o.status.not_in(list(NOT_SALES))
+        last = 0
+        while last < max_id:
+            hi = last + chunk_size
+            where = [o.id > last, o.id <= hi]
+            if date_from:
+                where.append(day >= date_from)
+            if date_to:
+                where.append(day <= date_to)
+            d = day.label("day")
+
+            _bump_from(db, models.OrdersDailyStatus, ["day", "status"], ["orders", "revenue_cents"],
+                       select(d, cast(o.status, Text), func.count(), func.sum(o.total_cents))
+                       .where(*where).group_by(d, o.status))
+            province = func.coalesce(addr.province, "")
+            _bump_from(db, models.SalesDailyProvince, ["day", "province"], ["orders", "revenue_cents"],
+                       select(d, province, func.count(), func.sum(o.total_cents))
+                       .select_from(o).outerjoin(addr, addr.id == o.shipping_address_id)
+                       .where(*where, sale).group_by(d, province))
+            sku_code = func.coalesce(it.sku_code, "")
+            _bump_from(db, models.SalesDailySKU, ["day", "sku_code"], ["orders", "units", "revenue_cents"],
+                       select(d, sku_code, func.count(distinct(o.id)), func.sum(it.qty), func.sum(it.line_total_cents))
+                       .select_from(o).join(it, it.order_id == o.id)
+                       .where(*where, sale).group_by(d, sku_code))
+            db.commit()
+            last = hi
+            log.info("rollups rebuilt through order id %d of %d", min(hi, max_id), max_id)
+
+        # Archived orders: items and shipping address are in the compressed doc
+        arc = models.OrderArchive
+        last = 0
+        while True:
+            rows = db.execute(
+                select(arc.id, arc.status, arc.total_cents, arc.placed_at, arc.created_at, arc.doc)
+                .where(arc.id > last).order_by(arc.id).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            per_status: Dict[Tuple[date, str], List[int]] = defaultdict(lambda: [0, 0])
+            sales = []
+            for r in rows:
+                day = report_day(r.placed_at, r.created_at)
+                if (date_from and day < date_from) or (date_to and day > date_to):
+                    continue
+                acc = per_status[(day, r.status)]
+                acc[0] += 1
+                acc[1] += r.total_cents
+                if counts_as_sale(r.status):
+                    doc = archive.decode_doc(r.doc)
+                    lines = [(i["sku_code"], i["qty"], i["line_total_cents"]) for i in doc["items"]]
+                    sales.append((day, 1, r.total_cents, (doc["shipping_address"] or {}).get("province"), lines))
+            _add(db, models.OrdersDailyStatus, ["day", "status"], [
+                {"day": day, "status": status, "orders": orders, "revenue_cents": revenue}
+                for (day, status), (orders, revenue) in per_status.items()
+            ])
+            _apply_sales(db, sales, write=_add)
+            db.commit()
+            last = rows[-1].id
+            log.info("rollups rebuilt through archived order id %d", last)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild daily sales/status rollups from order history")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--fold", action="store_true", help="fold pending deltas instead of rebuilding")
+    parser.add_argument("--every", type=float, default=0, help="with --fold, repeat every N seconds")
+    args = parser.parse_args()
+    if not args.fold:
+        rebuild(args.date_from, args.date_to, args.chunk_size)
+    else:
+        while True:
+            log.info("folded %d rollup deltas", fold())
+            if not args.every:
+                break
+            time.sleep(args.every)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class SKUCreate(BaseModel):
@@ -12,6 +12,7 @@ class SKUCreate(BaseModel):
     cost_cents: int = 0
     qty_on_hand: int = 0
     reorder_level: int = 0
+    bin_location: Optional[str] = None
 
 class SKUOut(BaseModel):
     sku_code: str
@@ -28,6 +29,14 @@ class InventoryAdjust(BaseModel):
     delta_reserved: int = 0
     reason: Optional[str] = None
 
+class HotSKUIn(BaseModel):
+    sku_code: str
+    slots: Optional[int] = Field(None, ge=1, le=256)
+
+class InventoryAdjustBatch(BaseModel):
+    adjustments: List[InventoryAdjust] = Field(..., min_length=1, max_length=10000)
+    source: str = "batch"
+
 class OrderItemOut(BaseModel):
     sku_code: Optional[str]
     title: Optional[str]
@@ -43,3 +52,30 @@ class OrderOut(BaseModel):
     placed_at: Optional[datetime]
     created_at: datetime
     items: List[OrderItemOut] = []
+
+# Built once at import; routes serialize straight to JSON bytes with these
+sku_out = TypeAdapter(SKUOut)
+order_out = TypeAdapter(OrderOut)
+
+class OrderStatusBatch(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=5000)
+    status: str
+
+class ShipmentIn(BaseModel):
+    tracking_number: str = Field(..., min_length=1)
+    carrier: Optional[str] = None
+    shipped_at: Optional[datetime] = None
+
+class PickWaveRequest(BaseModel):
+    order_ids: Optional[List[int]] = Field(None, max_length=5000)
+    status: str = "PAID"
+    min_age_minutes: int = Field(0, ge=0)
+    max_orders: int = Field(500, ge=1, le=5000)
+    mark_picked: bool = False
+    format: Literal["json", "pdf"] = "json"
+
+class PackingSlipBatch(BaseModel):
+    order_ids: Optional[List[int]] = None
+    status: Optional[str] = None
+    format: Literal["pdf", "zip"] = "pdf"
+    limit: int = Field(500, ge=1, le=2000)
@@ -0,0 +1,171 @@
+import argparse
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, desc, func, or_, select
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, upsert_insert
+from . import archive, models
+
+# Admin order search over an inverted index kept in order_search_terms.
+# Every order gets casefolded, accent-stripped terms for its customer email (whole
+# and local part), customer/recipient names, postal code (no space), Shopify
+# order id and number, internal id and SKU codes, written in the same
+# transaction as the order. A query is split into tokens; each token is a prefix
+# range scan on the (term, order_id) primary key, and an order must match every
+# token. Exact term matches score 2, prefix matches 1; ties go to the newest
+# order. Terms describe the order as it was placed: later customer edits don't
+# rewrite them. Orders written before this existed are indexed by
+# `python -m app.search`.
+
+log = logging.getLogger(__name__)
+
+MIN_TOKEN = 2
+MAX_TOKENS = 5
+_SPLIT = re.compile(r"[\s,;]+")
+_POSTAL = re.compile(r"\b([a-z]\d[a-z])\s+(\d[a-z]\d)\b")
+
+def normalize(value: Optional[str]) -> str:
+    value = unicodedata.normalize("NFKD", str(value or "").strip().casefold())
+    return "".join(ch for ch in value if not unicodedata.combining(ch))
+
+def query_tokens(q: str) -> List[str]:
+    """Search tokens of a query: "#1001", "M5H 1A1" and "Élise" become "1001", "m5h1a1", "elise"."""
+    q = _POSTAL.sub(r"\1\2", normalize(q))
+    tokens = [t.lstrip("#") for t in _SPLIT.split(q)]
+    return list(dict.fromkeys(t for t in tokens if len(t) >= MIN_TOKEN))[:MAX_TOKENS]
+
+def order_terms(order_id: int, shopify_order_id: Optional[int], order_number: Any, email: Optional[str],
+                names: Iterable[Optional[str]], postal_code: Optional[str], sku_codes: Iterable[Optional[str]]) -> Set[Tuple[str, str]]:
+    terms = {(str(order_id), "order")}
+    for number in (shopify_order_id, order_number):
+        if number:
+            terms.add((str(number).lstrip("#"), "order"))
+    email = normalize(email)
+    if email:
+        terms.add((email, "email"))
+        terms.add((email.split("@", 1)[0], "email"))
+    for name in names:
+        terms.update((part, "name") for part in _SPLIT.split(normalize(name)) if part)
+    postal = normalize(postal_code).replace(" ", "")
+    if postal:
+        terms.add((postal, "postal"))
+    terms.update((normalize(code), "sku") for code in sku_codes if code)
+    return {(term, kind) for term, kind in terms if term}
+
+def _rows(order_id: int, terms: Set[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    return [{"term": term, "order_id": order_id, "kind": kind} for term, kind in terms]
+
+def _write(db: Session, rows: List[Dict[str, Any]]):
+    if rows:
+        db.execute(upsert_insert(db, models.OrderSearchTerm).on_conflict_do_nothing(index_elements=["term", "order_id"]), rows)
+
+def index_order(db: Session, order_id: int, terms: Set[Tuple[str, str]]):
+    """Write an order's terms. Caller commits."""
+    _write(db, _rows(order_id, terms))
+
+def _prefix_hits(token: str):
+    """order_id -> 2 if some term equals token, else 1 (prefix match only)."""
+    t = models.OrderSearchTerm
+    return (
+        select(t.order_id, func.max(case((t.term == token, 2), else_=1)).label("score"))
+        .where(t.term >= token, t.term < token + "\uffff")
+        .group_by(t.order_id)
+        .subquery()
+    )
+
+def _summaries(db: Session, model, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    c = models.Customer
+    rows = db.execute(
+        select(model.id, model.shopify_order_id, model.status, model.total_cents, model.created_at, c.email, c.first_name, c.last_name)
+        .outerjoin(c, c.id == model.customer_id)
+        .where(model.id.in_(ids))
+    )
+    return {r.id: {
+        "id": r.id,
+        "shopify_order_id": r.shopify_order_id,
+        "status": getattr(r.status, "value", r.status),
+        "total_cents": r.total_cents,
+        "created_at": r.created_at,
+        "email": r.email,
+        "name": " ".join(p for p in (r.first_name, r.last_name) if p) or None,
+        "archived": model is models.OrderArchive,
+    } for r in rows}
+
+def search(db: Session, q: str, limit: int = 20, after: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    """Orders matching every token of q, best first. after = (score, order_id) of the previous page's last hit."""
+    tokens = query_tokens(q)
+    if not tokens:
+        return []
+    hits = [_prefix_hits(token) for token in tokens]
+    first = hits[0]
+    ranked = select(first.c.order_id, sum((h.c.score for h in hits[1:]), first.c.score).label("score"))
+    for h in hits[1:]:
+        ranked = ranked.join(h, h.c.order_id == first.c.order_id)
+    ranked = ranked.subquery()
+    page = select(ranked.c.order_id, ranked.c.score).order_by(desc(ranked.c.score), desc(ranked.c.order_id)).limit(limit)
+    if after:
+        page = page.where(or_(ranked.c.score < after[0], and_(ranked.c.score == after[0], ranked.c.order_id < after[1])))
+    scores = dict(db.execute(page).all())
+    found = _summaries(db, models.Order, list(scores))
+    missing = [i for i in scores if i not in found]
+    if missing:
+        found.update(_summaries(db, models.OrderArchive, missing))
+    return [{**found[i], "score": score} for i, score in scores.items() if i in found]
+
+# --------- Backfill for orders written before search existed ---------
+
+def reindex(chunk_size: int = 5000) -> Dict[str, int]:
+    """(Re)write terms for every live and archived order, one transaction per id chunk. Safe to re-run."""
+    o, c, a, it, arc = models.Order, models.Customer, models.Address, models.OrderItem, models.OrderArchive
+    indexed = {"orders": 0, "archived": 0}
+    with SessionLocal() as db:
+        last = 0
+        while True:
+            rows = db.execute(
+                select(o.id, o.shopify_order_id, c.email, c.first_name, c.last_name, a.postal_code)
+                .outerjoin(c, c.id == o.customer_id).outerjoin(a, a.id == o.shipping_address_id)
+                .where(o.id > last).order_by(o.id).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            skus = defaultdict(set)
+            for order_id, sku_code in db.execute(select(it.order_id, it.sku_code).where(it.order_id.in_([r.id for r in rows]))):
+                skus[order_id].add(sku_code)
+            _write(db, [row for r in rows for row in _rows(r.id, order_terms(
+                r.id, r.shopify_order_id, None, r.email, (r.first_name, r.last_name), r.postal_code, skus[r.id]))])
+            db.commit()
+            last = rows[-1].id
+            indexed["orders"] += len(rows)
+            log.info("orders: indexed through id %d", last)
+        last = 0
+        while True:
+            rows = db.execute(
+                select(arc.id, arc.shopify_order_id, arc.doc, c.email, c.first_name, c.last_name)
+                .outerjoin(c, c.id == arc.customer_id)
+                .where(arc.id > last).order_by(arc.id).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            terms = []
+            for r in rows:
+                doc = archive.decode_doc(r.doc)
+                terms += _rows(r.id, order_terms(r.id, r.shopify_order_id, None, r.email, (r.first_name, r.last_name),
+                                                 (doc["shipping_address"] or {}).get("postal_code"),
+                                                 (i["sku_code"] for i in doc["items"])))
+            _write(db, terms)
+            db.commit()
+            last = rows[-1].id
+            indexed["archived"] += len(rows)
+    return indexed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build search terms for existing orders")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(reindex(args.chunk_size))
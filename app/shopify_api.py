@@ -0,0 +1,118 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .config import settings
+
+# Async Shopify Admin REST client for outbound calls.
+# One pooled httpx.AsyncClient per process; every call first takes a token from a
+# leaky bucket sized like Shopify's limit, and the bucket is corrected from the
+# X-Shopify-Shop-Api-Call-Limit header ("used/size") on each response. A 429
+# drains nothing for Retry-After seconds.
+
+class ShopifyAPIError(Exception):
+    def __init__(self, status: int, message: str, retryable: bool):
+        super().__init__(f"Shopify API {status}: {message}")
+        self.status = status
+        self.retryable = retryable
+
+class LeakyBucket:
+    """Client-side mirror of Shopify's REST leaky bucket."""
+
+    def __init__(self, size: int, leak_per_second: float):
+        self.size = size
+        self.leak_per_second = leak_per_second
+        self.level = 0.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    def _leak(self):
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self._updated) * self.leak_per_second)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._leak()
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self.level + 1 <= self.size:
+                    self.level += 1
+                    return
+                wait = max(wait, (self.level + 1 - self.size) / self.leak_per_second, 0.01)
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+    def observe(self, header: Optional[str]):
+        """Adopt the server's view, e.g. "32/40"."""
+        try:
+            used, size = (int(x) for x in (header or "").split("/"))
+        except ValueError:
+            return
+        self._leak()
+        self.size = size
+        self.level = max(self.level, float(used))
+
+    def pause(self, seconds: float):
+        self._leak()
+        self.level = float(self.size)
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class ShopifyClient:
+    def __init__(self, base_url: Optional[str] = None, token: Optional[str] = None,
+                 api_version: Optional[str] = None, bucket: Optional[LeakyBucket] = None,
+                 max_connections: int = 10, transport: Optional[httpx.AsyncBaseTransport] = None):
+        base = base_url or settings.shopify_api_base_url or f"https://{settings.shopify_shop_domain}"
+        self.prefix = f"/admin/api/{api_version or settings.shopify_api_version}"
+        self.bucket = bucket or LeakyBucket(settings.shopify_api_bucket_size, settings.shopify_api_leak_per_second)
+        self.calls = 0
+        self.throttled = 0
+        self._http = httpx.AsyncClient(
+            base_url=base,
+            headers={"X-Shopify-Access-Token": token or settings.shopify_admin_access_token},
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self.bucket.acquire()
+        self.calls += 1
+        try:
+            resp = await self._http.request(method, self.prefix + path, json=json)
+        except httpx.HTTPError as exc:
+            raise ShopifyAPIError(0, repr(exc), retryable=True)
+        self.bucket.observe(resp.headers.get("x-shopify-shop-api-call-limit"))
+        if resp.status_code == 429:
+            self.throttled += 1
+            self.bucket.pause(float(resp.headers.get("retry-after") or 2.0))
+            raise ShopifyAPIError(429, "throttled", retryable=True)
+        if resp.status_code >= 400:
+            raise ShopifyAPIError(resp.status_code, resp.text[:500], retryable=resp.status_code >= 500)
+        return resp.json() if resp.content else {}
+
+    async def open_fulfillment_orders(self, shopify_order_id: int) -> List[Dict[str, Any]]:
+        data = await self.request("GET", f"/orders/{shopify_order_id}/fulfillment_orders.json")
+        return [fo for fo in data.get("fulfillment_orders", []) if fo.get("status") in ("open", "in_progress")]
+
+    async def create_fulfillment(self, fulfillment_order_ids: List[int], tracking: Dict[str, Any]) -> Dict[str, Any]:
+        data = await self.request("POST", "/fulfillments.json", {"fulfillment": {
+            "line_items_by_fulfillment_order": [{"fulfillment_order_id": i} for i in fulfillment_order_ids],
+            "tracking_info": tracking,
+            "notify_customer": True,
+        }})
+        return data.get("fulfillment", {})
+
+    async def update_tracking(self, fulfillment_id: int, tracking: Dict[str, Any]) -> Dict[str, Any]:
+        data = await self.request("POST", f"/fulfillments/{fulfillment_id}/update_tracking.json", {"fulfillment": {
+            "tracking_info": tracking,
+            "notify_customer": False,
+        }})
+        return data.get("fulfillment", {})
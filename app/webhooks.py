@@ -0,0 +1,229 @@
+from sqlalchemy.orm import Session
+from collections import OrderedDict, defaultdict
+from sqlalchemy import func, select, insert
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+import threading
+import uuid
+
+from .config import settings
+from .db import upsert_insert
+from . import models, customers, inventory, response_cache, rollups, search
+from .shopify import money_to_cents
+
+# Order webhook processing, shared by the HTTP routes and the inbox workers.
+# Each handler runs its own transaction and starts it by claiming the webhook_id
+# in webhook_events (INSERT ... ON CONFLICT DO NOTHING), so a webhook_id is only
+# ever processed once however it reaches us. A concurrent duplicate blocks on
+# the uncommitted row and then sees the conflict.
+# `recent` remembers webhook_ids this process has committed so the HTTP route
+# can answer obvious Shopify retries without touching the database.
+
+class RecentWebhookIds:
+    """Bounded LRU set of webhook_ids already handled by this process."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, webhook_id: str) -> bool:
+        with self._lock:
+            if webhook_id in self._data:
+                self._data.move_to_end(webhook_id)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, webhook_id: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[webhook_id] = None
+            self._data.move_to_end(webhook_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._data), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+recent = RecentWebhookIds(settings.webhook_recent_ids)
+
+def webhook_meta(headers: Mapping[str, str], default_topic: str) -> Tuple[str, str, str]:
+    """Return (webhook_id, shop_domain, topic) from Shopify webhook headers."""
+    webhook_id = headers.get("x-shopify-webhook-id") or str(uuid.uuid4())
+    shop_domain = headers.get("x-shopify-shop-domain", settings.shopify_shop_domain) or "unknown"
+    topic = headers.get("x-shopify-topic", default_topic)
+    return webhook_id, shop_domain, topic
+
+def claim_webhook(db: Session, webhook_id: str, shop_domain: str, topic: str) -> bool:
+    """Record the webhook_id in this transaction. False if it was already processed."""
+    stmt = (
+        upsert_insert(db, models.WebhookEvent)
+        .values(shop_domain=shop_domain, topic=topic, webhook_id=webhook_id)
+        .on_conflict_do_nothing(index_elements=["webhook_id"])
+        .returning(models.WebhookEvent.id)
+    )
+    if db.scalar(stmt) is None:
+        db.rollback()
+        recent.add(webhook_id)
+        return False
+    return True
+
+def _commit(db: Session, webhook_id: str):
+    db.commit()
+    recent.add(webhook_id)
+
+def ships_to_canada(payload: Dict[str, Any]) -> bool:
+    ship = payload.get("shipping_address") or {}
+    return (ship.get("country") or "").lower() in ("canada", "ca")
+
+def create_order(db: Session, payload: Dict[str, Any], status: models.OrderStatus = models.OrderStatus.IMPORTED,
+                 reserve: bool = True, rollups_into: Optional[list] = None) -> int:
+    """Insert an order from a Shopify (REST-shaped) order payload: customer, address, items, rollups, search terms.
+
+    Shared by the orders/create webhook and the bulk backfill (app/backfill.py).
+    With rollups_into, the rollup entry is appended there for one
+    rollups.orders_created() per batch. Caller checks the country and
+    duplicates, and commits.
+    """
+    ship = payload.get("shipping_address") or {}
+    shopify_order_id = int(payload["id"])
+
+    # Customer and address are reused when seen before (app/customers.py)
+    customer_id = customers.upsert_customer(db, payload.get("customer") or {})
+    address_id, province = customers.upsert_address(db, customer_id, ship)
+
+    subtotal = money_to_cents(payload.get("subtotal_price"))
+    total = money_to_cents(payload.get("total_price"))
+    tax = money_to_cents(payload.get("total_tax"))
+    shipping_cents = money_to_cents(payload.get("total_shipping_price_set", {}).get("shop_money", {}).get("amount"))
+
+    placed_at = payload.get("created_at")
+    placed_dt = None
+    if placed_at:
+        try:
+            placed_dt = datetime.fromisoformat(placed_at.replace("Z", "+00:00"))
+        except Exception:
+            placed_dt = None
+
+    order = models.Order(
+        shopify_order_id=shopify_order_id,
+        customer_id=customer_id,
+        shipping_address_id=address_id,
+        status=status,
+        currency=payload.get("currency") or "CAD",
+        subtotal_cents=subtotal,
+        shipping_cents=shipping_cents,
+        tax_cents=tax,
+        total_cents=total,
+        placed_at=placed_dt,
+    )
+    db.add(order)
+    db.flush()
+
+    # Items + reserve inventory (reserve only; decrement on-hand when PAID)
+    line_items = payload.get("line_items") or []
+    sku_ids = inventory.resolve_sku_ids(db, [li.get("sku") for li in line_items])
+    rows = []
+    for li in line_items:
+        sku_code = li.get("sku") or None
+        qty = int(li.get("quantity") or 0)
+        price = money_to_cents(li.get("price"))
+        rows.append({
+            "order_id": order.id,
+            "sku_id": sku_ids.get(sku_code),
+            "sku_code": sku_code,
+            "title": li.get("title"),
+            "qty": qty,
+            "unit_price_cents": price,
+            "line_total_cents": price * qty,
+        })
+    if rows:
+        db.execute(insert(models.OrderItem), rows)
+        qty_by_sku: Dict[int, int] = defaultdict(int)
+        for r in rows:
+            if r["sku_id"]:
+                qty_by_sku[r["sku_id"]] += r["qty"]
+        if reserve:
+            inventory.reserve_order(db, order.id, qty_by_sku)
+    lines = [(r["sku_code"], r["qty"], r["line_total_cents"]) for r in rows]
+    if rollups_into is None:
+        rollups.order_created(db, order, lines, province)
+    else:
+        rollups_into.append((order, lines, province))
+    cust = payload.get("customer") or {}
+    search.index_order(db, order.id, search.order_terms(
+        order.id, shopify_order_id, payload.get("order_number"), cust.get("email") or payload.get("email"),
+        (cust.get("first_name"), cust.get("last_name"), ship.get("first_name"), ship.get("last_name")),
+        ship.get("zip"), (r["sku_code"] for r in rows),
+    ))
+    return order.id
+
+def process_orders_create(db: Session, payload: Dict[str, Any], webhook_id: str, shop_domain: str, topic: str) -> Dict[str, Any]:
+    # idempotency
+    if not claim_webhook(db, webhook_id, shop_domain, topic):
+        return {"ok": True, "duplicate": True}
+
+    # Canada-only enforcement (soft fail: store but mark for review)
+    if not ships_to_canada(payload):
+        # The claimed webhook_id is still committed to avoid replay storms
+        _commit(db, webhook_id)
+        return {"ok": True, "ignored": True, "reason": "Non-Canada shipping address"}
+
+    # Order (idempotent by shopify_order_id)
+    shopify_order_id = int(payload["id"])
+    existing_order_id = db.scalar(select(models.Order.id).where(models.Order.shopify_order_id == shopify_order_id))
+    if not existing_order_id:
+        # Late replay of an order archived since (app/archive.py)
+        existing_order_id = db.scalar(select(models.OrderArchive.id).where(models.OrderArchive.shopify_order_id == shopify_order_id))
+    if existing_order_id:
+        _commit(db, webhook_id)
+        return {"ok": True, "duplicate_order": True, "order_id": existing_order_id}
+
+    order_id = create_order(db, payload)
+    _commit(db, webhook_id)
+    return {"ok": True, "order_id": order_id}
+
+def process_orders_paid(db: Session, payload: Dict[str, Any], webhook_id: str, shop_domain: str, topic: str) -> Dict[str, Any]:
+    # idempotency
+    if not claim_webhook(db, webhook_id, shop_domain, topic):
+        return {"ok": True, "duplicate": True}
+
+    shopify_order_id = int(payload["id"])
+    order = db.scalar(select(models.Order).where(models.Order.shopify_order_id == shopify_order_id).with_for_update())
+    if not order:
+        # Create flow not received yet; safe no-op
+        _commit(db, webhook_id)
+        return {"ok": True, "ignored": True, "reason": "order_not_found"}
+
+    # Move RESERVED -> ON_HAND decrement (simple)
+    if order.status in (models.OrderStatus.IMPORTED,):
+        inventory.consume_order(db, order.id)
+
+        rollups.status_changed(db, order, order.status, models.OrderStatus.PAID)
+        order.status = models.OrderStatus.PAID
+        order.updated_at = func.now()  # also set by the trigger on Postgres; ETags depend on it
+
+        # Payment record
+        db.add(models.Payment(
+            order_id=order.id,
+            provider="shopify",
+            reference=str(shopify_order_id),
+            amount_cents=money_to_cents(payload.get("total_price")),
+            status=models.PaymentStatus.PAID,
+            paid_at=datetime.now(timezone.utc)
+        ))
+
+    _commit(db, webhook_id)
+    response_cache.invalidate_orders([order.id])
+    return {"ok": True, "order_id": order.id, "status": "PAID"}
+
+HANDLERS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "orders/create": process_orders_create,
+    "orders/paid": process_orders_paid,
+}
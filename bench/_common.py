@@ -0,0 +1,173 @@
+"""Shared setup for the benchmark scripts.
+
+Benchmarks run against ``BENCH_DATABASE_URL`` (a local Postgres) when set, and
+fall back to a throwaway SQLite file so they can be run without Docker.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Payloads are signed with SHOPIFY_WEBHOOK_SECRET when set, so they replay against a real deployment
+WEBHOOK_SECRET = os.getenv("SHOPIFY_WEBHOOK_SECRET") or "bench-secret"
+ADMIN_KEY = os.getenv("BENCH_ADMIN_KEY", "bench-admin")
+
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", "sqlite:///./bench.sqlite3")
+os.environ["SHOPIFY_WEBHOOK_SECRET"] = WEBHOOK_SECRET
+os.environ["ADMIN_API_KEY"] = ADMIN_KEY
+
+import re
+
+from sqlalchemy import BigInteger, event, insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Values
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_bigint(type_, compiler, **kw):
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns
+    return "INTEGER"
+
+@compiles(Values, "sqlite")
+def _sqlite_values(element, compiler, **kw):
+    # SQLite has no "AS v (a, b)" column list; rename its column1..N in a subquery
+    sql = compiler.visit_values(element, **kw)
+    m = re.fullmatch(r"\((VALUES .*)\) AS (\w+) \((.*)\)", sql, re.S)
+    if not m:
+        return sql
+    cols = ", ".join(f"column{i} AS {name.strip()}" for i, name in enumerate(m.group(3).split(","), 1))
+    return f"(SELECT {cols} FROM ({m.group(1)})) AS {m.group(2)}"
+
+from app.db import Base, engine, async_engine, SessionLocal
+from app import models
+
+def reset_schema():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+def seed_skus(n: int, qty_on_hand: int = 1_000_000) -> list:
+    """Create ``n`` SKUs with plenty of stock and return their codes."""
+    codes = [f"BENCH-{i:05d}" for i in range(n)]
+    with SessionLocal() as db:
+        product = models.Product(title="Bench Product", category="Bench")
+        db.add(product)
+        db.flush()
+        ids = db.scalars(
+            insert(models.SKU).returning(models.SKU.id),
+            [{"product_id": product.id, "sku_code": c, "price_cents": 6500, "cost_cents": 2500} for c in codes],
+        ).all()
+        db.execute(insert(models.Inventory), [
+            {"sku_id": sku_id, "qty_on_hand": qty_on_hand, "qty_reserved": 0, "reorder_level": 0} for sku_id in ids
+        ])
+        db.commit()
+    return codes
+
+def order_payload(order_id: int, sku_codes: list, lines: int) -> dict:
+    """A Shopify orders/create payload shipping to Canada with ``lines`` line items."""
+    line_items = [{
+        "id": order_id * 1000 + i,
+        "sku": sku_codes[i % len(sku_codes)],
+        "title": f"Bench item {i}",
+        "quantity": 1 + i % 3,
+        "price": "65.00",
+    } for i in range(lines)]
+    return {
+        "id": order_id,
+        "created_at": "2026-01-15T10:30:00-05:00",
+        "currency": "CAD",
+        "subtotal_price": "100.00",
+        "total_tax": "13.00",
+        "total_price": "113.00",
+        "total_shipping_price_set": {"shop_money": {"amount": "0.00", "currency_code": "CAD"}},
+        "customer": {"id": 9_000_000 + order_id, "email": f"c{order_id}@example.com", "first_name": "Bench", "last_name": "Customer"},
+        "shipping_address": {
+            "address1": "1 King St W", "address2": None, "city": "Toronto",
+            "province": "Ontario", "zip": "M5H 1A1", "country": "Canada",
+        },
+        "line_items": line_items,
+    }
+
+def sign(raw: bytes) -> str:
+    digest = hmac.new(WEBHOOK_SECRET.encode("utf-8"), raw, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+def webhook_headers(raw: bytes, topic: str, webhook_id: str) -> dict:
+    return {
+        "content-type": "application/json",
+        "x-shopify-hmac-sha256": sign(raw),
+        "x-shopify-topic": topic,
+        "x-shopify-webhook-id": webhook_id,
+        "x-shopify-shop-domain": "bench.myshopify.com",
+    }
+
+def encode(payload: dict) -> bytes:
+    return json.dumps(payload).encode("utf-8")
+
+class QueryCounter:
+    """Counts statements sent to the database (sync and async engines) while active."""
+
+    def __init__(self, binds=None):
+        self.binds = binds or (engine, async_engine.sync_engine)
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        for bind in self.binds:
+            event.listen(bind, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for bind in self.binds:
+            event.remove(bind, "before_cursor_execute", self._on_execute)
+
+@contextmanager
+def timer():
+    out = {}
+    start = time.perf_counter()
+    yield out
+    out["seconds"] = time.perf_counter() - start
+
+def percentile(sorted_samples: list, pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, -(-len(sorted_samples) * pct // 100))
+    return sorted_samples[int(rank) - 1]
+
+def latency_summary(samples_ms: list) -> dict:
+    s = sorted(samples_ms)
+    return {
+        "count": len(s),
+        "mean_ms": sum(s) / len(s) if s else 0.0,
+        "p50_ms": percentile(s, 50),
+        "p95_ms": percentile(s, 95),
+        "p99_ms": percentile(s, 99),
+        "max_ms": s[-1] if s else 0.0,
+    }
+
+def run_metadata(**params) -> dict:
+    """Context stored next to results so runs can be compared."""
+    import platform
+    import subprocess
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        rev = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": engine.dialect.name,
+        "params": params,
+    }
+
+def save_results(path: str, kind: str, meta: dict, results: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"kind": kind, "meta": meta, "results": results}, f, indent=2, sort_keys=True)
+    print(f"results written to {path}")
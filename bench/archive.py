@@ -0,0 +1,95 @@
+"""Archival of closed orders, checked against the API.
+
+Creates ``--orders`` orders through the webhook, ages ``--closed`` percent of
+them into DELIVERED/CANCELLED, then runs app.archive. Before and after, every
+order is fetched via GET /admin/orders/{id} and the full NDJSON and CSV
+exports are taken; both must be byte-identical across the move. Reports
+orders archived per second, hot-table row counts and the archive's doc size.
+
+    python -m bench.archive [--orders 2000] [--lines 4] [--closed 70] [--batch-size 500] [--out results.json]
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from ._common import ADMIN_KEY, SessionLocal, encode, order_payload, reset_schema, run_metadata, save_results, seed_skus, timer, webhook_headers
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select, update
+from app import archive, models
+from app.main import app
+
+HOT_TABLES = (models.Order, models.OrderItem, models.Payment, models.Shipment)
+
+def snapshot(client, order_ids) -> dict:
+    headers = {"x-admin-key": ADMIN_KEY}
+    orders = {}
+    for order_id in order_ids:
+        r = client.get(f"/admin/orders/{order_id}", headers=headers)
+        orders[order_id] = (r.status_code, r.content, r.headers.get("etag"))
+    return {
+        "orders": orders,
+        "ndjson": client.get("/admin/orders/export", headers=headers).content,
+        "csv": client.get("/admin/orders/export", params={"format": "csv"}, headers=headers).content,
+        "delivered_csv": client.get("/admin/orders/export", params={"format": "csv", "status": "DELIVERED"}, headers=headers).content,
+    }
+
+def counts() -> dict:
+    with SessionLocal() as db:
+        out = {m.__tablename__: db.scalar(select(func.count()).select_from(m)) for m in HOT_TABLES + (models.OrderArchive,)}
+        out["archive_doc_bytes"] = int(db.scalar(select(func.coalesce(func.sum(func.length(models.OrderArchive.doc)), 0))))
+        return out
+
+def main(args) -> dict:
+    reset_schema()
+    codes = seed_skus(64)
+    with TestClient(app) as client:
+        for i in range(1, args.orders + 1):
+            raw = encode(order_payload(i, codes, args.lines))
+            client.post("/webhooks/shopify/orders-create", content=raw, headers=webhook_headers(raw, "orders/create", f"arch-{i}"))
+        closed = args.orders * args.closed // 100
+        old = datetime.now(timezone.utc) - timedelta(days=400)
+        with SessionLocal() as db:
+            o = models.Order
+            ids = db.scalars(select(o.id).order_by(o.id)).all()
+            for n, order_id in enumerate(ids[:closed]):
+                status = models.OrderStatus.CANCELLED if n % 10 == 0 else models.OrderStatus.DELIVERED
+                db.add(models.Payment(order_id=order_id, amount_cents=11300, status=models.PaymentStatus.PAID, paid_at=old))
+                db.add(models.Shipment(order_id=order_id, carrier="Canada Post", tracking_number=f"CP{order_id:08d}", shipped_at=old))
+                db.execute(update(o).where(o.id == order_id).values(status=status, updated_at=old))
+            db.commit()
+
+        before = snapshot(client, ids)
+        rows_before = counts()
+        with timer() as t:
+            moved = archive.archive(after_days=30, batch_size=args.batch_size)
+        rows_after = counts()
+        after = snapshot(client, ids)
+
+        mismatched = [i for i in ids if before["orders"][i] != after["orders"][i]]
+        results = {
+            "archived": moved,
+            "seconds": t["seconds"],
+            "orders_per_s": moved["orders"] / t["seconds"] if t["seconds"] else 0.0,
+            "rows_before": rows_before,
+            "rows_after": rows_after,
+            "get_order_mismatches": len(mismatched),
+            "exports_identical": {k: before[k] == after[k] for k in ("ndjson", "csv", "delivered_csv")},
+            "rerun": archive.archive(after_days=30, batch_size=args.batch_size),
+        }
+    print(f"archived {moved['orders']} orders in {moved['batches']} batches, {results['orders_per_s']:.0f} orders/s")
+    print(f"rows before {rows_before}")
+    print(f"rows after  {rows_after}")
+    print(f"get_order mismatches: {len(mismatched)}  exports identical: {results['exports_identical']}  re-run: {results['rerun']}")
+    assert moved["orders"] == closed and not mismatched and all(results["exports_identical"].values())
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive closed orders and compare API output")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=4)
+    parser.add_argument("--closed", type=int, default=70)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    results = main(args)
+    if args.out:
+        save_results(args.out, "archive", run_metadata(**vars(args)), results)
@@ -0,0 +1,98 @@
+"""Backfill throughput and resume from a Shopify bulk-operation JSONL export.
+
+Writes a synthetic export of ``--orders`` orders (GraphQL shape, line items on
+their own lines with __parentId; every 20th order ships to the US), loads it
+with app.backfill, killing the first run after ``--fail-after`` batches, then
+resumes from the checkpoint. Checks that every Canadian order and line item is
+in the database exactly once and that nothing was reserved, and reports rows/s.
+
+    python -m bench.backfill [--orders 20000] [--lines 3] [--batch-size 1000] [--fail-after 3] [--out results.json]
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from ._common import SessionLocal, reset_schema, run_metadata, save_results, seed_skus
+from sqlalchemy import func, select
+from app import backfill, models
+
+class Interrupted(Exception):
+    pass
+
+def write_export(path: str, n_orders: int, lines: int, codes: list):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(1, n_orders + 1):
+            gid = f"gid://shopify/Order/{7_000_000 + i}"
+            f.write(json.dumps({
+                "id": gid, "name": f"#{1000 + i}", "email": f"c{i % 5000}@example.com",
+                "createdAt": "2025-06-01T12:00:00Z", "currencyCode": "CAD",
+                "displayFinancialStatus": "PAID", "displayFulfillmentStatus": "FULFILLED" if i % 3 else "UNFULFILLED",
+                "cancelledAt": None,
+                "subtotalPriceSet": {"shopMoney": {"amount": "130.00", "currencyCode": "CAD"}},
+                "totalPriceSet": {"shopMoney": {"amount": "146.90", "currencyCode": "CAD"}},
+                "totalTaxSet": {"shopMoney": {"amount": "16.90", "currencyCode": "CAD"}},
+                "totalShippingPriceSet": {"shopMoney": {"amount": "0.00", "currencyCode": "CAD"}},
+                "customer": {"id": f"gid://shopify/Customer/{9_000_000 + i % 5000}", "email": f"c{i % 5000}@example.com",
+                             "firstName": "Bulk", "lastName": f"Customer{i % 5000}"},
+                "shippingAddress": {"address1": f"{i % 500} Queen St W", "city": "Toronto", "province": "Ontario",
+                                    "zip": "M5V 2A8", "country": "United States" if i % 20 == 0 else "Canada"},
+            }) + "\n")
+            for j in range(lines):
+                f.write(json.dumps({
+                    "id": f"gid://shopify/LineItem/{i * 100 + j}", "sku": codes[(i + j) % len(codes)], "title": "Bulk item",
+                    "quantity": 1 + j % 2, "originalUnitPriceSet": {"shopMoney": {"amount": "65.00", "currencyCode": "CAD"}},
+                    "__parentId": gid,
+                }) + "\n")
+
+def main(args) -> dict:
+    reset_schema()
+    codes = seed_skus(50)
+    path = os.path.join(tempfile.mkdtemp(), "orders.jsonl")
+    write_export(path, args.orders, args.lines, codes)
+    expected = args.orders - args.orders // 20
+
+    real_write = backfill._write_batch
+    calls = {"n": 0}
+
+    def failing_write(*a, **kw):
+        if calls["n"] >= args.fail_after:
+            raise Interrupted()
+        calls["n"] += 1
+        return real_write(*a, **kw)
+
+    backfill._write_batch = failing_write
+    try:
+        backfill.backfill(path, args.batch_size)
+    except Interrupted:
+        pass
+    finally:
+        backfill._write_batch = real_write
+    checkpoint = backfill.load_checkpoint(path)
+    print(f"first run stopped after {args.fail_after} batches, checkpoint offset {checkpoint['offset']}")
+
+    stats = backfill.backfill(path, args.batch_size)
+    print(f"resumed: {stats['orders']} orders, {stats['items']} items, {stats['skipped_non_canada']} non-Canada, "
+          f"{stats['duplicates']} duplicates in {stats['seconds']:.1f}s = {stats['rows_per_s']:.0f} rows/s")
+    with SessionLocal() as db:
+        orders = db.scalar(select(func.count()).select_from(models.Order))
+        distinct = db.scalar(select(func.count(func.distinct(models.Order.shopify_order_id))))
+        items = db.scalar(select(func.count()).select_from(models.OrderItem))
+        reserved = db.scalar(select(func.sum(models.Inventory.qty_reserved)))
+    print(f"orders {orders} (expected {expected}, distinct {distinct}), items {items} (expected {expected * args.lines}), reserved {reserved}")
+    assert orders == distinct == expected and items == expected * args.lines and reserved == 0
+    os.remove(path)
+    os.remove(path + ".checkpoint")
+    return {"resume": stats, "orders": orders, "items": items}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk JSONL backfill")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--fail-after", type=int, default=3)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    results = main(args)
+    if args.out:
+        save_results(args.out, "backfill", run_metadata(**vars(args)), results)
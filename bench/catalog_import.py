@@ -0,0 +1,75 @@
+"""Catalog import throughput: bulk /admin/skus/import vs. one POST /admin/skus per row.
+
+    python -m bench.catalog_import [--rows 20000] [--format csv|ndjson]
+"""
+import argparse
+import csv
+import io
+import json
+import time
+
+from ._common import ADMIN_KEY, reset_schema
+from fastapi.testclient import TestClient
+from app.main import app
+
+SIZES = ("XS", "S", "M", "L", "XL")
+COLORS = ("Black", "Navy", "Sage", "Clay", "Stone", "Berry", "Ivory", "Slate")
+
+def season_rows(n: int, prefix: str = "SS27") -> list:
+    rows = []
+    for i in range(n):
+        style = i // (len(SIZES) * len(COLORS))
+        size, color = SIZES[i % len(SIZES)], COLORS[(i // len(SIZES)) % len(COLORS)]
+        rows.append({
+            "product_title": f"{prefix} Style {style:04d}",
+            "category": "Leggings" if style % 2 else "Tops",
+            "sku_code": f"{prefix}-{style:04d}-{color[:3].upper()}-{size}",
+            "size": size,
+            "color": color,
+            "price_cents": 6500 + (style % 5) * 500,
+            "cost_cents": 2500,
+            "qty_on_hand": 40,
+            "reorder_level": 10,
+        })
+    return rows
+
+def to_body(rows: list, fmt: str) -> bytes:
+    if fmt == "ndjson":
+        return "".join(json.dumps(r) + "\n" for r in rows).encode("utf-8")
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+def run(n: int, fmt: str, single: int):
+    reset_schema()
+    client = TestClient(app)
+    headers = {"x-admin-key": ADMIN_KEY}
+    rows = season_rows(n)
+
+    body = to_body(rows, fmt)
+    start = time.perf_counter()
+    report = client.post(f"/admin/skus/import?format={fmt}", content=body, headers=headers).json()
+    elapsed = time.perf_counter() - start
+    print(f"bulk import ({fmt}): {n} rows in {elapsed:.2f}s = {n / elapsed:,.0f} rows/s "
+          f"(created={report['created']} updated={report['updated']} errors={report['error']})")
+
+    start = time.perf_counter()
+    report = client.post(f"/admin/skus/import?format={fmt}", content=body, headers=headers).json()
+    elapsed = time.perf_counter() - start
+    print(f"bulk re-import (all updates): {n / elapsed:,.0f} rows/s (updated={report['updated']})")
+
+    start = time.perf_counter()
+    for r in season_rows(single, prefix="FW27"):
+        client.post("/admin/skus", json=r, headers=headers).raise_for_status()
+    elapsed = time.perf_counter() - start
+    print(f"per-row POST /admin/skus: {single} rows in {elapsed:.2f}s = {single / elapsed:,.0f} rows/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    parser.add_argument("--single", type=int, default=500, help="rows for the per-row baseline")
+    args = parser.parse_args()
+    run(args.rows, args.format, args.single)
@@ -0,0 +1,97 @@
+"""Cold-start budget for API workers.
+
+Starts ``--runs`` fresh interpreters. Each one imports app.main under
+``python -X importtime`` and then serves its first /health through the
+lifespan. The script reports the median import time, the median time to the
+first response, and the slowest modules. It exits non-zero when either median
+is over budget, or when a lazily loaded subsystem (reportlab, pypdf, httpx) was
+imported anyway, so it can run in CI.
+
+    python -m bench.cold_start [--runs 5] [--import-budget-ms 1500] [--first-response-budget-ms 2500] [--out results.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from ._common import run_metadata, save_results
+
+LAZY = ("reportlab", "pypdf", "httpx")
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+eager = sorted(m for m in %r if m in sys.modules)
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    status = client.get("/health").status_code
+t2 = time.perf_counter()
+print("RESULT " + json.dumps({"import_ms": (t1 - t0) * 1000, "first_response_ms": (t2 - t0) * 1000, "status": status, "eager": eager}))
+""" % (LAZY,)
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+def one_run(env) -> dict:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD], capture_output=True, text=True, env=env, timeout=120)
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("RESULT ")]
+    if proc.returncode or not lines:
+        raise RuntimeError(proc.stderr[-2000:])
+    result = json.loads(lines[-1][len("RESULT "):])
+    # Only what importing app.main pulled in (TestClient brings httpx afterwards)
+    modules = {}
+    for m in _LINE.finditer(proc.stderr):
+        modules[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+        if m.group(4) == "app.main":
+            break
+    result["modules"] = modules
+    return result
+
+def main(args) -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///./bench.sqlite3")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (os.getcwd(), env.get("PYTHONPATH")) if p)
+    runs = [one_run(env) for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    first_ms = statistics.median(r["first_response_ms"] for r in runs)
+    eager = sorted({m for r in runs for m in r["eager"]})
+    # Top-level packages (and app modules) by cumulative import time, from the last run
+    modules = runs[-1]["modules"]
+    top = sorted(((cum / 1000, name) for name, (_, cum) in modules.items() if "." not in name or name.startswith("app.")),
+                 reverse=True)[:args.top]
+    print(f"import app.main     median {import_ms:8.1f} ms  (budget {args.import_budget_ms} ms)")
+    print(f"first /health       median {first_ms:8.1f} ms  (budget {args.first_response_budget_ms} ms)")
+    print(f"lazy modules loaded at import: {eager or 'none'}")
+    for ms, name in top:
+        print(f"  {ms:8.1f} ms  {name}")
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import {import_ms:.0f} ms > {args.import_budget_ms} ms")
+    if first_ms > args.first_response_budget_ms:
+        failures.append(f"first response {first_ms:.0f} ms > {args.first_response_budget_ms} ms")
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    if os.path.exists("bench.sqlite3") and env["DATABASE_URL"] == "sqlite:///./bench.sqlite3":
+        os.remove("bench.sqlite3")
+    return {"import_ms": import_ms, "first_response_ms": first_ms, "eager": eager,
+            "runs": [{k: v for k, v in r.items() if k != "modules"} for r in runs],
+            "top_modules_ms": dict((name, ms) for ms, name in top), "failures": failures}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start time of an API worker, with a budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1500)
+    parser.add_argument("--first-response-budget-ms", type=float, default=2500)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    results = main(args)
+    if args.out:
+        save_results(args.out, "cold_start", run_metadata(**vars(args)), results)
+    if results["failures"]:
+        print("OVER BUDGET: " + "; ".join(results["failures"]))
+        sys.exit(1)
@@ -0,0 +1,46 @@
+"""Compare two saved benchmark results (bench.micro or bench.replay --json).
+
+    python -m bench.compare old.json new.json
+
+Prints the per-case change; negative percentages are faster.
+"""
+import argparse
+import json
+
+# Metrics where lower is better, per result kind
+METRICS = {
+    "micro": ["us_per_call"],
+    "replay": ["p50_ms", "p95_ms", "p99_ms"],
+}
+
+def _rows(doc: dict) -> dict:
+    if doc["kind"] == "replay":
+        return {**doc["results"]["routes"], "TOTAL": doc["results"]["total"]}
+    return doc["results"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    if old["kind"] != new["kind"]:
+        raise SystemExit(f"cannot compare {old['kind']} with {new['kind']}")
+    print(f"old: {old['meta']['git_rev']} {old['meta']['timestamp']}  new: {new['meta']['git_rev']} {new['meta']['timestamp']}")
+    old_rows, new_rows = _rows(old), _rows(new)
+    for name in sorted(old_rows.keys() | new_rows.keys()):
+        if name not in old_rows or name not in new_rows:
+            print(f"{name:<42} only in {'new' if name in new_rows else 'old'}")
+            continue
+        parts = []
+        for m in METRICS[old["kind"]]:
+            a, b = old_rows[name][m], new_rows[name][m]
+            change = (b - a) / a * 100 if a else 0.0
+            parts.append(f"{m} {a:.1f} -> {b:.1f} ({change:+.1f}%)")
+        print(f"{name:<42} " + "  ".join(parts))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Fulfillment sync against the in-memory Shopify stub (bench/shopify_stub.py).
+
+Seeds ``--orders`` orders, posts ``--edits`` tracking updates per order through
+/admin/orders/{id}/shipments (so the outbox has to coalesce them), then drains
+the outbox with the real worker code. A second round edits a share of the
+orders again to exercise the update_tracking path. Reports Shopify calls, 429s,
+time spent waiting on the client-side bucket, and whether every order ended
+with its latest tracking number.
+
+    python -m bench.fulfillment_sync [--orders 200] [--edits 3] [--bucket 40] [--leak 40]
+        [--no-client-bucket] [--out results.json]
+
+--no-client-bucket lets the client fire freely so the stub's 429s (and the
+worker's backoff) do the limiting instead.
+"""
+import argparse
+import asyncio
+import time
+
+from ._common import ADMIN_KEY, SessionLocal, reset_schema, run_metadata, save_results
+import httpx
+from sqlalchemy import func, select, update
+from app import fulfillment_sync, models
+from app.main import app
+from app.shopify_api import LeakyBucket, ShopifyClient
+from .shopify_stub import StubShop, create_app
+
+def seed_orders(n: int) -> list:
+    with SessionLocal() as db:
+        orders = [models.Order(shopify_order_id=7_000_000 + i, status=models.OrderStatus.PICKED, total_cents=11300) for i in range(n)]
+        db.add_all(orders)
+        db.commit()
+        return [o.id for o in orders]
+
+async def post_edits(order_ids: list, edits: int, tag: str) -> dict:
+    latest = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"x-admin-key": ADMIN_KEY}) as c:
+        for e in range(edits):
+            for oid in order_ids:
+                number = f"{tag}{oid:06d}-{e}"
+                r = await c.post(f"/admin/orders/{oid}/shipments", json={"carrier": "Canada Post", "tracking_number": number})
+                r.raise_for_status()
+                latest[oid] = number
+    return latest
+
+async def drain(client: ShopifyClient, concurrency: int) -> dict:
+    start = time.perf_counter()
+    pushes = 0
+    while True:
+        pushes += await fulfillment_sync.drain(client, concurrency)
+        with SessionLocal() as db:
+            fs = models.FulfillmentSync
+            pending, next_at = db.execute(
+                select(func.count(), func.min(fs.next_attempt_at)).where(fs.status.in_((fulfillment_sync.S.PENDING, fulfillment_sync.S.PROCESSING)))
+            ).one()
+            if not pending:
+                break
+            # Skip the backoff wait instead of sleeping through it
+            db.execute(update(fs).where(fs.status == fulfillment_sync.S.PENDING).values(next_attempt_at=func.now()))
+            db.commit()
+        await asyncio.sleep(0.2)
+    return {"pushes": pushes, "seconds": time.perf_counter() - start}
+
+async def run(args) -> dict:
+    reset_schema()
+    order_ids = seed_orders(args.orders)
+    shop = StubShop(size=args.bucket, leak_per_second=args.leak, latency=args.latency)
+    bucket = LeakyBucket(10**9 if args.no_client_bucket else args.bucket, 10**9 if args.no_client_bucket else args.leak)
+    client = ShopifyClient(base_url="http://shopify-stub", token="stub", bucket=bucket,
+                           max_connections=args.concurrency, transport=httpx.ASGITransport(app=create_app(shop)))
+    results = {}
+    try:
+        for phase, ids, edits in (("create", order_ids, args.edits), ("update", order_ids[::4], 1)):
+            calls0, throttled0, waited0 = shop.requests, shop.throttled, bucket.waited_seconds
+            latest = await post_edits(ids, edits, "CP" if phase == "create" else "UP")
+            out = await drain(client, args.concurrency)
+            wrong = 0
+            with SessionLocal() as db:
+                fids = dict(db.execute(select(models.Shipment.order_id, models.Shipment.shopify_fulfillment_id)
+                                       .where(models.Shipment.order_id.in_(ids))).all())
+            for oid, number in latest.items():
+                f = shop.fulfillments.get(fids.get(oid))
+                if not f or f["tracking_info"]["number"] != number:
+                    wrong += 1
+            calls = shop.requests - calls0
+            results[phase] = {
+                "orders": len(ids),
+                "shipment_edits": len(ids) * edits,
+                "pushes": out["pushes"],
+                "coalesce_ratio": len(ids) * edits / max(1, out["pushes"]),
+                "shopify_requests": calls,
+                "shopify_429s": shop.throttled - throttled0,
+                "client_bucket_wait_s": bucket.waited_seconds - waited0,
+                "seconds": out["seconds"],
+                "orders_per_s": len(ids) / out["seconds"] if out["seconds"] else 0.0,
+                "wrong_tracking": wrong,
+            }
+            print(f"{phase:6s} {len(ids):5d} orders  {len(ids) * edits:5d} edits -> {out['pushes']:5d} pushes  "
+                  f"{calls:5d} requests  {shop.throttled - throttled0:4d} x 429  {out['seconds']:7.2f}s  "
+                  f"{results[phase]['orders_per_s']:7.1f} orders/s  wrong={wrong}")
+    finally:
+        await client.aclose()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--bucket", type=int, default=40)
+    parser.add_argument("--leak", type=float, default=40.0, help="stub leak rate (Shopify standard is 2/s)")
+    parser.add_argument("--latency", type=float, default=0.01, help="stub response latency in seconds")
+    parser.add_argument("--no-client-bucket", action="store_true")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    if args.out:
+        save_results(args.out, "fulfillment_sync", run_metadata(**vars(args)), results)
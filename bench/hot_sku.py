@@ -0,0 +1,125 @@
+"""Flash sale on one SKU: many concurrent orders reserving from a small stock.
+
+``--orders`` threads (``--concurrency`` at a time, one connection each) each
+reserve ``--qty`` units of a SKU that only has ``--stock`` units, then hold
+their transaction open for ``--hold-ms`` (the rest of the order write) before
+committing. Modes:
+
+- naive: read available, then write reserved = read + qty (lost updates)
+- direct: inventory.apply_deltas, one conditional UPDATE on the inventory row
+- escrow: the SKU is marked hot and orders draw from escrow slots
+
+Reports reservations/s and oversold units; for escrow, the slots are handed
+back at the end and the inventory row must match what orders reserved.
+
+    python -m bench.hot_sku [--orders 2000] [--concurrency 200] [--stock 500] [--qty 1] [--hold-ms 5]
+
+Use BENCH_DATABASE_URL=postgresql+psycopg://... (max_connections above
+--concurrency); SQLite serialises writers, so only correctness is meaningful there.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ._common import SessionLocal, reset_schema, run_metadata, save_results, seed_skus
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app import inventory, models
+from app.db import engine
+
+def session_factory(concurrency: int):
+    url = engine.url
+    if url.get_backend_name() == "sqlite":
+        bench_engine = create_engine(url, poolclass=NullPool, connect_args={"timeout": 120})
+    else:
+        bench_engine = create_engine(url, pool_size=concurrency, max_overflow=0, pool_timeout=120)
+    return sessionmaker(bench_engine, expire_on_commit=False)
+
+def naive(db, sku_id: int, qty: int) -> bool:
+    inv = models.Inventory
+    on_hand, reserved = db.execute(select(inv.qty_on_hand, inv.qty_reserved).where(inv.sku_id == sku_id)).one()
+    if on_hand - reserved < qty:
+        return False
+    db.execute(update(inv).where(inv.sku_id == sku_id).values(qty_reserved=reserved + qty))
+    return True
+
+def direct(db, sku_id: int, qty: int) -> bool:
+    return bool(inventory.apply_deltas(db, {sku_id: (0, qty)}, require_available=True))
+
+def escrow(db, sku_id: int, qty: int) -> bool:
+    return inventory.reserve_order(db, 0, {sku_id: qty}) == 1
+
+def run(mode: str, fn, args) -> dict:
+    reset_schema()
+    code = seed_skus(1, qty_on_hand=args.stock)[0]
+    with SessionLocal() as db:
+        sku_id = db.scalar(select(models.SKU.id).where(models.SKU.sku_code == code))
+        if mode == "escrow":
+            inventory.enable_hot(db, sku_id, args.slots)
+            db.commit()
+    inventory.hot.reset()
+    Session = session_factory(args.concurrency)
+    errors = []
+    lock = threading.Lock()
+
+    def one(_):
+        try:
+            with Session() as db:
+                ok = fn(db, sku_id, args.qty)
+                time.sleep(args.hold_ms / 1000)
+                db.commit()
+                return ok
+        except Exception as exc:  # deadlocks/lock timeouts count as failed orders
+            with lock:
+                errors.append(type(exc).__name__)
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        successes = sum(pool.map(one, range(args.orders)))
+    seconds = time.perf_counter() - start
+
+    with SessionLocal() as db:
+        e, inv = models.InventoryEscrow, models.Inventory
+        escrow_left = db.scalar(select(func.coalesce(func.sum(e.qty), 0)).where(e.sku_id == sku_id))
+        returned = inventory.disable_hot(db, sku_id) if mode == "escrow" else 0
+        db.commit()
+        on_hand, reserved = db.execute(select(inv.qty_on_hand, inv.qty_reserved).where(inv.sku_id == sku_id)).one()
+    sold = successes * args.qty
+    return {
+        "successes": successes,
+        "reservations_per_s": successes / seconds,
+        "orders_per_s": args.orders / seconds,
+        "oversold_units": max(0, sold - args.stock),
+        # What the inventory row says vs. what orders were told they got
+        "reserved_matches": reserved == sold,
+        "qty_reserved": reserved,
+        "escrow_left_before_return": int(escrow_left),
+        "escrow_returned": returned,
+        "errors": len(errors),
+        "seconds": seconds,
+    }
+
+def main(args) -> dict:
+    results = {}
+    for mode, fn in (("naive", naive), ("direct", direct), ("escrow", escrow)):
+        results[mode] = r = run(mode, fn, args)
+        print(f"{mode:7s} {r['reservations_per_s']:9.1f} reservations/s  {r['successes']:5d} ok  "
+              f"oversold={r['oversold_units']}  reserved_matches={r['reserved_matches']}  errors={r['errors']}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent reservations against one hot SKU")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--qty", type=int, default=1)
+    parser.add_argument("--slots", type=int, default=16)
+    parser.add_argument("--hold-ms", type=float, default=5.0)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    results = main(args)
+    if args.out:
+        save_results(args.out, "hot_sku", run_metadata(**vars(args)), results)
@@ -0,0 +1,93 @@
+"""JSON decode/encode microbenchmarks on Shopify-sized order payloads (1 KB - 200 KB).
+
+    python -m bench.json_codec [--number 200]
+
+decode: webhook body bytes -> dict (json.loads(raw.decode()) vs jsonutil.loads(raw))
+encode: one order's export/detail document, stdlib + jsonable_encoder vs jsonutil / TypeAdapter
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+
+from ._common import order_payload
+from app import jsonutil
+from app.schemas import OrderOut, order_out
+
+TARGET_KB = (1, 5, 20, 50, 100, 200)
+SKUS = [f"SS27-{i:04d}-BLK-M" for i in range(64)]
+
+def shopify_payload(target_kb: int) -> bytes:
+    """An orders/create body padded with realistic line-item fields up to ~target_kb."""
+    lines = 1
+    while True:
+        payload = order_payload(1001, SKUS, lines)
+        for li in payload["line_items"]:
+            li.update({
+                "variant_id": 40000000000 + li["id"],
+                "product_id": 7000000000 + li["id"] % 97,
+                "vendor": "QBridge Athleisure",
+                "variant_title": "Black / M",
+                "requires_shipping": True,
+                "taxable": True,
+                "fulfillment_status": None,
+                "properties": [{"name": "Inseam", "value": "28\""}],
+                "tax_lines": [{"title": "HST", "price": "8.45", "rate": 0.13}],
+                "discount_allocations": [],
+            })
+        raw = json.dumps(payload).encode("utf-8")
+        if len(raw) >= target_kb * 1024 or lines > 5000:
+            return raw
+        lines = max(lines + 1, int(lines * target_kb * 1024 / len(raw)))
+
+def order_doc(payload: dict) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "id": payload["id"],
+        "shopify_order_id": payload["id"],
+        "status": "PAID",
+        "total_cents": 11300,
+        "placed_at": now,
+        "created_at": now,
+        "items": [{
+            "sku_code": li["sku"], "title": li["title"], "qty": li["quantity"],
+            "unit_price_cents": 6500, "line_total_cents": 6500 * li["quantity"],
+        } for li in payload["line_items"]],
+    }
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+def run(number: int):
+    print(f"orjson: {'yes' if jsonutil.orjson else 'no (stdlib fallback)'}")
+    print(f"{'size':>8} {'lines':>6} | {'decode std':>11} {'fast':>9} {'x':>5} | "
+          f"{'dict std':>9} {'fast':>9} {'x':>5} | {'model std':>10} {'adapter':>9} {'x':>5}  (us/call)")
+    for kb in TARGET_KB:
+        raw = shopify_payload(kb)
+        payload = json.loads(raw)
+        n = max(5, number // kb)
+
+        dec_std = per_call_us(lambda: json.loads(raw.decode("utf-8")), n)
+        dec_fast = per_call_us(lambda: jsonutil.loads(raw), n)
+
+        doc = order_doc(payload)
+        enc_std = per_call_us(lambda: json.dumps(jsonable_encoder(doc)).encode("utf-8"), n)
+        enc_fast = per_call_us(lambda: jsonutil.dumps(doc), n)
+
+        # get_order before: response_model validation + jsonable_encoder; after: adapter.dump_json
+        model = OrderOut(**doc)
+        model_std = per_call_us(lambda: json.dumps(jsonable_encoder(OrderOut.model_validate(model))).encode("utf-8"), n)
+        model_fast = per_call_us(lambda: order_out.dump_json(model), n)
+
+        print(f"{len(raw) / 1024:>6.0f}KB {len(payload['line_items']):>6} | "
+              f"{dec_std:>11.1f} {dec_fast:>9.1f} {dec_std / dec_fast:>5.1f} | "
+              f"{enc_std:>9.1f} {enc_fast:>9.1f} {enc_std / enc_fast:>5.1f} | "
+              f"{model_std:>10.1f} {model_fast:>9.1f} {model_std / model_fast:>5.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200, help="calls per timing at 1 KB (scaled down with size)")
+    args = parser.parse_args()
+    run(args.number)
@@ -0,0 +1,70 @@
+"""Microbenchmarks for hot helpers: money_to_cents, verify_shopify_hmac, build_packing_slip.
+
+    python -m bench.micro [--json micro.json] [--quick]
+
+Each case reports the best of 5 timings in microseconds per call. Save runs with
+--json and diff two of them with `python -m bench.compare old.json new.json`.
+"""
+import argparse
+import json
+import random
+import timeit
+
+from ._common import run_metadata, save_results, sign
+from . import payloads
+from app.shopify import money_to_cents, verify_shopify_hmac
+from app.pdf import build_packing_slip
+
+SHIP_TO = {
+    "name": "Load Tester", "line1": "1 King St W", "line2": "Suite 400", "city": "Toronto",
+    "province": "Ontario", "postal_code": "M5H 1A1", "country": "Canada",
+}
+
+def _time(fn, number: int) -> dict:
+    runs = timeit.repeat(fn, number=number, repeat=5)
+    best = min(runs) / number
+    return {"us_per_call": best * 1e6, "calls_per_sec": 1 / best, "number": number}
+
+def _body(target_kb: int) -> bytes:
+    rng = random.Random(target_kb)
+    codes = [f"BENCH-{i:05d}" for i in range(64)]
+    lines = 1
+    while True:
+        raw = json.dumps(payloads.shopify_order(rng, 1001, codes, lines=lines)).encode("utf-8")
+        if len(raw) >= target_kb * 1024 or lines > 5000:
+            return raw
+        lines += max(1, lines // 4)
+
+def _slip_items(n: int) -> list:
+    return [{"sku_code": f"BENCH-{i:05d}", "title": f"Align Legging {i}", "qty": 1 + i % 3} for i in range(n)]
+
+def cases(quick: bool):
+    scale = 10 if quick else 1
+    amounts = ["0.99", "65.00", "1234.5", "-12.30", "100", "", None, 42, "99999.999"]
+    yield "money_to_cents[mixed x9]", lambda: [money_to_cents(a) for a in amounts], 20000 // scale
+    for kb in (1, 20, 200):
+        raw = _body(kb)
+        good = sign(raw)
+        yield f"verify_shopify_hmac[{kb}KB valid]", lambda raw=raw, good=good: verify_shopify_hmac(raw, good), 2000 // scale // kb or 5
+        yield f"verify_shopify_hmac[{kb}KB bad]", lambda raw=raw: verify_shopify_hmac(raw, "bm90IHZhbGlk"), 2000 // scale // kb or 5
+    for n in (3, 25, 100):
+        items = _slip_items(n)
+        yield f"build_packing_slip[{n} lines]", lambda items=items: build_packing_slip(1001, SHIP_TO, items), max(2, 200 // scale // n)
+
+def run(quick: bool) -> dict:
+    results = {}
+    print(f"{'case':<36} {'us/call':>12} {'calls/s':>12}")
+    for name, fn, number in cases(quick):
+        r = _time(fn, number)
+        results[name] = r
+        print(f"{name:<36} {r['us_per_call']:>12.1f} {r['calls_per_sec']:>12,.0f}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations")
+    args = parser.parse_args()
+    results = run(args.quick)
+    if args.json:
+        save_results(args.json, "micro", run_metadata(quick=args.quick), results)
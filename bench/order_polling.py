@@ -0,0 +1,65 @@
+"""Dashboard-style polling of order detail and list endpoints.
+
+Creates ``--orders`` orders, then polls GET /admin/orders/{id} and
+GET /admin/orders in three modes: plain (no validators, cache off), cached (no
+validators, response cache on) and conditional (If-None-Match from the previous
+response). Reports requests/s and SQL statements per request for each.
+
+    python -m bench.order_polling [--orders 200] [--lines 8] [--rounds 5] [--out results.json]
+"""
+import argparse
+import time
+
+from ._common import ADMIN_KEY, QueryCounter, encode, order_payload, reset_schema, run_metadata, save_results, seed_skus, webhook_headers
+from fastapi.testclient import TestClient
+from app import response_cache
+from app.main import app
+
+def poll(client, paths, rounds: int, conditional: bool) -> dict:
+    headers = {"x-admin-key": ADMIN_KEY}
+    etags = {}
+    n = 0
+    statuses = {}
+    with QueryCounter() as qc:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for path in paths:
+                h = dict(headers)
+                if conditional and path in etags:
+                    h["if-none-match"] = etags[path]
+                r = client.get(path, headers=h)
+                etags[path] = r.headers.get("etag")
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                n += 1
+        seconds = time.perf_counter() - start
+    return {"requests": n, "requests_per_s": n / seconds, "statements_per_request": qc.count / n, "statuses": statuses}
+
+def main(args) -> dict:
+    reset_schema()
+    codes = seed_skus(64)
+    results = {}
+    with TestClient(app) as client:
+        for i in range(1, args.orders + 1):
+            raw = encode(order_payload(i, codes, args.lines))
+            client.post("/webhooks/shopify/orders-create", content=raw, headers=webhook_headers(raw, "orders/create", f"poll-{i}"))
+        paths = [f"/admin/orders/{i}" for i in range(1, args.orders + 1)] + ["/admin/orders?limit=200"]
+        max_entries = response_cache.cache.max_entries
+        for mode, cached, conditional in (("plain", False, False), ("cached", True, False), ("conditional", True, True)):
+            response_cache.cache.max_entries = max_entries if cached else 0
+            response_cache.cache.clear()
+            results[mode] = poll(client, paths, args.rounds, conditional)
+            r = results[mode]
+            print(f"{mode:12s} {r['requests_per_s']:8.1f} req/s  {r['statements_per_request']:5.2f} statements/req  {r['statuses']}")
+        results["cache"] = response_cache.cache.stats()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order polling with and without caching")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    results = main(args)
+    if args.out:
+        save_results(args.out, "order_polling", run_metadata(**vars(args)), results)
@@ -0,0 +1,154 @@
+"""Realistic, signed Shopify webhook deliveries for load tests.
+
+    python -m bench.payloads --orders 1000 --out deliveries.ndjson [--seed 1]
+
+Each output line is one delivery: {"topic", "path", "headers", "body"}, where
+body is the exact JSON text that was signed with SHOPIFY_WEBHOOK_SECRET.
+The stream mixes:
+- orders/create with 1-``max_lines`` line items (skewed toward small baskets),
+  Canadian provinces weighted roughly by population, and a few foreign addresses
+- orders/paid for most orders, arriving a little after their create
+- Shopify retries: a share of deliveries sent again with the same webhook id
+The same seed always produces the same stream.
+"""
+import argparse
+import json
+import random
+from typing import Iterator, List
+
+from ._common import WEBHOOK_SECRET, webhook_headers
+
+PATHS = {
+    "orders/create": "/webhooks/shopify/orders-create",
+    "orders/paid": "/webhooks/shopify/orders-paid",
+}
+
+# (province, code, city, postal code, weight, tax rate)
+PROVINCES = [
+    ("Ontario", "ON", "Toronto", "M5H 1A1", 39, 0.13),
+    ("Quebec", "QC", "Montreal", "H3B 2Y5", 22, 0.14975),
+    ("British Columbia", "BC", "Vancouver", "V6B 1A1", 14, 0.12),
+    ("Alberta", "AB", "Calgary", "T2P 1J9", 12, 0.05),
+    ("Manitoba", "MB", "Winnipeg", "R3C 0A1", 4, 0.12),
+    ("Saskatchewan", "SK", "Saskatoon", "S7K 0A1", 3, 0.11),
+    ("Nova Scotia", "NS", "Halifax", "B3H 1A1", 3, 0.15),
+    ("New Brunswick", "NB", "Moncton", "E1C 1A1", 2, 0.15),
+    ("Newfoundland and Labrador", "NL", "St. John's", "A1C 1A1", 1, 0.15),
+]
+SIZES = ("XS", "S", "M", "L", "XL")
+COLORS = ("Black", "Navy", "Sage", "Clay", "Stone")
+
+def _money(cents: int) -> str:
+    return f"{cents // 100}.{cents % 100:02d}"
+
+def shopify_order(rng: random.Random, order_id: int, sku_codes: List[str], max_lines: int = 12,
+                  foreign: bool = False, lines: int = 0) -> dict:
+    """An orders/create payload shaped like Shopify's REST webhook body (``lines`` fixes the basket size)."""
+    n_lines = lines or min(max_lines, max(1, int(rng.expovariate(1 / 2.5)) + 1))
+    province, code, city, postal, _, tax_rate = rng.choices(PROVINCES, weights=[p[4] for p in PROVINCES])[0]
+    line_items, subtotal = [], 0
+    for i in range(n_lines):
+        sku = rng.choice(sku_codes)
+        qty = rng.choices((1, 2, 3), weights=(80, 15, 5))[0]
+        price = rng.choice((4800, 5800, 6500, 7800, 9800, 12800))
+        subtotal += price * qty
+        line_items.append({
+            "id": order_id * 100 + i,
+            "variant_id": 40_000_000_000 + order_id * 100 + i,
+            "product_id": 7_000_000_000 + rng.randrange(500),
+            "sku": sku,
+            "title": f"{rng.choice(('Align', 'Flow', 'Studio', 'Trail'))} {rng.choice(('Legging', 'Tank', 'Hoodie', 'Short'))}",
+            "variant_title": f"{rng.choice(COLORS)} / {rng.choice(SIZES)}",
+            "vendor": "QBridge Athleisure",
+            "quantity": qty,
+            "price": _money(price),
+            "requires_shipping": True,
+            "taxable": True,
+            "fulfillment_status": None,
+            "tax_lines": [{"title": "Sales tax", "price": _money(int(price * qty * tax_rate)), "rate": tax_rate}],
+            "discount_allocations": [],
+            "properties": [],
+        })
+    shipping = 0 if subtotal >= 10000 else 995
+    tax = int((subtotal + shipping) * tax_rate)
+    customer_id = 9_000_000 + rng.randrange(max(1000, order_id // 2))
+    return {
+        "id": order_id,
+        "name": f"#{order_id}",
+        "email": f"c{customer_id}@example.com",
+        "created_at": f"2026-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00-05:00",
+        "currency": "CAD",
+        "financial_status": "pending",
+        "subtotal_price": _money(subtotal),
+        "total_tax": _money(tax),
+        "total_price": _money(subtotal + shipping + tax),
+        "total_shipping_price_set": {"shop_money": {"amount": _money(shipping), "currency_code": "CAD"}},
+        "customer": {
+            "id": customer_id, "email": f"c{customer_id}@example.com",
+            "first_name": "Load", "last_name": f"Tester{customer_id % 997}", "phone": None,
+        },
+        "shipping_address": {
+            "first_name": "Load", "last_name": f"Tester{customer_id % 997}",
+            "address1": f"{rng.randrange(1, 9999)} Main St", "address2": None,
+            "city": "Seattle" if foreign else city,
+            "province": "Washington" if foreign else province,
+            "province_code": "WA" if foreign else code,
+            "zip": "98101" if foreign else postal,
+            "country": "United States" if foreign else "Canada",
+            "country_code": "US" if foreign else "CA",
+        },
+        "line_items": line_items,
+    }
+
+def _delivery(topic: str, webhook_id: str, payload: dict) -> dict:
+    body = json.dumps(payload, separators=(",", ":"))
+    return {
+        "topic": topic,
+        "path": PATHS[topic],
+        "headers": webhook_headers(body.encode("utf-8"), topic, webhook_id),
+        "body": body,
+    }
+
+def deliveries(n_orders: int, sku_codes: List[str], seed: int = 1, first_order_id: int = 1,
+               max_lines: int = 12, paid_ratio: float = 0.8, retry_ratio: float = 0.05,
+               foreign_ratio: float = 0.02) -> Iterator[dict]:
+    """Deliveries in arrival order (creates, later pays, occasional retries)."""
+    rng = random.Random(seed)
+    timeline = []
+    for i in range(n_orders):
+        order_id = first_order_id + i
+        created = float(i)
+        payload = shopify_order(rng, order_id, sku_codes, max_lines, foreign=rng.random() < foreign_ratio)
+        events = [(created, _delivery("orders/create", f"bench-create-{seed}-{order_id}", payload))]
+        if rng.random() < paid_ratio:
+            paid = {"id": order_id, "total_price": payload["total_price"], "financial_status": "paid"}
+            events.append((created + rng.uniform(1, 20), _delivery("orders/paid", f"bench-paid-{seed}-{order_id}", paid)))
+        for at, d in list(events):
+            if rng.random() < retry_ratio:
+                events.append((at + rng.uniform(1, 50), d))
+        timeline.extend(events)
+    timeline.sort(key=lambda e: e[0])
+    for _, d in timeline:
+        yield d
+
+def load(path: str) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate signed Shopify webhook deliveries")
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--skus", type=int, default=64, help="codes BENCH-00000.. (seeded by bench.replay)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-lines", type=int, default=12)
+    parser.add_argument("--out", default="deliveries.ndjson")
+    args = parser.parse_args()
+    codes = [f"BENCH-{i:05d}" for i in range(args.skus)]
+    n = 0
+    with open(args.out, "w", encoding="utf-8") as f:
+        for d in deliveries(args.orders, codes, args.seed, max_lines=args.max_lines):
+            f.write(json.dumps(d) + "\n")
+            n += 1
+    print(f"{n} deliveries for {args.orders} orders written to {args.out} (signed with {'SHOPIFY_WEBHOOK_SECRET' if WEBHOOK_SECRET != 'bench-secret' else 'the bench secret'})")
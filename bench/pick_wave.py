@@ -0,0 +1,64 @@
+"""Pick-wave build time for large waves.
+
+Seeds ``--orders`` PAID orders (1-6 lines over ``--skus`` SKUs with bin
+locations) and times POST /admin/pick-waves as JSON and PDF for each wave size,
+with the SQL statement count per request.
+
+    python -m bench.pick_wave [--orders 5000] [--skus 300] [--waves 500,2000,5000] [--out results.json]
+"""
+import argparse
+import random
+
+from ._common import ADMIN_KEY, QueryCounter, SessionLocal, reset_schema, run_metadata, save_results, seed_skus, timer
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, update
+from app import models
+from app.main import app
+
+def seed(n_orders: int, n_skus: int, seed: int = 1):
+    rng = random.Random(seed)
+    codes = seed_skus(n_skus)
+    with SessionLocal() as db:
+        skus = db.execute(select(models.SKU.id, models.SKU.sku_code).order_by(models.SKU.id)).all()
+        for i, (sku_id, _) in enumerate(skus):
+            db.execute(update(models.Inventory).where(models.Inventory.sku_id == sku_id)
+                       .values(bin_location=f"{'ABCDEF'[i % 6]}-{i // 6 % 20:02d}-{i % 4 + 1}"))
+        order_ids = db.scalars(insert(models.Order).returning(models.Order.id), [
+            {"shopify_order_id": 8_000_000 + i, "status": models.OrderStatus.PAID, "total_cents": 0} for i in range(n_orders)
+        ]).all()
+        items = []
+        for oid in order_ids:
+            for _ in range(rng.choice((1, 1, 1, 2, 2, 3, 4, 6))):
+                sku_id, code = rng.choice(skus)
+                items.append({"order_id": oid, "sku_id": sku_id, "sku_code": code, "title": "Bench item",
+                              "qty": rng.choice((1, 1, 2)), "unit_price_cents": 6500, "line_total_cents": 6500})
+        db.execute(insert(models.OrderItem), items)
+        db.commit()
+    return codes
+
+def main(args) -> dict:
+    reset_schema()
+    seed(args.orders, args.skus)
+    results = {}
+    with TestClient(app) as client:
+        headers = {"x-admin-key": ADMIN_KEY}
+        for size in (int(s) for s in args.waves.split(",")):
+            for fmt in ("json", "pdf"):
+                with QueryCounter() as qc, timer() as t:
+                    r = client.post("/admin/pick-waves", headers=headers, json={"max_orders": size, "format": fmt})
+                r.raise_for_status()
+                results[f"{size}_{fmt}"] = {"orders": size, "format": fmt, "seconds": t["seconds"],
+                                            "statements": qc.count, "bytes": len(r.content)}
+                print(f"{size:6d} orders  {fmt:4s}  {t['seconds'] * 1000:9.1f} ms  {qc.count:3d} statements  {len(r.content):9d} bytes")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick-wave build time")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--skus", type=int, default=300)
+    parser.add_argument("--waves", default="500,2000,5000")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    results = main(args)
+    if args.out:
+        save_results(args.out, "pick_wave", run_metadata(**vars(args)), results)
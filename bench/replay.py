@@ -0,0 +1,133 @@
+"""Replay signed webhook deliveries (plus admin reads) and report latency per route.
+
+    python -m bench.replay [--orders 500 | --file deliveries.ndjson]
+                           [--rate 0] [--concurrency 16] [--reads 0.1]
+                           [--url http://127.0.0.1:8000] [--json results.json]
+
+Without --url the app runs in-process (httpx ASGI transport) against
+BENCH_DATABASE_URL or the SQLite stand-in, after a schema reset and SKU seed.
+With --url, requests go to a running server; it must share SHOPIFY_WEBHOOK_SECRET
+(and BENCH_ADMIN_KEY = its ADMIN_API_KEY for the reads; order-detail reads
+assume a freshly reset database).
+--rate is the target requests/second (0 = as fast as the workers go); requests
+are scheduled open-loop, so when the server falls behind the achieved rate drops
+below the target and latencies show it.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from ._common import ADMIN_KEY, latency_summary, reset_schema, run_metadata, save_results, seed_skus
+from . import payloads
+
+def build_requests(deliveries, reads: float, seed: int, lag: int = 64) -> list:
+    """(route label, method, path, headers, body) in send order.
+
+    Order-detail reads only pick orders created at least ``lag`` requests
+    earlier, so they are not racing the create that inserts them.
+    """
+    rng = random.Random(seed)
+    admin = {"x-admin-key": ADMIN_KEY}
+    out, seen_orders, created = [], [], set()
+    for d in deliveries:
+        out.append((f"POST {d['path']}", "POST", d["path"], d["headers"], d["body"].encode("utf-8")))
+        # Order ids are assigned 1..N in create order on a fresh database
+        webhook_id = d["headers"]["x-shopify-webhook-id"]
+        if d["topic"] == "orders/create" and webhook_id not in created and '"country":"Canada"' in d["body"]:
+            created.add(webhook_id)
+            seen_orders.append(len(seen_orders) + 1)
+        if reads and rng.random() < reads:
+            settled = seen_orders[:max(0, len(seen_orders) - lag)]
+            if rng.random() < 0.5 or not settled:
+                out.append(("GET /admin/orders", "GET", "/admin/orders?limit=50", admin, None))
+            else:
+                oid = rng.choice(settled)
+                out.append(("GET /admin/orders/{id}", "GET", f"/admin/orders/{oid}", admin, None))
+    return out
+
+async def drive(client: httpx.AsyncClient, requests: list, rate: float, concurrency: int) -> dict:
+    samples = defaultdict(list)
+    errors = Counter()
+    loop = asyncio.get_running_loop()
+    next_index = 0
+    start = loop.time()
+
+    async def worker():
+        nonlocal next_index
+        while next_index < len(requests):
+            i = next_index
+            next_index += 1
+            if rate:
+                delay = start + i / rate - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            label, method, path, headers, body = requests[i]
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, headers=headers, content=body)
+                failed = resp.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            samples[label].append((time.perf_counter() - t0) * 1000)
+            if failed:
+                errors[label] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = loop.time() - start
+    routes = {}
+    for label, s in sorted(samples.items()):
+        routes[label] = {**latency_summary(s), "errors": errors[label], "per_sec": len(s) / elapsed}
+    everything = [x for s in samples.values() for x in s]
+    return {
+        "seconds": elapsed,
+        "routes": routes,
+        "total": {**latency_summary(everything), "errors": sum(errors.values()), "per_sec": len(everything) / elapsed},
+    }
+
+async def _run(args) -> dict:
+    if args.file:
+        deliveries = list(payloads.load(args.file))
+    else:
+        codes = [f"BENCH-{i:05d}" for i in range(args.skus)]
+        deliveries = list(payloads.deliveries(args.orders, codes, args.seed, max_lines=args.max_lines))
+    requests = build_requests(deliveries, args.reads, args.seed, lag=4 * args.concurrency)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from app.main import app
+        reset_schema()
+        seed_skus(args.skus)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+    async with client:
+        return await drive(client, requests, args.rate, args.concurrency)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay webhook deliveries and report latency per route")
+    parser.add_argument("--file", help="deliveries from bench.payloads; generated in memory if omitted")
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--skus", type=int, default=64)
+    parser.add_argument("--max-lines", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=0, help="target requests/s (0 = unthrottled)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--reads", type=float, default=0.1, help="admin GETs per delivery")
+    parser.add_argument("--url", help="running server; default is the app in-process")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(_run(args))
+    print(f"{'route':<42} {'n':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for label, r in list(result["routes"].items()) + [("TOTAL", result["total"])]:
+        print(f"{label:<42} {r['count']:>6} {r['errors']:>4} {r['per_sec']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}")
+    if args.json:
+        params = {k: v for k, v in vars(args).items() if k != "json"}
+        save_results(args.json, "replay", run_metadata(**params), result)
+
+if __name__ == "__main__":
+    main()
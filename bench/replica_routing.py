@@ -0,0 +1,74 @@
+"""Read routing between a primary and a replica, with two local databases.
+
+The "replica" is a second database that nothing replicates into, so anything
+written through the app exists only on the primary until this script copies it
+over. That makes it visible which database served each read:
+
+1. an order is created via webhook (primary only)
+2. a client with no recent write reads it -> replica -> 404
+3. a client that just wrote (status change) reads it -> primary (read-your-writes cookie)
+4. the order is copied to the replica -> the first client now gets 200 from the replica
+5. replica lag above DB_REPLICA_MAX_LAG_SECONDS -> everyone reads the primary
+
+    python -m bench.replica_routing
+    BENCH_DATABASE_URL=postgresql+psycopg://.../oms BENCH_REPLICA_URL=postgresql+psycopg://.../oms_replica python -m bench.replica_routing
+
+On Postgres, step 5 is simulated the same way: a second plain database reports 0 lag.
+"""
+import os
+import time
+
+os.environ["DATABASE_REPLICA_URL"] = os.getenv("BENCH_REPLICA_URL", "sqlite:///./bench-replica.sqlite3")
+
+from ._common import ADMIN_KEY, Base, encode, engine, order_payload, reset_schema, seed_skus, webhook_headers
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, select
+from app import db as database
+from app.main import app
+
+replica_sync = create_engine(os.environ["DATABASE_REPLICA_URL"])
+
+def copy_to_replica(*tables):
+    with engine.connect() as src, replica_sync.begin() as dst:
+        for table in tables:
+            rows = [dict(r._mapping) for r in src.execute(select(table))]
+            dst.execute(table.delete())
+            if rows:
+                dst.execute(insert(table), rows)
+
+def main():
+    reset_schema()
+    Base.metadata.drop_all(replica_sync)
+    Base.metadata.create_all(replica_sync)
+    codes = seed_skus(2)
+    headers = {"x-admin-key": ADMIN_KEY}
+    with TestClient(app) as reader, TestClient(app) as writer:
+        raw = encode(order_payload(1, codes, 1))
+        order_id = writer.post("/webhooks/shopify/orders-create", content=raw,
+                               headers=webhook_headers(raw, "orders/create", "replica-1")).json()["order_id"]
+        steps = [("fresh client, replica not caught up", reader, 404)]
+        writer.post(f"/admin/orders/{order_id}/status", params={"status": "PAID"}, headers=headers).raise_for_status()
+        steps.append(("client right after its own write", writer, 200))
+        for label, client, expected in steps:
+            status = client.get(f"/admin/orders/{order_id}", headers=headers).status_code
+            print(f"{label:45s} -> {status} (expected {expected})")
+            assert status == expected
+
+        t = Base.metadata.tables
+        copy_to_replica(t["customers"], t["addresses"], t["orders"], t["order_items"])
+        r = reader.get(f"/admin/orders/{order_id}", headers=headers)
+        print(f"{'fresh client, replica caught up':45s} -> {r.status_code} status={r.json()['status']} (expected 200 PAID)")
+        assert r.status_code == 200
+
+        # Pretend the replica fell behind: the lag check result is cached for DB_REPLICA_LAG_CHECK_SECONDS
+        with replica_sync.begin() as conn:
+            conn.execute(t["orders"].update().values(status="IMPORTED"))
+        database.replica_lag.seconds, database.replica_lag.checked_at = 3600.0, time.monotonic() + 3600
+        r = reader.get(f"/admin/orders/{order_id}", headers=headers)
+        print(f"{'fresh client, replica lagging':45s} -> {r.status_code} status={r.json()['status']} (expected 200 PAID)")
+        assert r.json()["status"] == "PAID"
+
+        print("read routes:", reader.get("/admin/db/pool", headers=headers).json()["read_routes"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Admin order search latency on a large synthetic order table.
+
+Bulk-inserts ``--orders`` orders (customers, addresses, 1-4 items each), builds
+the search terms with app.search.reindex, then times GET /admin/orders/search
+for email, name, postal code, order number and SKU queries (exact and prefix).
+With ``--ilike`` the same lookups also run as the ILIKE joins they replace.
+
+    python -m bench.search [--orders 200000] [--repeat 20] [--ilike] [--out results.json]
+
+Use BENCH_DATABASE_URL=postgresql+psycopg://... with --orders 3000000 for
+production-sized numbers.
+"""
+import argparse
+import random
+import time
+
+from ._common import ADMIN_KEY, SessionLocal, latency_summary, reset_schema, run_metadata, save_results, seed_skus, timer
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, or_, select
+from app import models, search
+from app.main import app
+
+FIRST = ["Olivia", "Liam", "Emma", "Noah", "Chloé", "William", "Zoé", "Benjamin", "Amelia", "Lucas", "Maya", "Ethan",
+         "Sophie", "Jacob", "Léa", "Nathan", "Ava", "Félix", "Charlotte", "Samuel"]
+LAST = ["Tremblay", "Gagnon", "Roy", "Côté", "Bouchard", "Gauthier", "Morin", "Lavoie", "Fortin", "Gagné", "Smith",
+        "Brown", "Wilson", "MacDonald", "Taylor", "Campbell", "Anderson", "Li", "Wong", "Singh", "Patel", "Nguyen"]
+FSA = "ABCEGHJKLMNPRSTVXY"
+
+def seed(n_orders: int, chunk: int = 20000, seed: int = 7):
+    rng = random.Random(seed)
+    codes = seed_skus(300)
+    n_customers = max(1, n_orders // 2)
+    with SessionLocal() as db:
+        for start in range(0, n_customers, chunk):
+            db.execute(insert(models.Customer), [{
+                "shopify_customer_id": 5_000_000 + i,
+                "email": f"{FIRST[i % len(FIRST)].lower()}.{LAST[i // 7 % len(LAST)].lower()}{i}@example.com",
+                "first_name": FIRST[i % len(FIRST)],
+                "last_name": LAST[i // 7 % len(LAST)],
+            } for i in range(start, min(start + chunk, n_customers))])
+            db.execute(insert(models.Address), [{
+                "customer_id": i + 1, "line1": f"{i % 999 + 1} Main St", "city": "Toronto", "province": "Ontario",
+                "postal_code": f"{rng.choice(FSA)}{rng.randrange(10)}{rng.choice(FSA)} {rng.randrange(10)}{rng.choice(FSA)}{rng.randrange(10)}",
+            } for i in range(start, min(start + chunk, n_customers))])
+        db.commit()
+        for start in range(0, n_orders, chunk):
+            ids = range(start + 1, min(start + chunk, n_orders) + 1)
+            owners = {i: rng.randrange(n_customers) + 1 for i in ids}
+            db.execute(insert(models.Order), [{
+                "id": i, "shopify_order_id": 4_000_000_000 + i, "customer_id": owners[i], "shipping_address_id": owners[i],
+                "status": models.OrderStatus.PAID, "total_cents": 6500,
+            } for i in ids])
+            db.execute(insert(models.OrderItem), [{
+                "order_id": i, "sku_code": rng.choice(codes), "title": "Bench item", "qty": 1,
+                "unit_price_cents": 6500, "line_total_cents": 6500,
+            } for i in ids for _ in range(rng.choice((1, 1, 2, 3, 4)))])
+            db.commit()
+    return codes
+
+def ilike(db, q: str, limit: int):
+    """The scan search would otherwise be."""
+    o, c, a, it = models.Order, models.Customer, models.Address, models.OrderItem
+    pattern = f"%{q}%"
+    return db.execute(
+        select(o.id).outerjoin(c, c.id == o.customer_id).outerjoin(a, a.id == o.shipping_address_id)
+        .where(or_(c.email.ilike(pattern), c.first_name.ilike(pattern), c.last_name.ilike(pattern),
+                   a.postal_code.ilike(pattern), o.id.in_(select(it.order_id).where(it.sku_code.ilike(pattern)))))
+        .order_by(o.id.desc()).limit(limit)
+    ).all()
+
+def main(args) -> dict:
+    reset_schema()
+    with timer() as t_seed:
+        codes = seed(args.orders)
+    with timer() as t_index:
+        indexed = search.reindex()
+    print(f"seeded {args.orders} orders in {t_seed['seconds']:.1f}s, indexed in {t_index['seconds']:.1f}s "
+          f"({indexed['orders'] / t_index['seconds']:.0f} orders/s)")
+    with SessionLocal() as db:
+        probe = db.execute(
+            select(models.Customer.email, models.Customer.first_name, models.Customer.last_name, models.Address.postal_code)
+            .join(models.Address, models.Address.customer_id == models.Customer.id)
+            .where(models.Customer.id == args.orders // 4 + 1)
+        ).one()
+    queries = {
+        "email": probe.email,
+        "email_prefix": probe.email.split("@")[0][:-2],
+        "first_last": f"{probe.first_name} {probe.last_name}",
+        "last_name_prefix": probe.last_name[:4],
+        "postal": probe.postal_code,
+        "postal_prefix": probe.postal_code[:3],
+        "order_number": f"#{4_000_000_000 + args.orders // 3}",
+        "sku": codes[42],
+        "name_and_sku": f"{probe.last_name} {codes[42]}",
+    }
+    results = {"orders": args.orders, "index_seconds": t_index["seconds"], "queries": {}}
+    headers = {"x-admin-key": ADMIN_KEY}
+    with TestClient(app) as client:
+        for name, q in queries.items():
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                r = client.get("/admin/orders/search", params={"q": q, "limit": 20}, headers=headers)
+                samples.append((time.perf_counter() - start) * 1000)
+                r.raise_for_status()
+            hits = r.json()
+            row = {"q": q, "hits": len(hits), "top_score": hits[0]["score"] if hits else None, **latency_summary(samples)}
+            if args.ilike:
+                with SessionLocal() as db, timer() as t:
+                    ilike(db, q.lstrip("#"), 20)
+                row["ilike_ms"] = t["seconds"] * 1000
+            results["queries"][name] = row
+            extra = f"  ilike {row['ilike_ms']:8.1f} ms" if args.ilike else ""
+            print(f"{name:17s} {q[:32]:32s} hits={len(hits):3d}  p50 {row['p50_ms']:6.2f} ms  p95 {row['p95_ms']:6.2f} ms{extra}")
+        cursor = client.get("/admin/orders/search", params={"q": queries["sku"], "limit": 20}, headers=headers).headers.get("x-next-cursor")
+        page2 = client.get("/admin/orders/search", params={"q": queries["sku"], "limit": 20, "cursor": cursor}, headers=headers).json()
+        results["second_page_hits"] = len(page2)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Admin search latency")
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--ilike", action="store_true")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+    results = main(args)
+    if args.out:
+        save_results(args.out, "search", run_metadata(**vars(args)), results)
@@ -0,0 +1,83 @@
+"""In-memory stand-in for the Shopify Admin REST endpoints used by app/fulfillment_sync.py.
+
+Enforces its own leaky bucket (``size`` requests, leaking ``leak_per_second``),
+answers with X-Shopify-Shop-Api-Call-Limit and returns 429 + Retry-After when
+the bucket is full, like Shopify. Mount it through httpx.ASGITransport or run it:
+
+    uvicorn bench.shopify_stub:app --port 8900
+"""
+import asyncio
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+class StubShop:
+    def __init__(self, size: int = 40, leak_per_second: float = 2.0, latency: float = 0.0):
+        self.size = size
+        self.leak_per_second = leak_per_second
+        self.latency = latency
+        self.level = 0.0
+        self._updated = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self.fulfillments = {}  # fulfillment id -> {"order_id", "tracking_info", "updates"}
+        self.by_order = {}  # shopify order id -> fulfillment id
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self._updated) * self.leak_per_second)
+        self._updated = now
+        self.requests += 1
+        if self.level + 1 > self.size:
+            self.throttled += 1
+            return False
+        self.level += 1
+        return True
+
+    def limit_header(self) -> dict:
+        return {"X-Shopify-Shop-Api-Call-Limit": f"{int(self.level)}/{self.size}"}
+
+def create_app(shop: StubShop) -> FastAPI:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def bucket(request: Request, call_next):
+        if not shop.take():
+            return JSONResponse({"errors": "Exceeded 2 calls per second for api client."}, status_code=429,
+                                headers={**shop.limit_header(), "Retry-After": "1.0"})
+        if shop.latency:
+            await asyncio.sleep(shop.latency)
+        response = await call_next(request)
+        response.headers.update(shop.limit_header())
+        return response
+
+    @app.get("/admin/api/{version}/orders/{order_id}/fulfillment_orders.json")
+    def fulfillment_orders(version: str, order_id: int):
+        status = "closed" if order_id in shop.by_order else "open"
+        return {"fulfillment_orders": [{"id": order_id * 10, "order_id": order_id, "status": status}]}
+
+    @app.post("/admin/api/{version}/fulfillments.json")
+    async def create_fulfillment(version: str, request: Request):
+        body = (await request.json())["fulfillment"]
+        order_id = body["line_items_by_fulfillment_order"][0]["fulfillment_order_id"] // 10
+        if order_id in shop.by_order:
+            return JSONResponse({"errors": "fulfillment order is closed"}, status_code=422)
+        fid = 5_000_000 + len(shop.fulfillments) + 1
+        shop.fulfillments[fid] = {"order_id": order_id, "tracking_info": body["tracking_info"], "updates": 0}
+        shop.by_order[order_id] = fid
+        return {"fulfillment": {"id": fid, "order_id": order_id, "status": "success"}}
+
+    @app.post("/admin/api/{version}/fulfillments/{fulfillment_id}/update_tracking.json")
+    async def update_tracking(version: str, fulfillment_id: int, request: Request):
+        f = shop.fulfillments.get(fulfillment_id)
+        if f is None:
+            return JSONResponse({"errors": "Not Found"}, status_code=404)
+        f["tracking_info"] = (await request.json())["fulfillment"]["tracking_info"]
+        f["updates"] += 1
+        return {"fulfillment": {"id": fulfillment_id, "order_id": f["order_id"], "status": "success"}}
+
+    return app
+
+shop = StubShop()
+app = create_app(shop)
@@ -0,0 +1,81 @@
+"""Throughput of N simultaneous orders/create webhooks in one worker process.
+
+"before" replays the previous wiring (an ``async def`` route driving a sync
+Session, so every round trip blocks the event loop); "after" is the real app
+on the async engine. Alongside the burst, /health is probed to show how long
+other requests stall.
+
+    python -m bench.webhook_concurrency [--concurrency 50] [--lines 10]
+
+Use BENCH_DATABASE_URL=postgresql+psycopg://... for representative numbers;
+SQLite serialises writers, which flattens the difference.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from ._common import SessionLocal, encode, order_payload, reset_schema, seed_skus, webhook_headers
+import httpx
+from fastapi import FastAPI, Request
+from app import webhooks
+from app.main import app
+
+legacy_app = FastAPI()
+
+@legacy_app.get("/health")
+def legacy_health():
+    return {"ok": True}
+
+@legacy_app.post("/webhooks/shopify/orders-create")
+async def legacy_orders_create(request: Request):
+    raw = await request.body()
+    webhook_id, shop_domain, topic = webhooks.webhook_meta(request.headers, "orders/create")
+    with SessionLocal() as db:
+        return webhooks.process_orders_create(
+            db, json.loads(raw.decode("utf-8")), webhook_id=webhook_id, shop_domain=shop_domain, topic=topic
+        )
+
+async def burst(target, concurrency: int, lines: int, first_id: int, sku_codes: list) -> dict:
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(oid: int):
+            raw = encode(order_payload(oid, sku_codes, lines))
+            resp = await client.post("/webhooks/shopify/orders-create", content=raw,
+                                     headers=webhook_headers(raw, "orders/create", f"conc-{oid}"))
+            resp.raise_for_status()
+
+        async def probe(stop: asyncio.Event, samples: list):
+            while not stop.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                samples.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.005)
+
+        stop, health = asyncio.Event(), []
+        prober = asyncio.create_task(probe(stop, health))
+        start = time.perf_counter()
+        await asyncio.gather(*(one(first_id + i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await prober
+    return {
+        "seconds": elapsed,
+        "webhooks_per_sec": concurrency / elapsed,
+        "health_max_ms": max(health) if health else 0.0,
+    }
+
+def run(concurrency: int, lines: int):
+    reset_schema()
+    sku_codes = seed_skus(max(lines, 1))
+    print(f"{'variant':<8} {'N':>5} {'seconds':>8} {'webhooks/s':>11} {'/health max ms':>15}")
+    for i, (name, target) in enumerate((("before", legacy_app), ("after", app))):
+        r = asyncio.run(burst(target, concurrency, lines, 1 + i * concurrency, sku_codes))
+        print(f"{name:<8} {concurrency:>5} {r['seconds']:>8.2f} {r['webhooks_per_sec']:>11.1f} {r['health_max_ms']:>15.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=10)
+    args = parser.parse_args()
+    run(args.concurrency, args.lines)
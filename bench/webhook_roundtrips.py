@@ -0,0 +1,44 @@
+"""Round trips and latency per orders/create + orders/paid webhook vs. line-item count.
+
+    python -m bench.webhook_roundtrips [--orders 20]
+"""
+import argparse
+import statistics
+import time
+
+from ._common import (
+    QueryCounter, encode, order_payload, reset_schema, seed_skus, webhook_headers,
+)
+from fastapi.testclient import TestClient
+from app.main import app
+
+LINE_COUNTS = (1, 5, 10, 20, 40)
+
+def run(orders_per_size: int):
+    reset_schema()
+    sku_codes = seed_skus(max(LINE_COUNTS))
+    client = TestClient(app)
+    print(f"{'lines':>5} {'topic':<14} {'queries':>8} {'p50 ms':>8} {'max ms':>8}")
+    next_id = 1
+    for lines in LINE_COUNTS:
+        for topic, path in (("orders/create", "/webhooks/shopify/orders-create"),
+                            ("orders/paid", "/webhooks/shopify/orders-paid")):
+            queries, latencies = [], []
+            for n in range(orders_per_size):
+                oid = next_id + n
+                raw = encode(order_payload(oid, sku_codes, lines))
+                headers = webhook_headers(raw, topic, f"{topic}-{oid}")
+                with QueryCounter() as qc:
+                    start = time.perf_counter()
+                    resp = client.post(path, content=raw, headers=headers)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                resp.raise_for_status()
+                queries.append(qc.count)
+            print(f"{lines:>5} {topic:<14} {statistics.median(queries):>8.0f} "
+                  f"{statistics.median(latencies):>8.2f} {max(latencies):>8.2f}")
+        next_id += orders_per_size
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=20, help="orders per line-item size")
+    run(parser.parse_args().orders)
@@ -8,11 +8,14 @@ CREATE TABLE IF NOT EXISTS customers (
   id              BIGSERIAL PRIMARY KEY,
   shopify_customer_id BIGINT UNIQUE,
   email           TEXT,
+  email_normalized TEXT, -- lower(trim(email)); guest checkouts are matched on it
   phone           TEXT,
   first_name      TEXT,
   last_name       TEXT,
   created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
 );
+-- Columns added after the first release (CREATE TABLE IF NOT EXISTS skips existing tables)
+ALTER TABLE customers ADD COLUMN IF NOT EXISTS email_normalized TEXT;
 
 CREATE TABLE IF NOT EXISTS addresses (
   id              BIGSERIAL PRIMARY KEY,
@@ -23,8 +26,10 @@ CREATE TABLE IF NOT EXISTS addresses (
   province        TEXT NOT NULL,
   postal_code     TEXT NOT NULL,
   country         TEXT NOT NULL DEFAULT 'Canada',
+  fingerprint     TEXT, -- unique (ux_addresses_fingerprint); sha256 of the normalized address + customer id (app/customers.py)
   created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
 );
+ALTER TABLE addresses ADD COLUMN IF NOT EXISTS fingerprint TEXT;
 
 CREATE TABLE IF NOT EXISTS products (
   id              BIGSERIAL PRIMARY KEY,
@@ -51,8 +56,41 @@ CREATE TABLE IF NOT EXISTS inventory (
   qty_on_hand     INTEGER NOT NULL DEFAULT 0 CHECK (qty_on_hand >= 0),
   qty_reserved    INTEGER NOT NULL DEFAULT 0 CHECK (qty_reserved >= 0),
   reorder_level   INTEGER NOT NULL DEFAULT 0 CHECK (reorder_level >= 0),
+  bin_location    TEXT, -- warehouse pick location, e.g. "A-03-2"; pick lists walk in this order
   updated_at      TIMESTAMPTZ NOT NULL DEFAULT now()
 );
+ALTER TABLE inventory ADD COLUMN IF NOT EXISTS bin_location TEXT;
+
+-- Hot-SKU escrow: stock moved out of inventory (as reserved) into N slots; orders
+-- draw from an unlocked slot (FOR UPDATE SKIP LOCKED) instead of queueing on one row
+CREATE TABLE IF NOT EXISTS inventory_escrow (
+  sku_id          BIGINT NOT NULL REFERENCES skus(id) ON DELETE CASCADE,
+  slot            INTEGER NOT NULL,
+  qty             INTEGER NOT NULL DEFAULT 0 CHECK (qty >= 0),
+  PRIMARY KEY (sku_id, slot)
+);
+
+-- Append-only stock ledger: every change to inventory quantities, so stock can be audited/rebuilt
+CREATE TABLE IF NOT EXISTS inventory_movements (
+  id              BIGSERIAL PRIMARY KEY,
+  sku_id          BIGINT NOT NULL REFERENCES skus(id) ON DELETE CASCADE,
+  order_id        BIGINT, -- no FK: movements outlive archived orders
+  delta_on_hand   INTEGER NOT NULL DEFAULT 0,
+  delta_reserved  INTEGER NOT NULL DEFAULT 0,
+  reason          TEXT,
+  source          TEXT NOT NULL,
+  created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Low-stock change feed: one row each time available (on hand - reserved) crosses reorder_level
+CREATE TABLE IF NOT EXISTS stock_alerts (
+  id              BIGSERIAL PRIMARY KEY,
+  sku_id          BIGINT NOT NULL REFERENCES skus(id) ON DELETE CASCADE,
+  kind            TEXT NOT NULL CHECK (kind IN ('LOW', 'RECOVERED')),
+  available       INTEGER NOT NULL,
+  reorder_level   INTEGER NOT NULL,
+  created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
 
 CREATE TYPE order_status AS ENUM (
   'IMPORTED', 'PAID', 'PICKED', 'SHIPPED', 'DELIVERED', 'RETURNED', 'CANCELLED'
@@ -105,8 +143,10 @@ CREATE TABLE IF NOT EXISTS shipments (
   tracking_number TEXT,
   shipped_at      TIMESTAMPTZ,
   delivered_at    TIMESTAMPTZ,
+  shopify_fulfillment_id BIGINT, -- set once pushed to Shopify
   created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
 );
+ALTER TABLE shipments ADD COLUMN IF NOT EXISTS shopify_fulfillment_id BIGINT;
 
 CREATE TABLE IF NOT EXISTS returns (
   id              BIGSERIAL PRIMARY KEY,
@@ -115,6 +155,36 @@ CREATE TABLE IF NOT EXISTS returns (
   created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+-- Admin search (app/search.py): casefolded terms per order (email, names, postal
+-- code, order numbers, SKUs). Prefix lookups are range scans on the primary key;
+-- COLLATE "C" makes that range match exactly the strings starting with the prefix.
+-- No FK: terms of archived orders stay searchable.
+CREATE TABLE IF NOT EXISTS order_search_terms (
+  term            TEXT COLLATE "C" NOT NULL,
+  order_id        BIGINT NOT NULL,
+  kind            TEXT NOT NULL,
+  PRIMARY KEY (term, order_id)
+);
+
+-- Closed orders moved out of the hot tables by app/archive.py. Ids are kept; items,
+-- payments, shipments, return and shipping address live in doc (zlib-compressed JSON).
+CREATE TABLE IF NOT EXISTS orders_archive (
+  id              BIGINT PRIMARY KEY,
+  shopify_order_id BIGINT UNIQUE,
+  customer_id     BIGINT, -- no FK: customers may be merged or deleted later
+  status          TEXT NOT NULL,
+  currency        TEXT NOT NULL,
+  subtotal_cents  INTEGER NOT NULL,
+  shipping_cents  INTEGER NOT NULL,
+  tax_cents       INTEGER NOT NULL,
+  total_cents     INTEGER NOT NULL,
+  placed_at       TIMESTAMPTZ,
+  created_at      TIMESTAMPTZ NOT NULL,
+  updated_at      TIMESTAMPTZ NOT NULL,
+  archived_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+  doc             BYTEA NOT NULL
+);
+
 -- Webhook idempotency (prevents double-processing)
 CREATE TABLE IF NOT EXISTS webhook_events (
   id              BIGSERIAL PRIMARY KEY,
@@ -124,9 +194,110 @@ CREATE TABLE IF NOT EXISTS webhook_events (
   received_at     TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+-- Webhook inbox: raw deliveries ACKed immediately and drained by background workers
+CREATE TYPE inbox_status AS ENUM ('PENDING', 'PROCESSING', 'DONE', 'DEAD');
+
+CREATE TABLE IF NOT EXISTS webhook_inbox (
+  id              BIGSERIAL PRIMARY KEY,
+  webhook_id      TEXT NOT NULL UNIQUE,
+  topic           TEXT NOT NULL,
+  shop_domain     TEXT NOT NULL,
+  shopify_order_id BIGINT,
+  headers         JSONB NOT NULL,
+  body            BYTEA NOT NULL,
+  status          inbox_status NOT NULL DEFAULT 'PENDING',
+  attempts        INTEGER NOT NULL DEFAULT 0,
+  next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  last_error      TEXT,
+  received_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+  processed_at    TIMESTAMPTZ
+);
+
+-- Outbound fulfillment sync: one row per order, coalescing shipment changes until pushed to Shopify
+CREATE TABLE IF NOT EXISTS fulfillment_sync (
+  id              BIGSERIAL PRIMARY KEY,
+  order_id        BIGINT NOT NULL UNIQUE REFERENCES orders(id) ON DELETE CASCADE,
+  shipment_id     BIGINT NOT NULL REFERENCES shipments(id) ON DELETE CASCADE,
+  version         INTEGER NOT NULL DEFAULT 1, -- bumped on every change
+  status          inbox_status NOT NULL DEFAULT 'PENDING',
+  attempts        INTEGER NOT NULL DEFAULT 0,
+  next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  last_error      TEXT,
+  updated_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+  processed_at    TIMESTAMPTZ
+);
+
+-- Reporting rollups, keyed by order day (placed_at, else created_at, in REPORTING_TIMEZONE).
+-- Maintained incrementally by the webhooks and status changes; rebuild with `python -m app.rollups`.
+CREATE TABLE IF NOT EXISTS sales_daily_sku (
+  day             DATE NOT NULL,
+  sku_code        TEXT NOT NULL, -- '' for line items without a SKU
+  orders          INTEGER NOT NULL DEFAULT 0,
+  units           INTEGER NOT NULL DEFAULT 0,
+  revenue_cents   BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, sku_code)
+);
+
+CREATE TABLE IF NOT EXISTS sales_daily_province (
+  day             DATE NOT NULL,
+  province        TEXT NOT NULL,
+  orders          INTEGER NOT NULL DEFAULT 0,
+  revenue_cents   BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, province)
+);
+
+CREATE TABLE IF NOT EXISTS orders_daily_status (
+  day             DATE NOT NULL,
+  status          TEXT NOT NULL,
+  orders          INTEGER NOT NULL DEFAULT 0,
+  revenue_cents   BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, status)
+);
+
+-- Writers append increments here instead of updating the shared daily rows above
+-- (which would serialize every order of the day); app/rollups.py folds them in
+-- and reports add whatever is still pending.
+CREATE TABLE IF NOT EXISTS rollup_deltas (
+  id              BIGSERIAL PRIMARY KEY,
+  report          TEXT NOT NULL, -- 'sku', 'province' or 'status'
+  day             DATE NOT NULL,
+  key             TEXT NOT NULL, -- sku_code, province or status
+  orders          INTEGER NOT NULL DEFAULT 0,
+  units           INTEGER NOT NULL DEFAULT 0,
+  revenue_cents   BIGINT NOT NULL DEFAULT 0
+);
+
 -- Helpful indexes
 CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
 CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+CREATE INDEX IF NOT EXISTS idx_inventory_movements_sku_id ON inventory_movements(sku_id, id);
+CREATE INDEX IF NOT EXISTS idx_rollup_deltas_report_day ON rollup_deltas(report, day);
+-- Low-stock SKUs only; queries must repeat this predicate to use it
+CREATE INDEX IF NOT EXISTS idx_inventory_low_stock ON inventory(sku_id)
+  WHERE qty_on_hand - qty_reserved < reorder_level;
+-- Guest customers are upserted by email; registered ones by shopify_customer_id
+CREATE UNIQUE INDEX IF NOT EXISTS ux_customers_guest_email ON customers(email_normalized)
+  WHERE shopify_customer_id IS NULL;
+-- Address reuse upserts ON CONFLICT (fingerprint); NULLs (not yet fingerprinted) don't collide
+CREATE UNIQUE INDEX IF NOT EXISTS ux_addresses_fingerprint ON addresses(fingerprint);
+-- Keyset pagination / export on (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_orders_created_at_id ON orders(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created_at_id ON orders(status, created_at, id);
+-- Archival (app/archive.py): closed orders oldest-first; archived export by (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_orders_closed_updated_at ON orders(updated_at, id)
+  WHERE status IN ('DELIVERED', 'CANCELLED', 'RETURNED');
+CREATE INDEX IF NOT EXISTS idx_orders_archive_created_at_id ON orders_archive(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_orders_archive_status_created_at_id ON orders_archive(status, created_at, id);
+-- Retention purge (app/retention.py) walks these in received_at order
+CREATE INDEX IF NOT EXISTS idx_webhook_events_received_at ON webhook_events(received_at);
+CREATE INDEX IF NOT EXISTS idx_webhook_inbox_finished ON webhook_inbox(received_at)
+  WHERE status = 'DONE';
+CREATE INDEX IF NOT EXISTS idx_fulfillment_sync_ready ON fulfillment_sync(next_attempt_at, id)
+  WHERE status IN ('PENDING', 'PROCESSING');
+CREATE INDEX IF NOT EXISTS idx_webhook_inbox_ready ON webhook_inbox(next_attempt_at, id)
+  WHERE status IN ('PENDING', 'PROCESSING');
+CREATE INDEX IF NOT EXISTS idx_webhook_inbox_order ON webhook_inbox(shopify_order_id, id)
+  WHERE status IN ('PENDING', 'PROCESSING');
 
 -- Updated_at trigger
 CREATE OR REPLACE FUNCTION set_updated_at()
@@ -141,3 +312,22 @@ DROP TRIGGER IF EXISTS trg_orders_updated_at ON orders;
 CREATE TRIGGER trg_orders_updated_at
 BEFORE UPDATE ON orders
 FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- SKU catalog change feed: API workers LISTEN on sku_catalog to invalidate their in-process cache
+CREATE OR REPLACE FUNCTION notify_sku_catalog()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP <> 'INSERT' THEN
+    PERFORM pg_notify('sku_catalog', OLD.sku_code);
+  END IF;
+  IF TG_OP <> 'DELETE' THEN
+    PERFORM pg_notify('sku_catalog', NEW.sku_code);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_skus_notify_catalog ON skus;
+CREATE TRIGGER trg_skus_notify_catalog
+AFTER INSERT OR UPDATE OR DELETE ON skus
+FOR EACH ROW EXECUTE FUNCTION notify_sku_catalog();